@@ -1,3 +1,4 @@
+from .aio import AsyncContentPlatform
 from .api import ContentPlatform
 
-__all__ = ["ContentPlatform"]
+__all__ = ["AsyncContentPlatform", "ContentPlatform"]
@@ -0,0 +1,894 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from logging import DEBUG, getLogger
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Literal, Optional, Tuple
+
+import httpx
+
+from castlabs import instrumentation, queries
+from castlabs.cache import DEFAULT_TTL, Cache
+from castlabs.api import Encoding, match_processes
+from castlabs.client import DEFAULT_REFRESH_MARGIN, REFRESH_RETRY_DELAY, BaseClient
+from castlabs.errors import CPAuthorizationException
+from castlabs.index import RepositoryIndex
+from castlabs.instrumentation import ApiCallEvent
+from castlabs.multipart import AsyncUploadSource, ProgressCallback, UploadConfig
+from castlabs.polling import Backoff
+from castlabs.queries import FolderProjection, Projection
+from castlabs.records import content_url
+from castlabs.repository import (
+    DEFAULT_WALK_CONCURRENCY,
+    BaseStorageLocation,
+    ContentsOfDirectory,
+    FolderListing,
+    S3ClientFactory,
+    UploadClient,
+    sub_route,
+)
+from castlabs.transfers import DEFAULT_MAX_UPLOAD_CLIENTS
+from castlabs.transport import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+from castlabs.urls import API_URLS, ApiName, ApiUrls
+from castlabs.workflow import DEFAULT_BATCH_SIZE, BaseProcess, batch_item_lookups, batch_refreshes, find_item
+
+logger = getLogger("castlabs.aio")
+
+DEFAULT_MAX_CONCURRENCY = 100
+
+
+class AsyncClient(BaseClient):
+    """
+    asyncio counterpart of :func:`~castlabs.client.Client`. Every API host gets its own pooled httpx client
+    (HTTP/2 where the server supports it) and the number of requests in flight is capped by `max_concurrency`.
+
+    Authentication happens lazily with the first request. Afterwards a background task refreshes the access token
+    before it expires.
+    """
+
+    def __init__(
+        self,
+        organization_urn: str,
+        user_urn: str,
+        api_secret_access_key: str,
+        api_access_key_id: str,
+        urls: ApiUrls,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        auto_refresh: bool = True,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ):
+        """
+        :param organization_urn: The organization URN (urn:janus:accesskey:XXX)
+        :param user_urn: The user urn
+        :param api_secret_access_key: The secret access key to use (urn:janus:accesskey:XXX)
+        :param api_access_key_id: The key id
+        :param urls: The API URLs of the environment
+        :param pool_size: (Optional) Maximum number of connections per API host
+        :param max_concurrency: (Optional) Maximum number of requests in flight
+        :param timeout: (Optional) Timeout in seconds for every request
+        :param auto_refresh: (Optional) Refresh the access token in a background task before it expires
+        :param refresh_margin: (Optional) Seconds before the expiry of the access token to refresh it
+        """
+        super().__init__(
+            organization_urn, user_urn, api_secret_access_key, api_access_key_id, urls, refresh_margin=refresh_margin
+        )
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._http: Dict[ApiName, httpx.AsyncClient] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._auth_lock = asyncio.Lock()
+        self._auto_refresh = auto_refresh
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _session(self, api: ApiName) -> httpx.AsyncClient:
+        if api not in self._http:
+            self._http[api] = httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=self.timeout,
+            )
+        return self._http[api]
+
+    async def close(self) -> None:
+        """
+        Close the pooled connections of the client and stop the token refresh
+        """
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        for session in self._http.values():
+            await session.aclose()
+        self._http.clear()
+
+    async def _authenticate(self) -> None:
+        headers, payload = self._credential_exchange_request()
+
+        async with self._semaphore:
+            response = await self._session("credential_exchange").post(
+                self._urls["credential_exchange"], headers=headers, content=payload
+            )
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        self._set_tokens(response.json())
+
+    async def _reauthenticate(self, stale_token: Optional[str]) -> None:
+        """
+        Exchange the credentials again, unless another task already replaced the stale token in the meantime.
+        Concurrent callers share one credential exchange.
+
+        :param stale_token: The access token that expired or was rejected, None before the first authentication
+        """
+        async with self._auth_lock:
+            if self._access_token == stale_token:
+                await self._authenticate()
+
+                if self._auto_refresh and self._refresh_task is None and self._refresh_at is not None:
+                    self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        """
+        Refresh the access token ahead of its expiry until the client is closed
+        """
+        delay = self._refresh_delay()
+        while delay is not None:
+            await asyncio.sleep(delay)
+            try:
+                await self._reauthenticate(self._access_token)
+                delay = self._refresh_delay()
+            except Exception as e:
+                logger.warning(f"Refreshing the access token failed, retrying in {REFRESH_RETRY_DELAY}s: {e}")
+                delay = REFRESH_RETRY_DELAY
+
+    async def _current_token(self) -> Optional[str]:
+        """
+        :return: The access token, authenticated or refreshed first if necessary
+        """
+        if self._access_token is None or self._token_due():
+            await self._reauthenticate(self._access_token)
+        return self._access_token
+
+    async def _query_api(
+        self, api: Literal["workflow", "repository"], query: dict, content_key: Optional[str], method: str = "POST"
+    ) -> Dict | List:
+        """
+        Generic API function
+
+        :param query: GraphQL query
+        :param api: API endpoint
+        :param content_key: Key mapping the actual data of the response, None for the whole data of the response
+        :param method: (Optional) HTTP method
+        :return: Response object or list of objects
+        """
+        if logger.isEnabledFor(DEBUG):
+            logger.debug(f"Querying API: {api} with query: {query}")
+        access_token = await self._current_token()
+        try:
+            return await self._send_query(api, query, content_key, method, access_token)
+        except (CPAuthorizationException, httpx.HTTPStatusError) as error:
+            if isinstance(error, httpx.HTTPStatusError) and error.response.status_code != 401:
+                raise
+
+            # The token was rejected, exchange the credentials once and retry the call
+            await self._reauthenticate(access_token)
+            return await self._send_query(api, query, content_key, method, self._access_token)
+
+    async def _send_query(
+        self,
+        api: Literal["workflow", "repository"],
+        query: dict,
+        content_key: Optional[str],
+        method: str,
+        access_token: Optional[str],
+    ) -> Dict | List:
+        started = time.perf_counter() if instrumentation.enabled() else None
+        async with self._semaphore:
+            try:
+                response = await self._session(api).request(
+                    method, self._urls[api], headers=self._api_headers(access_token), json=query
+                )
+            except httpx.RequestError as error:
+                if started is not None:
+                    instrumentation.emit(
+                        ApiCallEvent(
+                            api,
+                            query.get("operationName"),
+                            None,
+                            time.perf_counter() - started,
+                            error=type(error).__name__,
+                        )
+                    )
+                raise
+        if started is not None:
+            instrumentation.emit(
+                ApiCallEvent(
+                    api,
+                    query.get("operationName"),
+                    response.status_code,
+                    time.perf_counter() - started,
+                    request_bytes=len(response.request.content),
+                    response_bytes=len(response.content),
+                )
+            )
+
+        # Raise an exception for HTTP errors
+        response.raise_for_status()
+
+        return self._unwrap_response(response.json(), content_key)
+
+    async def _query_api_dict(
+        self, api: Literal["workflow", "repository"], query: dict, content_key: Optional[str], method: str = "POST"
+    ) -> Dict:
+        response = await self._query_api(api, query, content_key, method)
+        if isinstance(response, list):  # pragma: no cover
+            raise Exception("Expected a single object but got a list")
+
+        return response
+
+
+class AsyncStorageLocation(BaseStorageLocation):
+    """
+    asyncio counterpart of :func:`~castlabs.repository.StorageLocation`
+    """
+
+    repository: "AsyncRepository"
+
+    def __init__(self, config: dict, repository: "AsyncRepository") -> None:
+        super().__init__(config, repository)
+
+    async def create_upload_client(
+        self, path: str, message: str = "", upload_config: Optional[UploadConfig] = None
+    ) -> UploadClient:
+        """
+        See :func:`~castlabs.repository.StorageLocation.create_upload_client`. The upload ticket is created before
+        the client.
+        """
+        return await self.repository.create_upload_client(self, path, message, upload_config)
+
+
+class AsyncRepository:
+    """
+    asyncio counterpart of :func:`~castlabs.repository.Repository`
+    """
+
+    def __init__(self, client: AsyncClient, cache: Optional[Cache] = None, index: Optional[RepositoryIndex] = None):
+        self.client = client
+        self.cache = cache
+        self.index = index
+        self.s3_clients = S3ClientFactory()
+
+    async def get_storage_locations(self) -> List[AsyncStorageLocation]:
+        cache_key = f"roots|{self.client.cache_namespace}"
+        storage_configs = self.cache.get(cache_key) if self.cache else None
+        if storage_configs is None:
+            logger.info("Getting storage locations")
+            storage_configs = await self.client._query_api("repository", query=queries.get_roots(), content_key="roots")
+            if self.cache:
+                self.cache.set(cache_key, storage_configs, DEFAULT_TTL)
+        return [AsyncStorageLocation(storage_config, self) for storage_config in storage_configs]
+
+    async def get_storage_location(self, name: Optional[str] = None) -> AsyncStorageLocation:
+        """
+        :param name: (Optional) Name of the storage location if you want to select a non "master" location.
+        :return: A :class:`AsyncStorageLocation` object
+        """
+        for storage_location in await self.get_storage_locations():
+            if storage_location.name == (name or storage_location.name):
+                return storage_location
+
+        raise FileNotFoundError(f"Storage location with name {name} not found")
+
+    async def get_content_of_directory(
+        self, storage: AsyncStorageLocation, route: str, show_deleted: bool = False
+    ) -> List[ContentsOfDirectory]:
+        return [content async for content in self.iter_directory(storage, route, show_deleted)]
+
+    async def _get_folder(
+        self, storage: AsyncStorageLocation, route: str, show_deleted: bool = False, fields: FolderProjection = "full"
+    ) -> Dict[str, Any]:
+        """
+        See :meth:`~castlabs.repository.Repository._get_folder`
+        """
+        indexed = self.index is not None and not show_deleted
+        if indexed and fields != "full":
+            folder = self.index.get_folder(storage.full_location, route)  # type: ignore
+            if folder is not None:
+                return folder
+            fields = "sizes"
+
+        aws_key = storage.get_location_with_path(route, is_folder=True)
+        logger.info(f"Getting content of directory {aws_key}")
+        folder = await self.client._query_api_dict(
+            "repository", query=queries.get_folder(aws_key, show_deleted, fields), content_key="folder"
+        )
+        if indexed:
+            self.index.record(storage.full_location, route, folder)  # type: ignore
+        return folder
+
+    async def iter_directory(
+        self, storage: AsyncStorageLocation, route: str, show_deleted: bool = False, fields: FolderProjection = "full"
+    ) -> AsyncIterator[ContentsOfDirectory]:
+        """
+        See :meth:`~castlabs.repository.Repository.iter_directory`
+        """
+        folder = await self._get_folder(storage, route, show_deleted, fields)
+        for content in folder["folders"]:
+            yield content
+        for content in folder["files"]:
+            yield content
+
+    async def walk(
+        self,
+        storage: AsyncStorageLocation,
+        route: str,
+        show_deleted: bool = False,
+        fields: FolderProjection = "full",
+        max_concurrency: int = DEFAULT_WALK_CONCURRENCY,
+    ) -> AsyncIterator[FolderListing]:
+        """
+        See :meth:`~castlabs.repository.Repository.walk`
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        pending: Deque[str] = deque([route])
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while pending or running:
+                while pending and len(running) < max_concurrency:
+                    folder_route = pending.popleft()
+                    task = asyncio.ensure_future(self._get_folder(storage, folder_route, show_deleted, fields))
+                    running[task] = folder_route
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    folder_route = running.pop(task)
+                    folder = task.result()
+                    pending.extend(sub_route(folder_route, sub_folder["name"]) for sub_folder in folder["folders"])
+                    yield folder_route, folder["folders"], folder["files"]
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def create_upload_ticket(self, aws_key: str, message: str) -> str:
+        cache_key = f"ticket|{self.client.cache_namespace}|{aws_key}|{message}"
+        if self.cache and (url := self.cache.get(cache_key)) is not None:
+            return url
+
+        logger.info(f"Creating upload ticket for {aws_key}")
+        upload_payload = await self.client._query_api_dict(
+            "repository", query=queries.create_upload_ticket(aws_key, message), content_key="createUploadTicket"
+        )
+        if self.cache:
+            self.cache.set(cache_key, upload_payload["url"], DEFAULT_TTL)
+        return upload_payload["url"]
+
+    async def create_upload_client(
+        self,
+        storage: AsyncStorageLocation,
+        path: str,
+        message: str = "",
+        upload_config: Optional[UploadConfig] = None,
+    ) -> UploadClient:
+        """
+        :param storage: The AsyncStorageLocation to upload to
+        :param path: Defines a folder path to which you want to upload within the AsyncStorageLocation
+        :param message: A message that will be shown to the user if the upload ticket is accessed via a browser
+        :param upload_config: (Optional) Part size, concurrency and bandwidth of the uploads
+        :return: An :func:`~castlabs.repository.UploadClient` for the path
+        """
+        upload_url = await self.create_upload_ticket(storage.get_location_with_path(path, is_folder=True), message)
+        return UploadClient(
+            storage,
+            path,
+            message,
+            upload_url=upload_url,
+            upload_config=upload_config,
+            cache=self.cache,
+            s3_clients=self.s3_clients,
+        )
+
+
+class AsyncProcess(BaseProcess):
+    """
+    asyncio counterpart of :func:`~castlabs.workflow.Process`. Its state is pulled through
+    :meth:`AsyncWorkflow.refresh_state` and the details of a submitted process through
+    :meth:`AsyncWorkflow.load_details`.
+    """
+
+    _client: AsyncClient
+
+    def __init__(self, data: dict, client: AsyncClient, stale: bool = False, po_name: Optional[str] = None) -> None:
+        """
+        See :func:`~castlabs.workflow.BaseProcess`
+        """
+        super().__init__(data, client, stale, po_name)
+
+    @property
+    def content_url(self) -> str:
+        """
+        Returns a Cloudfront content URL to use in your player
+
+        :return: URL
+        """
+        if self._po_name is not None:
+            raise RuntimeError(f"The details of process {self.pk} are not loaded, see AsyncWorkflow.load_details")
+        return content_url(self.raw_data["output_brefix"])
+
+
+class AsyncWorkflow:
+    """
+    asyncio counterpart of :func:`~castlabs.workflow.Workflow`. The returned
+    :class:`AsyncProcess` objects are refreshed through :meth:`refresh_state` of this class.
+    """
+
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+    async def create_vod_encoding(
+        self,
+        storage_location: AsyncStorageLocation,
+        origin_folder: str,
+        group_name: str,
+        process_name: str,
+        destination: str = "vod",
+        template: str = "cmaf-abr",
+        format_specific_data: dict | str = "{}",
+        auto_publish: bool = True,
+        webhook_url: Optional[str] = None,
+        wait_timeout: int = 10,
+    ) -> AsyncProcess:
+        """
+        See :func:`~castlabs.workflow.Workflow.create_vod_encoding`. The details of the process are not looked up
+        lazily, see :func:`load_details`
+        """
+        logger.info(f"Creating VOD encoding for {origin_folder}")
+        workflow_process = await self.client._query_api_dict(
+            "workflow",
+            query=queries.start_workflow_vod_default(
+                input_brefix=storage_location.get_location_with_path(origin_folder, True)[5:],  # no s3://
+                po_item_id=process_name,
+                po_name=f"{self.client.organization_urn}_{group_name}",
+                po_destination=destination,
+                vtk_template=template,
+                auto_publish=auto_publish,
+                format_specific_data=format_specific_data,
+            ),
+            content_key="start_workflow_vod_default",
+        )
+
+        process = AsyncProcess.from_submission(
+            workflow_process, f"{self.client.organization_urn}_{group_name}", process_name, self.client, wait_timeout
+        )
+
+        if webhook_url:
+            await self.register_webhook(process, webhook_url)
+        return process
+
+    async def get_groups(self) -> List[str]:
+        logger.info("Getting groups")
+        response_data = await self.client._query_api_dict(
+            "workflow", query=queries.get_pos(self.client.organization_urn), content_key="list_POs"
+        )
+        return [po["po_name"].replace(f"{self.client.organization_urn}_", "") for po in response_data["pos"]]
+
+    async def get_processes(
+        self, group_name: str, fields: Projection = "full", refresh: bool = True
+    ) -> List[AsyncProcess]:
+        """
+        Lists the processes of a group with a single request
+
+        :param group_name: Name of the group you have specified
+        :param fields: (Optional) The fields requested per process, see
+        :func:`~castlabs.workflow.Workflow.get_processes`
+        :param refresh: (Optional) Pull the current state of all processes concurrently. Otherwise the state as listed
+        is used.
+        :return: List of :class:`AsyncProcess`
+        """
+        logger.info(f"Getting processes for group {group_name}")
+        po_name = f"{self.client.organization_urn}_{group_name}"
+        response_data = await self.client._query_api_dict(
+            "workflow", query=queries.po_item_list(po_name, fields), content_key="list_POs"
+        )
+        if not response_data["pos"]:
+            return []
+
+        poitems = response_data["pos"][0]["poitems"]
+        processes = [AsyncProcess(process_data, self.client, po_name=po_name) for process_data in poitems]
+        if refresh:
+            await asyncio.gather(*(self.refresh_state(process) for process in processes))
+        return processes
+
+    async def get_process(self, group_name: str, process_name: str, fields: Projection = "full") -> AsyncProcess:
+        """
+        Returns a process based on the group and process_name. Only the matching item of the group is requested.
+
+        :param group_name: Name of the group you have specified
+        :param process_name: Name of the encoding process
+        :param fields: (Optional) The fields requested for the process
+        :return: :class:`AsyncProcess`
+        """
+        logger.info(f"Getting process {process_name} of group {group_name}")
+        po_name = f"{self.client.organization_urn}_{group_name}"
+        response_data = await self.client._query_api_dict(
+            "workflow", query=queries.po_item(po_name, process_name, fields), content_key="list_POs"
+        )
+        return AsyncProcess(find_item(response_data, process_name), self.client, po_name=po_name)
+
+    async def refresh_state(self, process: AsyncProcess) -> AsyncProcess:
+        """
+        Pull the current state of a process
+        """
+        process_id = process._refresh_id()
+        if process_id is None:
+            process._stale = False
+            query = process._item_query()
+            if query is not None:
+                logger.info(f"Looking up the publish process of {process.pk}")
+                process._apply_item(await self.client._query_api_dict("workflow", query=query, content_key="list_POs"))
+            return process
+
+        logger.info(f"Refreshing state for process {process_id}")
+        response_data = await self.client._query_api_dict(
+            "workflow", query=queries.get_process(process_id), content_key="process"
+        )
+        return process._apply_refresh(response_data)
+
+    async def refresh_states(
+        self, processes: List[AsyncProcess], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[Optional[Exception]]:
+        """
+        Pulls the current state of many processes, `batch_size` processes per request. The batches are sent
+        concurrently.
+
+        :param processes: The processes to refresh
+        :param batch_size: (Optional) Number of processes per request
+        :return: The error per process if its batch failed, None otherwise
+        """
+        errors: List[Optional[Exception]] = [None] * len(processes)
+
+        async def refresh_batch(batch: List[Tuple[int, AsyncProcess, str]]) -> None:
+            logger.info(f"Refreshing state for {len(batch)} processes")
+            try:
+                response_data = await self.client._query_api_dict(
+                    "workflow",
+                    query=queries.get_processes([process_id for _, _, process_id in batch]),
+                    content_key=None,
+                )
+                for alias, (_, process, _) in enumerate(batch):
+                    process._apply_refresh(response_data[f"p{alias}"])
+            except Exception as e:
+                for index, _, _ in batch:
+                    errors[index] = e
+
+        await asyncio.gather(*(refresh_batch(batch) for batch in batch_refreshes(processes, batch_size)))
+
+        # the publish sub-process of an encoding that succeeded is only found through its PO item
+        async def look_up_items(items: List[Tuple[int, AsyncProcess]]) -> None:
+            logger.info(f"Looking up the publish process of {len(items)} processes")
+            try:
+                response_data = await self.client._query_api_dict(
+                    "workflow",
+                    query=queries.po_items([process._item_lookup() for _, process in items]),  # type: ignore
+                    content_key=None,
+                )
+                for alias, (_, process) in enumerate(items):
+                    process._apply_item(response_data[f"i{alias}"])
+            except Exception as e:
+                for index, _ in items:
+                    errors[index] = e
+
+        await asyncio.gather(*(look_up_items(items) for items in batch_item_lookups(processes, errors, batch_size)))
+        return errors
+
+    async def load_details(self, process: AsyncProcess) -> AsyncProcess:
+        """
+        See :func:`~castlabs.workflow.Process.load_details`
+        """
+        if process._po_name is None:
+            return process
+
+        timeout = datetime.now() + timedelta(seconds=process._wait_timeout)
+        backoff = Backoff(0.25, 2.0)
+        while True:
+            logger.info(f"Getting details of process {process.pk}")
+            response_data = await self.client._query_api_dict(
+                "workflow", query=queries.po_item(process._po_name, process.pk, "full"), content_key="list_POs"
+            )
+            if process._apply_details(response_data):
+                return process
+            if datetime.now() >= timeout:  # pragma: no cover
+                raise Exception("Timed out waiting for process to be created")
+            await asyncio.sleep(backoff.next_delay())  # pragma: no cover
+
+    async def register_webhook(self, process: AsyncProcess, url: str) -> None:
+        """
+        Registers a webhook for all sub-processes of a process
+        """
+        for attr_name in ("encoding_process", "publish_process"):
+            sub_process = getattr(process, attr_name)
+            if not sub_process or not sub_process.get("id"):
+                logger.info(f"{attr_name} not found, refreshing state...")
+                if process._po_name is not None:
+                    await self.load_details(process)
+                else:  # pragma: no cover
+                    await self.refresh_state(process)
+                sub_process = getattr(process, attr_name)
+
+            if not sub_process or not sub_process.get("id"):  # pragma: no cover
+                logger.warning(f"Could not register webhook for {attr_name}: Not initialized by server.")
+                continue
+
+            logger.info(f"Registering webhook for {attr_name} (ID: {sub_process['id']})")
+            await self.client._query_api(
+                "workflow", query=queries.register_webhook(sub_process["id"], url), content_key="registerWebhook"
+            )
+
+
+class AsyncContentPlatform:
+    """
+    asyncio counterpart of :func:`~castlabs.api.ContentPlatform`. A single event loop can drive many
+    encodings and uploads at once; `max_concurrency` caps the API requests in flight.
+    """
+
+    def __init__(
+        self,
+        organization_urn: str,
+        user_urn: str,
+        api_secret_access_key: str,
+        api_access_key_id: str,
+        environment: Literal["production", "staging"] = "production",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        cache: Optional[Cache] = None,
+        max_upload_clients: int = DEFAULT_MAX_UPLOAD_CLIENTS,
+        index: Optional[RepositoryIndex] = None,
+    ):
+        """
+        Initialize the SDK
+        :param organization_urn: The organization URN (urn:janus:accesskey:XXX)
+        :param user_urn: The user urn
+        :param api_secret_access_key: The secret access key to use (urn:janus:accesskey:XXX)
+        :param api_access_key_id: The key id
+        :param environment: Define 'production' (default) or 'staging'
+        :param pool_size: (Optional) Maximum number of connections per API host
+        :param max_concurrency: (Optional) Maximum number of API requests in flight
+        :param cache: (Optional) Cache of the storage locations, upload tickets and upload credentials, see
+        :func:`~castlabs.cache.SQLiteCache` to share them with other processes
+        :param max_upload_clients: (Optional) Maximum number of remote folders whose upload clients are kept
+        :param index: (Optional) Local index of the repository that answers the listings of recently listed folders,
+        see :class:`~castlabs.index.RepositoryIndex`
+        """
+        self._client = AsyncClient(
+            organization_urn=organization_urn,
+            user_urn=user_urn,
+            api_secret_access_key=api_secret_access_key,
+            api_access_key_id=api_access_key_id,
+            urls=API_URLS[environment],
+            pool_size=pool_size,
+            max_concurrency=max_concurrency,
+        )
+
+        self._repository = AsyncRepository(self._client, cache, index)
+        self._workflow = AsyncWorkflow(self._client)
+        self.__storage_location: Optional[asyncio.Task] = None
+        # the upload clients of the most recently used folders, with the time they were created
+        self.__upload_clients: "OrderedDict[str, Tuple[float, asyncio.Task]]" = OrderedDict()
+        self._max_upload_clients = max_upload_clients
+
+    async def close(self) -> None:
+        """
+        Close the pooled API connections
+        """
+        await self._client.close()
+
+    async def __aenter__(self) -> "AsyncContentPlatform":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _get_storage_location(self) -> AsyncStorageLocation:
+        """
+        The storage location is looked up once, concurrent callers share the lookup
+        """
+        if self.__storage_location is None:
+            self.__storage_location = asyncio.ensure_future(self._repository.get_storage_location())
+        try:
+            return await self.__storage_location
+        except Exception:
+            self.__storage_location = None
+            raise
+
+    async def _get_upload_client(self, path: str) -> UploadClient:
+        """
+        The upload client of a folder is created once, concurrent callers share its creation. Like
+        :class:`~castlabs.transfers.UploadClientCache`, the least recently used clients are dropped and a client is
+        created again once it is older than the lifetime of a cached upload ticket.
+        """
+        entry = self.__upload_clients.get(path)
+        if entry is None or time.monotonic() - entry[0] >= DEFAULT_TTL:
+
+            async def create() -> UploadClient:
+                return await self._repository.create_upload_client(await self._get_storage_location(), path)
+
+            entry = self.__upload_clients[path] = (time.monotonic(), asyncio.ensure_future(create()))
+            while len(self.__upload_clients) > self._max_upload_clients:
+                self.__upload_clients.popitem(last=False)
+        self.__upload_clients.move_to_end(path)
+        try:
+            return await entry[1]
+        except Exception:
+            if self.__upload_clients.get(path) is entry:
+                del self.__upload_clients[path]
+            raise
+
+    async def upload_file(
+        self,
+        file_path: str,
+        remote_path: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+    ) -> str:
+        """
+        Upload a file to a specific path. The transfer runs in a worker thread.
+        :param remote_path: The path to upload to
+        :param file_path: The file to upload
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the file, from the
+        worker thread
+        :param config: (Optional) Part size, concurrency and bandwidth of the upload, see
+        :func:`~castlabs.multipart.UploadConfig`
+        """
+        remote_path = remote_path or os.path.basename(file_path).replace(".", "_")
+        upload_client = await self._get_upload_client(remote_path)
+        await asyncio.to_thread(upload_client.upload_file, file_path, progress, config)
+
+        return remote_path
+
+    async def upload_stream(
+        self,
+        source: AsyncUploadSource,
+        name: str,
+        remote_path: Optional[str] = None,
+        size: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+    ) -> str:
+        """
+        Upload from an async iterator of byte chunks, a file-like object, a bytes-like object or an iterator of byte
+        chunks without writing it to disk. Parts are sent from worker threads while the next part is read.
+        :param source: The content to upload
+        :param name: Name of the remote file
+        :param remote_path: (Optional) The path to upload to, derived from the name by default
+        :param size: (Optional) Size of the content in bytes if it is known, to choose the part size
+        :param progress: (Optional) Called with the bytes transferred so far and the size, 0 if unknown, from the
+        worker threads
+        :param config: (Optional) Part size, concurrency and bandwidth of the upload
+        """
+        remote_path = remote_path or name.replace(".", "_")
+        upload_client = await self._get_upload_client(remote_path)
+        upload = await asyncio.to_thread(upload_client.create_streaming_upload, name, size, config)
+        await upload.run_async(source, progress)
+        upload_client.invalidate_listing()
+
+        return remote_path
+
+    async def list_files(self, remote_path: str) -> List[str]:
+        """
+        Read files from a specific path
+        :param remote_path: The path to read from
+        :return: The list of files
+        """
+        storage = await self._get_storage_location()
+        return [c["name"] async for c in self._repository.iter_directory(storage, remote_path, fields="names")]
+
+    async def iter_directory(
+        self, remote_path: str, show_deleted: bool = False, fields: FolderProjection = "full"
+    ) -> AsyncIterator[ContentsOfDirectory]:
+        """
+        See :meth:`~castlabs.api.ContentPlatform.iter_directory`
+        """
+        storage = await self._get_storage_location()
+        async for content in self._repository.iter_directory(storage, remote_path, show_deleted, fields):
+            yield content
+
+    async def walk(
+        self,
+        remote_path: str,
+        show_deleted: bool = False,
+        fields: FolderProjection = "full",
+        max_concurrency: int = DEFAULT_WALK_CONCURRENCY,
+    ) -> AsyncIterator[FolderListing]:
+        """
+        See :meth:`~castlabs.api.ContentPlatform.walk`
+        """
+        storage = await self._get_storage_location()
+        async for listing in self._repository.walk(storage, remote_path, show_deleted, fields, max_concurrency):
+            yield listing
+
+    async def start_encoding(
+        self,
+        remote_path: str,
+        group_name: str = "default_group",
+        encode_name: Optional[str] = None,
+        template: str = "cmaf-abr",
+        format_specific_data: Optional[dict | str] = "{}",
+        webhook_url: Optional[str] = None,
+    ) -> Encoding:
+        """
+        Encode the files uploaded to a specific path. Costs the mutation only, and the webhook registrations if a
+        webhook URL is given; the content URL is known once :meth:`get_status` finds the encoding.
+        :param remote_path: The path to encode
+        :param group_name: The group name
+        :param encode_name: The encode name
+        :param format_specific_data: Extra parameters for the encoding workflow
+        :param webhook_url: Optional URL for encoding status updates
+        """
+        encode_name = encode_name or remote_path.split("/")[-1]
+
+        process = await self._workflow.create_vod_encoding(
+            await self._get_storage_location(),
+            remote_path,
+            group_name,
+            encode_name,
+            template=template,
+            format_specific_data=format_specific_data,
+            webhook_url=webhook_url,
+        )
+
+        return Encoding.from_process(process, group_name, encode_name)
+
+    async def get_status(
+        self,
+        remote_path: Optional[str] = None,
+        group_name: str = "default_group",
+        encode_name: Optional[str] = None,
+    ) -> Encoding:
+        """
+        Get the status of an encoding
+        :param remote_path: The path is being encoded
+        :param group_name: The group name
+        :param encode_name: The encode name
+        """
+        if not encode_name:
+            if not remote_path:
+                raise ValueError("One of remote_path and encode_name must be provided")
+
+            encode_name = remote_path.split("/")[-1]
+
+        process = await self._workflow.get_process(group_name, encode_name, fields="status")
+        await self._workflow.refresh_state(process)
+
+        return Encoding.from_process(process, group_name, encode_name)
+
+    async def get_statuses(
+        self, encodings: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[Encoding | Exception]:
+        """
+        Get the status of many encodings. The groups are listed concurrently, once each, and the states are refreshed
+        in concurrent batches.
+        :param encodings: (group_name, encode_name) pairs
+        :param batch_size: (Optional) Number of processes refreshed per request
+        :return: An Encoding per pair in the order of the input, or the exception raised for the pair
+        """
+        encodings = list(encodings)
+        group_names = list(dict.fromkeys(group_name for group_name, _ in encodings))
+        listed = await asyncio.gather(
+            *(self._workflow.get_processes(name, fields="status", refresh=False) for name in group_names),
+            return_exceptions=True,
+        )
+
+        results, processes = match_processes(encodings, dict(zip(group_names, listed)))  # type: ignore
+        errors = dict(zip(processes, await self._workflow.refresh_states(list(processes.values()), batch_size)))
+        for index, encoding in enumerate(encodings):
+            if encoding in processes:
+                results[index] = errors[encoding] or Encoding.from_process(processes[encoding], *encoding)
+
+        return results  # type: ignore
+
+    async def get_groups(self) -> List[str]:
+        """
+        Get the list of groups
+        """
+        return await self._workflow.get_groups()
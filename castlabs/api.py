@@ -1,36 +1,123 @@
 import os
+import threading
 from datetime import timezone
-from typing import Dict, List, Literal, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, TypeVar
 
 from pydantic import BaseModel, computed_field
 
+from castlabs.cache import Cache
 from castlabs.client import Client
-from castlabs.repository import StorageLocation, UploadClient
+from castlabs.index import RepositoryIndex
+from castlabs.multipart import ProgressCallback, UploadConfig, UploadSource
+from castlabs.polling import COMPLETE_STATES, DEFAULT_MAX_POLL_RATE, PollPolicy, PollScheduler, RateLimiter
+from castlabs.queries import FolderProjection
+from castlabs.records import DirectoryEntry, FileColumns, ProcessRecord, content_url
+from castlabs.repository import (
+    DEFAULT_WALK_CONCURRENCY,
+    ContentsOfDirectory,
+    FolderListing,
+    StorageLocation,
+    UploadClient,
+)
+from castlabs.resilience import RetryPolicy
+from castlabs.submissions import (
+    DEFAULT_MAX_SUBMIT_RATE,
+    DEFAULT_SUBMIT_CONCURRENCY,
+    EncodingJob,
+    SubmissionResult,
+    submit_encodings,
+)
+from castlabs.sync import (
+    DEFAULT_SYNC_DIR,
+    CompareMode,
+    SyncManifest,
+    SyncReport,
+    list_remote_tree,
+    plan_sync,
+    record_uploads,
+)
+from castlabs.transfers import (
+    DEFAULT_LARGE_FILE_CONCURRENCY,
+    DEFAULT_MAX_UPLOAD_CLIENTS,
+    DEFAULT_SMALL_FILE_CONCURRENCY,
+    UploadClientCache,
+    UploadReport,
+    plan_directory,
+    upload_jobs,
+)
+from castlabs.transport import DEFAULT_POOL_SIZE
 from castlabs.urls import API_URLS
+from castlabs.workflow import DEFAULT_BATCH_SIZE, BaseProcess, Process
+
+if TYPE_CHECKING:  # pragma: no cover
+    from castlabs.aio import AsyncProcess
 
 UTC = timezone.utc
 
+P = TypeVar("P", bound=BaseProcess)
+
 
 class Encoding(BaseModel):
-    content_url: str
+    # None for an encoding that was just started, until its PO item is looked up, see ContentPlatform.get_status
+    content_url: Optional[str] = None
     status: str
     group_name: str
     encode_name: str
 
     @computed_field
     @property
-    def hls_url(self) -> str:
-        return self.content_url + "hls.m3u8"
+    def hls_url(self) -> Optional[str]:
+        return self.content_url + "hls.m3u8" if self.content_url else None
 
     @computed_field
     @property
-    def dash_url(self) -> str:
-        return self.content_url + "dash.mpd"
+    def dash_url(self) -> Optional[str]:
+        return self.content_url + "dash.mpd" if self.content_url else None
 
     @computed_field
     @property
     def complete(self) -> bool:
-        return self.status in ["PUBLISH_SUCCESS", "ENCODING_FAILED", "PUBLISH_FAILED"]
+        return self.status in COMPLETE_STATES
+
+    @classmethod
+    def from_process(cls, process: "Process | AsyncProcess", group_name: str, encode_name: str) -> "Encoding":
+        # the PO item of a submitted process is not looked up here, that may wait until the item is listed
+        output_brefix = process.raw_data.get("output_brefix")
+        return cls(
+            content_url=content_url(output_brefix) if output_brefix else None,
+            status=process.state,
+            group_name=group_name,
+            encode_name=encode_name,
+        )
+
+
+def match_processes(
+    encodings: List[Tuple[str, str]], listings: Dict[str, List[P] | Exception]
+) -> Tuple[List[Encoding | Exception | None], Dict[Tuple[str, str], P]]:
+    """
+    Finds the process of every (group_name, encode_name) pair in the listings of the groups
+
+    :param encodings: (group_name, encode_name) pairs
+    :param listings: The processes of each group, or the exception raised while listing the group
+    :return: The error per pair (None where a process was found) and the processes found
+    """
+    results: List[Encoding | Exception | None] = [None] * len(encodings)
+    by_name = {
+        group_name: {process.pk: process for process in listing}
+        for group_name, listing in listings.items()
+        if not isinstance(listing, Exception)
+    }
+    processes: Dict[Tuple[str, str], P] = {}
+    for index, (group_name, encode_name) in enumerate(encodings):
+        listing = listings[group_name]
+        if isinstance(listing, Exception):
+            results[index] = listing
+        elif encode_name in by_name[group_name]:
+            processes[(group_name, encode_name)] = by_name[group_name][encode_name]
+        else:
+            results[index] = KeyError(f"Process {encode_name} not found in group {group_name}")
+
+    return results, processes
 
 
 class UploadCredentials(BaseModel):
@@ -50,6 +137,12 @@ class ContentPlatform:
         api_secret_access_key: str,
         api_access_key_id: str,
         environment: Literal["production", "staging"] = "production",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_poll_rate: float = DEFAULT_MAX_POLL_RATE,
+        cache: Optional[Cache] = None,
+        max_upload_clients: int = DEFAULT_MAX_UPLOAD_CLIENTS,
+        index: Optional[RepositoryIndex] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
         """
         Initialize the SDK
@@ -58,6 +151,15 @@ class ContentPlatform:
         :param api_secret_access_key: The secret access key to use (urn:janus:accesskey:XXX)
         :param api_access_key_id: The key id
         :param environment: Define 'production' (default) or 'staging'
+        :param pool_size: (Optional) Maximum number of keep-alive connections per API host
+        :param max_poll_rate: (Optional) Maximum number of requests per second sent while waiting for encodings
+        :param cache: (Optional) Cache of the storage locations, upload tickets and upload credentials, see
+        :func:`~castlabs.cache.SQLiteCache` to share them with other processes
+        :param max_upload_clients: (Optional) Maximum number of remote folders whose upload clients are kept
+        :param index: (Optional) Local index of the repository that answers the listings of recently listed folders,
+        see :class:`~castlabs.index.RepositoryIndex`
+        :param retry_policy: (Optional) When failed API requests are sent again, see
+        :func:`~castlabs.resilience.RetryPolicy`
         """
 
         self._client = Client(
@@ -66,13 +168,33 @@ class ContentPlatform:
             api_secret_access_key=api_secret_access_key,
             api_access_key_id=api_access_key_id,
             urls=API_URLS[environment],
+            pool_size=pool_size,
+            retry_policy=retry_policy,
         )
 
         # Initalize Properties
         self.__repository = None
         self.__workflow = None
         self.__storage_location = None
-        self.__upload_clients = {}
+        self.__storage_location_lock = threading.Lock()
+        self.__upload_clients = UploadClientCache(
+            lambda path: self._storage_location.create_upload_client(path), max_size=max_upload_clients
+        )
+        self._poll_limiter = RateLimiter(max_poll_rate)
+        self._cache = cache
+        self._index = index
+
+    def close(self) -> None:
+        """
+        Close the pooled API connections
+        """
+        self._client.close()
+
+    def __enter__(self) -> "ContentPlatform":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     @property
     def _repository(self):
@@ -82,7 +204,7 @@ class ContentPlatform:
         if self.__repository is None:
             from castlabs.repository import Repository
 
-            self.__repository = Repository(self._client)
+            self.__repository = Repository(self._client, self._cache, self._index)
         return self.__repository
 
     @property
@@ -101,8 +223,15 @@ class ContentPlatform:
         """
         Access the storage location API
         """
-        if self.__storage_location is None:
-            self.__storage_location = self._repository.get_storage_location()
+        return self._get_storage_location()
+
+    def _get_storage_location(self) -> StorageLocation:
+        """
+        The storage location is looked up once, concurrent callers share the lookup
+        """
+        with self.__storage_location_lock:
+            if self.__storage_location is None:
+                self.__storage_location = self._repository.get_storage_location()
 
         return self.__storage_location
 
@@ -110,9 +239,6 @@ class ContentPlatform:
         """
         Access the storage location API
         """
-        if path not in self.__upload_clients:  # pragma: no cover
-            self.__upload_clients[path] = self._storage_location.create_upload_client(path)
-
         return self.__upload_clients[path]
 
     def get_upload_url(self, remote_path: str) -> str:
@@ -123,17 +249,189 @@ class ContentPlatform:
         """
         return self._get_upload_client(remote_path).upload_url  # pragma: no cover
 
-    def upload_file(self, file_path: str, remote_path: Optional[str] = None) -> str:
+    def upload_file(
+        self,
+        file_path: str,
+        remote_path: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+    ) -> str:
         """
         Upload a file to a specific path
         :param remote_path: The path to upload to
         :param file_path: The file to upload
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the file
+        :param config: (Optional) Part size, concurrency and bandwidth of the upload, see
+        :func:`~castlabs.multipart.UploadConfig`
         """
         remote_path = remote_path or os.path.basename(file_path).replace(".", "_")
-        self._get_upload_client(remote_path).upload_file(file_path)
+        self._get_upload_client(remote_path).upload_file(file_path, progress, config)
+
+        return remote_path
+
+    def upload_stream(
+        self,
+        source: UploadSource,
+        name: str,
+        remote_path: Optional[str] = None,
+        size: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+    ) -> str:
+        """
+        Upload from a file-like object, a bytes-like object or an iterator of byte chunks without writing it to disk
+        :param source: The content to upload, for example the body of an HTTP response
+        :param name: Name of the remote file
+        :param remote_path: (Optional) The path to upload to, derived from the name by default
+        :param size: (Optional) Size of the content in bytes if it is known, to choose the part size
+        :param progress: (Optional) Called with the bytes transferred so far and the size, 0 if unknown
+        :param config: (Optional) Part size, concurrency and bandwidth of the upload
+        """
+        remote_path = remote_path or name.replace(".", "_")
+        self._get_upload_client(remote_path).upload_stream(source, name, size, progress, config)
 
         return remote_path
 
+    def upload_files(
+        self,
+        file_paths: Iterable[str],
+        remote_path: str,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+        small_file_concurrency: int = DEFAULT_SMALL_FILE_CONCURRENCY,
+        large_file_concurrency: int = DEFAULT_LARGE_FILE_CONCURRENCY,
+    ) -> UploadReport:
+        """
+        Upload many files to a specific path. Small files are uploaded at a high concurrency, large files fewer at
+        a time with their parts uploaded in parallel.
+        :param file_paths: The files to upload
+        :param remote_path: The path to upload to
+        :param progress: (Optional) Called with the bytes transferred so far and the size of all files
+        :param config: (Optional) Part size, concurrency and bandwidth of the uploads
+        :param small_file_concurrency: (Optional) Number of files below the multipart threshold uploaded at once
+        :param large_file_concurrency: (Optional) Number of files above the multipart threshold uploaded at once
+        :return: The result per file and the aggregate throughput
+        """
+        return self._upload_jobs(
+            [(file_path, remote_path) for file_path in file_paths],
+            progress,
+            config,
+            small_file_concurrency,
+            large_file_concurrency,
+        )
+
+    def upload_directory(
+        self,
+        local_dir: str,
+        remote_path: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+        small_file_concurrency: int = DEFAULT_SMALL_FILE_CONCURRENCY,
+        large_file_concurrency: int = DEFAULT_LARGE_FILE_CONCURRENCY,
+    ) -> UploadReport:
+        """
+        Upload a local directory tree, keeping its structure below the remote path
+        :param local_dir: The directory to upload
+        :param remote_path: (Optional) The path to upload to, the name of the directory by default
+        :param progress: (Optional) Called with the bytes transferred so far and the size of all files
+        :param config: (Optional) Part size, concurrency and bandwidth of the uploads
+        :param small_file_concurrency: (Optional) Number of files below the multipart threshold uploaded at once
+        :param large_file_concurrency: (Optional) Number of files above the multipart threshold uploaded at once
+        :return: The result per file and the aggregate throughput
+        """
+        remote_path = remote_path or os.path.basename(os.path.normpath(local_dir))
+        return self._upload_jobs(
+            plan_directory(local_dir, remote_path),
+            progress,
+            config,
+            small_file_concurrency,
+            large_file_concurrency,
+        )
+
+    def sync_directory(
+        self,
+        local_dir: str,
+        remote_path: Optional[str] = None,
+        compare: CompareMode = "checksum",
+        dry_run: bool = False,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+        sync_dir: str = DEFAULT_SYNC_DIR,
+        small_file_concurrency: int = DEFAULT_SMALL_FILE_CONCURRENCY,
+        large_file_concurrency: int = DEFAULT_LARGE_FILE_CONCURRENCY,
+    ) -> SyncReport:
+        """
+        Upload the files of a local directory tree that are new or changed since they were last uploaded. Remote files
+        without a local one are reported but not deleted.
+        :param local_dir: The directory to sync
+        :param remote_path: (Optional) The path to sync to, the name of the directory by default
+        :param compare: (Optional) How a local file is compared with the remote file: by 'size', by size and 'mtime',
+        by size and the 'checksum' recorded when it was last uploaded (by size and S3 'etag' if there is no checksum
+        recorded yet), or by size and S3 'etag'
+        :param dry_run: (Optional) Only compare, do not upload
+        :param progress: (Optional) Called with the bytes transferred so far and the size of all files to upload
+        :param config: (Optional) Part size, concurrency and bandwidth of the uploads
+        :param sync_dir: (Optional) Directory of the checksum manifests
+        :param small_file_concurrency: (Optional) Number of files below the multipart threshold uploaded at once
+        :param large_file_concurrency: (Optional) Number of files above the multipart threshold uploaded at once
+        :return: The action per file and the result of the uploads
+        """
+        remote_path = remote_path or os.path.basename(os.path.normpath(local_dir))
+        manifest = SyncManifest(local_dir, remote_path, sync_dir) if compare == "checksum" else None
+
+        def list_remote_files() -> Dict[str, ContentsOfDirectory]:
+            return list_remote_tree(
+                self._repository.walk(self._storage_location, remote_path, fields="sizes"), remote_path
+            )
+
+        remote_files = list_remote_files()
+        entries = plan_sync(
+            local_dir,
+            remote_path,
+            remote_files,
+            compare=compare,
+            manifest=manifest,
+            remote_etag=lambda folder, name: self._get_upload_client(folder).remote_etag(name),
+            config=config,
+        )
+        report = SyncReport(entries=entries)
+        if dry_run:
+            return report
+
+        report.upload_report = self._upload_jobs(
+            [(entry.local_path, entry.remote_path) for entry in report.to_upload],
+            progress,
+            config,
+            small_file_concurrency,
+            large_file_concurrency,
+        )
+        if manifest is not None:
+            # the new last_modified of the uploaded files tells later syncs whether someone else changed them
+            record_uploads(
+                manifest, entries, report.upload_report, list_remote_files() if report.to_upload else remote_files
+            )
+            manifest.save()
+        return report
+
+    def _upload_jobs(
+        self,
+        jobs: List[Tuple[str, str]],
+        progress: Optional[ProgressCallback],
+        config: Optional[UploadConfig],
+        small_file_concurrency: int,
+        large_file_concurrency: int,
+    ) -> UploadReport:
+        # a failed lookup of the storage location fails the call instead of every job
+        self._get_storage_location()
+        return upload_jobs(
+            jobs,
+            self._get_upload_client,
+            config=config,
+            progress=progress,
+            small_file_concurrency=small_file_concurrency,
+            large_file_concurrency=large_file_concurrency,
+        )
+
     def get_upload_credentials(self, remote_path: str) -> UploadCredentials:
         """
         Get the upload credentials for a specific path
@@ -152,7 +450,111 @@ class ContentPlatform:
         :param remote_path: The path to read from
         :return: The list of files
         """
-        return [c["name"] for c in self._repository.get_content_of_directory(self._storage_location, remote_path)]
+        return [c["name"] for c in self._repository.iter_directory(self._storage_location, remote_path, fields="names")]
+
+    def iter_directory(
+        self, remote_path: str, show_deleted: bool = False, fields: FolderProjection = "full"
+    ) -> Iterator[ContentsOfDirectory]:
+        """
+        The sub folders of a remote folder followed by its files
+        :param remote_path: The path to read from
+        :param show_deleted: (Optional) Include deleted files
+        :param fields: (Optional) The fields of the files: 'names', 'sizes' (name, size and last_modified) or 'full'
+        :return: An iterator of the folders and files
+        """
+        return self._repository.iter_directory(self._storage_location, remote_path, show_deleted, fields)
+
+    def walk(
+        self,
+        remote_path: str,
+        show_deleted: bool = False,
+        fields: FolderProjection = "full",
+        max_concurrency: int = DEFAULT_WALK_CONCURRENCY,
+    ) -> Iterator[FolderListing]:
+        """
+        Walk a remote folder and all of its sub folders, listing up to `max_concurrency` folders at once
+        :param remote_path: The path to walk
+        :param show_deleted: (Optional) Include deleted files
+        :param fields: (Optional) The fields of the files: 'names', 'sizes' (name, size and last_modified) or 'full'
+        :param max_concurrency: (Optional) Maximum number of folder listings in flight
+        :return: The route, the sub folders and the files of every folder, each folder after its parent
+        """
+        return self._repository.walk(self._storage_location, remote_path, show_deleted, fields, max_concurrency)
+
+    def list_entries(self, remote_path: str, fields: FolderProjection = "sizes") -> List[DirectoryEntry]:
+        """
+        List a remote folder as compact records
+        :param remote_path: The path to read from
+        :param fields: (Optional) The fields of the files: 'names', 'sizes' (name, size and last_modified) or 'full'
+        :return: The sub folders followed by the files
+        """
+        folder = self._repository._get_folder(self._storage_location, remote_path, fields=fields)
+        return DirectoryEntry.from_folder(folder["folders"], folder["files"])
+
+    def list_file_columns(self, remote_path: str, max_concurrency: int = DEFAULT_WALK_CONCURRENCY) -> FileColumns:
+        """
+        List the files of a remote folder and all of its sub folders in columns of paths, sizes and modification times
+        :param remote_path: The path to walk
+        :param max_concurrency: (Optional) Maximum number of folder listings in flight
+        :return: The files that are not deleted, by their path relative to the folder
+        """
+        return FileColumns.from_walk(
+            self.walk(remote_path, fields="sizes", max_concurrency=max_concurrency), remote_path
+        )
+
+    def stat(self, remote_path: str) -> Optional[DirectoryEntry]:
+        """
+        Look up a remote file or folder. With an index, the folder is only listed if its listing is not fresh.
+        :param remote_path: Path of the file or folder
+        :return: The file or folder, or None if it does not exist
+        """
+        route, _, name = remote_path.strip("/").rpartition("/")
+        if self._index is not None:
+            root = self._storage_location.full_location
+            if not self._index.is_fresh(root, route):
+                self._repository._get_folder(self._storage_location, route, fields="sizes")
+            return self._index.stat(root, remote_path)
+
+        folder = self._repository._get_folder(self._storage_location, route, fields="sizes")
+        for sub_folder in folder["folders"]:
+            if sub_folder["name"] == name:
+                return DirectoryEntry.from_content(sub_folder, is_folder=True)
+        for file in folder["files"]:
+            if file["name"] == name:
+                return DirectoryEntry.from_content(file)
+        return None
+
+    def exists(self, remote_path: str) -> bool:
+        """
+        :param remote_path: Path of a file or folder
+        :return: True if the remote file or folder exists, see :meth:`stat`
+        """
+        return self.stat(remote_path) is not None
+
+    def find_files(self, prefix: str, max_concurrency: int = DEFAULT_WALK_CONCURRENCY) -> FileColumns:
+        """
+        Find the remote files whose path starts with a prefix. The folder of the prefix is walked; with an index, only
+        the folders whose listings are not fresh are listed and the files are looked up in the index.
+        :param prefix: The beginning of the paths, e.g. `title_1/` or `title_1/segment_`
+        :param max_concurrency: (Optional) Maximum number of folder listings in flight
+        :return: The files by their path within the storage location, in the order of their paths
+        """
+        prefix = prefix.lstrip("/")
+        route = prefix.rpartition("/")[0]
+        listings = self.walk(route, fields="sizes", max_concurrency=max_concurrency)
+        if self._index is not None:
+            for _ in listings:
+                pass
+            return self._index.files_with_prefix(self._storage_location.full_location, prefix)
+
+        columns = FileColumns.from_walk(listings, "")
+        matching = FileColumns()
+        for path, size, mtime in sorted(columns):
+            if path.startswith(prefix):
+                matching.paths.append(path)
+                matching.sizes.append(size)
+                matching.mtimes.append(mtime)
+        return matching
 
     def start_encoding(
         self,
@@ -164,7 +566,8 @@ class ContentPlatform:
         webhook_url: Optional[str] = None,
     ) -> Encoding:
         """
-        Encode the files uploaded to a specific path
+        Encode the files uploaded to a specific path. Costs the mutation only, and the webhook registrations if a
+        webhook URL is given; the content URL is known once :meth:`get_status` finds the encoding.
         :param path: The path to encode
         :param group_name: The group name
         :param encode_name: The encode name
@@ -181,13 +584,32 @@ class ContentPlatform:
             format_specific_data=format_specific_data,
             webhook_url=webhook_url,
         )
-        process.refresh_state()
 
-        return Encoding(
-            content_url=process.content_url,
-            status=process.state,
-            group_name=group_name,
-            encode_name=encode_name,
+        return Encoding.from_process(process, group_name, encode_name)
+
+    def start_encodings(
+        self,
+        jobs: Iterable[EncodingJob],
+        max_concurrency: int = DEFAULT_SUBMIT_CONCURRENCY,
+        max_rate: float = DEFAULT_MAX_SUBMIT_RATE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[SubmissionResult]:
+        """
+        Start many encodings in parallel. Every group is listed once and the jobs whose encoding already exists are
+        skipped, so a batch can be submitted again after a failure. Webhooks are registered in batches.
+        :param jobs: The encodings to start
+        :param max_concurrency: (Optional) Number of workflows started at once
+        :param max_rate: (Optional) Maximum number of workflows started per second
+        :param batch_size: (Optional) Number of webhooks registered per request
+        :return: Iterator of the result per job as soon as its workflow is started or skipped
+        """
+        return submit_encodings(
+            jobs,
+            self._workflow,
+            self._storage_location,
+            max_concurrency=max_concurrency,
+            max_rate=max_rate,
+            batch_size=batch_size,
         )
 
     def get_status(
@@ -208,18 +630,121 @@ class ContentPlatform:
 
             encode_name = remote_path.split("/")[-1]
 
-        process = self._workflow.get_process(group_name, encode_name)
+        process = self._workflow.get_process(group_name, encode_name, fields="status")
         process.refresh_state()
 
-        return Encoding(
-            content_url=process.content_url,
-            status=process.state,
-            group_name=group_name,
-            encode_name=encode_name,
-        )
+        return Encoding.from_process(process, group_name, encode_name)
+
+    def get_statuses(
+        self, encodings: Iterable[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[Encoding | Exception]:
+        """
+        Get the status of many encodings. Every group is listed once and the states are refreshed in batches.
+        :param encodings: (group_name, encode_name) pairs
+        :param batch_size: (Optional) Number of processes refreshed per request
+        :return: An Encoding per pair in the order of the input, or the exception raised for the pair
+        """
+        encodings = list(encodings)
+        results, processes = self._find_processes(encodings)
+        errors = dict(zip(processes, self._workflow.refresh_states(list(processes.values()), batch_size)))
+        for index, encoding in enumerate(encodings):
+            if encoding in processes:
+                results[index] = errors[encoding] or Encoding.from_process(processes[encoding], *encoding)
+
+        return results  # type: ignore
+
+    def iter_completed(
+        self,
+        encodings: Iterable[Tuple[str, str]],
+        timeout: Optional[float] = None,
+        policy: Optional[PollPolicy] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[Encoding | Exception]:
+        """
+        Wait for many encodings, yielding each one as soon as it is complete. Every encoding is polled on its own
+        exponential backoff: tightly while pending, relaxed during the encode. The requests of all waits of the
+        platform are limited to `max_poll_rate` per second.
+        :param encodings: (group_name, encode_name) pairs
+        :param timeout: (Optional) Seconds until a TimeoutError is raised for the encodings still running
+        :param policy: (Optional) Poll intervals per state, see :func:`~castlabs.polling.PollPolicy`
+        :param batch_size: (Optional) Number of processes refreshed per request
+        :return: Iterator of completed Encodings, or the exception raised while looking up an encoding
+        """
+        for _, result in self._watch(list(encodings), timeout, policy, batch_size):
+            yield result
+
+    def wait_for_encodings(
+        self,
+        encodings: Iterable[Tuple[str, str]],
+        on_complete: Optional[Callable[[Encoding | Exception], None]] = None,
+        timeout: Optional[float] = None,
+        policy: Optional[PollPolicy] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> List[Encoding | Exception]:
+        """
+        Wait until all encodings are complete, see :func:`iter_completed`
+        :param encodings: (group_name, encode_name) pairs
+        :param on_complete: (Optional) Called with every encoding as soon as it is complete
+        :param timeout: (Optional) Seconds until a TimeoutError is raised for the encodings still running
+        :param policy: (Optional) Poll intervals per state, see :func:`~castlabs.polling.PollPolicy`
+        :param batch_size: (Optional) Number of processes refreshed per request
+        :return: The completed Encoding per pair in the order of the input, or the exception raised for the pair
+        """
+        encodings = list(encodings)
+        completed: Dict[Tuple[str, str], Encoding | Exception] = {}
+        for encoding, result in self._watch(encodings, timeout, policy, batch_size):
+            completed[encoding] = result
+            if on_complete:
+                on_complete(result)
+
+        return [completed[encoding] for encoding in encodings]
+
+    def _watch(
+        self,
+        encodings: List[Tuple[str, str]],
+        timeout: Optional[float],
+        policy: Optional[PollPolicy],
+        batch_size: int,
+    ) -> Iterator[Tuple[Tuple[str, str], Encoding | Exception]]:
+        """
+        Yields (group_name, encode_name) and the result of every distinct encoding in the order of completion
+        """
+        encodings = list(dict.fromkeys(encodings))
+        self._poll_limiter.acquire(len(set(group_name for group_name, _ in encodings)))
+        results, processes = self._find_processes(encodings)
+        for encoding, result in zip(encodings, results):
+            if result is not None:
+                yield encoding, result
+
+        scheduler = PollScheduler(self._workflow, self._poll_limiter, batch_size, policy=policy)
+        for encoding in scheduler.watch(processes, timeout=timeout):  # type: ignore
+            yield encoding, Encoding.from_process(processes[encoding], *encoding)  # type: ignore
+
+    def _find_processes(
+        self, encodings: List[Tuple[str, str]]
+    ) -> Tuple[List[Encoding | Exception | None], Dict[Tuple[str, str], Process]]:
+        """
+        Lists every group of the encodings once, with the state as listed
+        """
+        listings: Dict[str, List[Process] | Exception] = {}
+        for group_name in dict.fromkeys(group_name for group_name, _ in encodings):
+            try:
+                listings[group_name] = self._workflow.get_processes(group_name, fields="status", lazy_refresh=False)
+            except Exception as e:
+                listings[group_name] = e
+
+        return match_processes(encodings, listings)
 
     def get_groups(self) -> List[str]:
         """
         Get the list of groups
         """
         return self._workflow.get_groups()
+
+    def get_process_records(self, group_name: str = "default_group") -> List[ProcessRecord]:
+        """
+        List the encodings of a group as compact records with their state as listed
+        :param group_name: (Optional) The group of the encodings
+        :return: The records of the encodings
+        """
+        return self._workflow.get_process_records(group_name)
@@ -0,0 +1,172 @@
+"""
+Caches of storage locations, upload tickets and upload credentials, so that short-lived processes skip the API
+round-trips of the ones before them
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from logging import getLogger
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = getLogger("castlabs.cache")
+
+# Database of the cache shared by the processes of a host
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".castlabs", "cache.sqlite3")
+# Lifetime of cached storage locations and upload tickets
+DEFAULT_TTL = 3600
+# Cached upload credentials are dropped this long before they expire, when botocore starts refreshing them
+CREDENTIALS_REFRESH_MARGIN = 15 * 60
+
+
+class Cache(ABC):
+    """
+    Base class of the caches: JSON-serializable values by key, each with a time to live in seconds
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """
+        :return: The value of the key, or None if it is missing or expired
+        """
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """
+        :param key: The key
+        :param value: The JSON-serializable value
+        :param ttl: Time to live of the value in seconds
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """
+        Removes the value of the key, if any
+        """
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes all values
+        """
+
+    def get_or_set(self, key: str, create: Callable[[], Any], ttl: float = DEFAULT_TTL) -> Any:
+        """
+        :param key: The key
+        :param create: Creates the value if it is not cached
+        :param ttl: (Optional) Time to live of a created value in seconds
+        :return: The cached or created value
+        """
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.set(key, value, ttl)
+        else:
+            logger.debug(f"Cache hit for {key.split('|')[0]}")
+        return value
+
+
+class MemoryCache(Cache):
+    """
+    A cache in the memory of the process, shared by all platforms given the same instance
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(Cache):
+    """
+    A cache in a SQLite database file, shared by the processes of a host. The database holds upload credentials and
+    is created readable by its owner only.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, clock: Callable[[], float] = time.time):
+        """
+        :param path: (Optional) Path of the database file
+        :param clock: (Optional) Returns the current time in seconds since the epoch
+        """
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            connection.execute("DELETE FROM cache WHERE expires <= ?", (self._clock(),))
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        One connection per thread, SQLite serializes the writers of all processes
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connection().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires <= self._clock():
+            self.delete(key)
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._clock() + ttl),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        """
+        Close the connection of the calling thread
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -1,14 +1,19 @@
 import base64
 import json
+import threading
+import time
+import weakref
 from datetime import datetime, timezone
 from hashlib import sha1, sha256
 from hmac import HMAC
-from logging import getLogger
-from typing import Dict, List, Literal
+from logging import DEBUG, getLogger
+from typing import Dict, List, Literal, Optional, Tuple
 
-import requests
+from requests import HTTPError
 
 from castlabs.errors import CPAuthorizationException, CPMalformedHttpRequestException
+from castlabs.resilience import RetryPolicy
+from castlabs.transport import DEFAULT_POOL_SIZE, Transport
 from castlabs.urls import ApiUrls
 
 UTC = timezone.utc
@@ -16,18 +21,32 @@ UTC = timezone.utc
 
 logger = getLogger("castlabs.client")
 
+# Refresh the access token this many seconds before it expires (at most half of its lifetime)
+DEFAULT_REFRESH_MARGIN = 300
+# Delay before a failed background refresh is retried
+REFRESH_RETRY_DELAY = 30
 
-class Client:
+
+def decode_token_expiry(token: str) -> Optional[float]:
     """
-    The contentPlatformSDK introduces naming of Objects that deviate from the GraphQL for the better understanding
-    of generic Workflows.
+    Read the expiry of a JWT access token. The signature is not verified, the value is only used to schedule
+    the refresh of the token.
 
-    Mapping of terms:
-    * PO -> Group
-    * PO Item -> Process
-    * workflow_process -> encoding_process (this and the publish_process are SUB processes of a Process object)
-    * Workflow - The API module for managing Processes
-    * Repository - The API module for managing the Filesystem
+    :param token: The access token
+    :return: Expiry as UNIX timestamp or None if the token carries no expiry
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class BaseClient:
+    """
+    Credentials, request signing and response handling shared by the blocking :func:`~castlabs.client.Client`
+    and the asyncio :func:`~castlabs.aio.AsyncClient`.
     """
 
     def __init__(
@@ -37,16 +56,8 @@ class Client:
         api_secret_access_key: str,
         api_access_key_id: str,
         urls: ApiUrls,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
     ):
-        """
-        Initialize the SDK
-        :param organization_urn: The organization URN (urn:janus:accesskey:XXX)
-        :param user_urn: The user urn
-        :param secret_access_key: The secret access key to use (urn:janus:accesskey:XXX)
-        :param access_key_id: The key id
-        :param environment: Define 'production' (default) or 'staging'
-        """
-
         # for key exchange
         self.organization_urn = organization_urn
         self.organization_id = self.organization_urn.split(":")[-1]
@@ -56,13 +67,25 @@ class Client:
 
         # for authenticating the users actions
         self._id_token = None
-        self._access_token = None
+        self._access_token: Optional[str] = None
+        self._refresh_margin = refresh_margin
+        self._refresh_at: Optional[float] = None
 
         self._urls = urls
 
-        self._authenticate()
+    @property
+    def cache_namespace(self) -> str:
+        """
+        Separates the cached values of users, organizations and environments
+        """
+        return f"{self._urls['repository']}|{self.organization_urn}|{self._user_urn}"
 
-    def _authenticate(self) -> None:
+    def _credential_exchange_request(self) -> Tuple[Dict[str, str | bytes], bytes]:
+        """
+        Sign a credential exchange request with the API key
+
+        :return: Headers and body of the request
+        """
         payload_str = json.dumps({"access_key_id": self._api_access_key_id, "timestamp": datetime.now(UTC).isoformat()})
         timestamp = datetime.now(UTC).strftime("%Y-%m-%d")
         secret_token = HMAC(("castLabs " + self._api_secret_access_key).encode(), timestamp.encode(), sha256).digest()
@@ -74,76 +97,244 @@ class Client:
             "X-Castlabs-Keypair-Signature": signature,
             "Content-Type": "application/json",
         }
+        return headers, payload_str.encode("UTF-8")
 
-        response = requests.post(
-            self._urls["credential_exchange"],
-            headers=headers,
-            data=payload_str.encode("UTF-8"),
-            timeout=10,  # Set timeout for better resiliency
-        )
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        resp_json = response.json()
+    def _set_tokens(self, resp_json: dict) -> None:
         self._id_token = resp_json["id_token"]
         self._access_token = resp_json["access_token"]
 
+        now = time.time()
+        expires_at = decode_token_expiry(self._access_token)
+        if expires_at is None and resp_json.get("expires_in"):
+            expires_at = now + float(resp_json["expires_in"])
+        if expires_at is None:
+            self._refresh_at = None
+        else:
+            lifetime = max(expires_at - now, 0.0)
+            self._refresh_at = expires_at - min(self._refresh_margin, lifetime / 2)
+
         logger.info("Authenticated successfully with the Castlabs API")
 
+    def _refresh_delay(self) -> Optional[float]:
+        """
+        :return: Seconds until the access token should be refreshed, None if its expiry is unknown
+        """
+        if self._refresh_at is None:
+            return None
+        return max(self._refresh_at - time.time(), 0.0)
+
+    def _token_due(self) -> bool:
+        return self._refresh_at is not None and time.time() >= self._refresh_at
+
+    def _api_headers(self, access_token: Optional[str] = None) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {access_token or self._access_token}",
+            "x-castlabs-organization": f"{self.organization_urn}",
+        }
+
+    @staticmethod
+    def _unwrap_response(response_json: dict, content_key: Optional[str]) -> Dict | List:
+        """
+        Extract the data of a GraphQL response or raise its first error
+
+        :param response_json: Decoded GraphQL response
+        :param content_key: Key mapping the actual data of the response, None for the whole data of the response
+        :return: Response object or list of objects
+        """
+        # Check for GraphQL-specific errors
+        if "errors" in response_json:
+            error = response_json["errors"][0]
+            error_type = error.get("errorType")
+            if error_type == "MalformedHttpRequestException":
+                raise CPMalformedHttpRequestException(error)
+            elif error_type == "Unauthorized":
+                raise CPAuthorizationException(error)
+            else:
+                raise Exception(error["message"])
+
+        if content_key is None:
+            return response_json["data"]
+        return response_json["data"][content_key]
+
+
+class Client(BaseClient):
+    """
+    The contentPlatformSDK introduces naming of Objects that deviate from the GraphQL for the better understanding
+    of generic Workflows.
+
+    Mapping of terms:
+    * PO -> Group
+    * PO Item -> Process
+    * workflow_process -> encoding_process (this and the publish_process are SUB processes of a Process object)
+    * Workflow - The API module for managing Processes
+    * Repository - The API module for managing the Filesystem
+    """
+
+    def __init__(
+        self,
+        organization_urn: str,
+        user_urn: str,
+        api_secret_access_key: str,
+        api_access_key_id: str,
+        urls: ApiUrls,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        transport: Optional[Transport] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        auto_refresh: bool = True,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ):
+        """
+        Initialize the SDK
+        :param organization_urn: The organization URN (urn:janus:accesskey:XXX)
+        :param user_urn: The user urn
+        :param secret_access_key: The secret access key to use (urn:janus:accesskey:XXX)
+        :param access_key_id: The key id
+        :param environment: Define 'production' (default) or 'staging'
+        :param pool_size: (Optional) Maximum number of keep-alive connections per API host
+        :param transport: (Optional) A preconfigured :func:`~castlabs.transport.Transport`
+        :param retry_policy: (Optional) When failed requests are sent again, see
+        :func:`~castlabs.resilience.RetryPolicy`
+        :param auto_refresh: (Optional) Refresh the access token in a background thread before it expires, until the
+        client is closed or garbage collected
+        :param refresh_margin: (Optional) Seconds before the expiry of the access token to refresh it
+        """
+        super().__init__(
+            organization_urn, user_urn, api_secret_access_key, api_access_key_id, urls, refresh_margin=refresh_margin
+        )
+
+        self._transport = transport or Transport(urls, pool_size=pool_size, retry_policy=retry_policy)
+        self._auth_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        self._authenticate()
+
+        if auto_refresh and self._refresh_at is not None:
+            self._refresh_thread = threading.Thread(
+                target=Client._refresh_loop,
+                args=(weakref.ref(self), self._closed),
+                name="castlabs-token-refresh",
+                daemon=True,
+            )
+            self._refresh_thread.start()
+            # a client that is dropped without close() stops its refresh thread as well
+            weakref.finalize(self, self._closed.set)
+
+    def close(self) -> None:
+        """
+        Close the pooled connections of the client and stop the token refresh
+        """
+        self._closed.set()
+        self._transport.close()
+
+    def _authenticate(self) -> None:
+        headers, payload = self._credential_exchange_request()
+
+        response = self._transport.request("credential_exchange", "POST", headers=headers, data=payload)
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        self._set_tokens(response.json())
+
+    def _reauthenticate(self, stale_token: Optional[str]) -> None:
+        """
+        Exchange the credentials again, unless another thread already replaced the stale token in the meantime.
+        Concurrent callers share one credential exchange.
+
+        :param stale_token: The access token that expired or was rejected
+        """
+        with self._auth_lock:
+            if self._access_token == stale_token:
+                logger.info("Refreshing access token")
+                self._authenticate()
+
+    @staticmethod
+    def _refresh_loop(client_ref: "weakref.ref[Client]", closed: threading.Event) -> None:
+        """
+        Refresh the access token ahead of its expiry until the client is closed or garbage collected. The client is
+        only referenced while its token is refreshed, so the thread does not keep it alive.
+
+        :param client_ref: Weak reference to the client
+        :param closed: Set when the client is closed or collected
+        """
+        client = client_ref()
+        delay = client._refresh_delay() if client is not None else None
+        del client
+        while delay is not None and not closed.wait(delay):
+            client = client_ref()
+            if client is None:  # pragma: no cover
+                break
+            try:
+                client._reauthenticate(client._access_token)
+                delay = client._refresh_delay()
+            except Exception as e:
+                logger.warning(f"Refreshing the access token failed, retrying in {REFRESH_RETRY_DELAY}s: {e}")
+                delay = REFRESH_RETRY_DELAY
+            del client
+
+    def _current_token(self) -> Optional[str]:
+        """
+        :return: The access token, refreshed first if it is due
+        """
+        if self._token_due():
+            self._reauthenticate(self._access_token)
+        return self._access_token
+
     def _query_api(
-        self, api: Literal["workflow", "repository"], query: dict, content_key: str, method: str = "POST"
+        self, api: Literal["workflow", "repository"], query: dict, content_key: Optional[str], method: str = "POST"
     ) -> Dict | List:
         """
         Generic API function
 
         :param query: GraphQL query
         :param api: API endpoint
-        :param content_key: Key mapping the actual data of the response
+        :param content_key: Key mapping the actual data of the response, None for the whole data of the response
         :param method: (Optional) HTTP method
         :return: Response object or list of objects
         """
-        url = self._urls[api]
-        headers = {
-            "Authorization": f"Bearer {self._access_token}",
-            "x-castlabs-organization": f"{self.organization_urn}",
-        }
+        if logger.isEnabledFor(DEBUG):
+            logger.debug(f"Querying API: {api} with query: {query}")
+        access_token = self._current_token()
+        try:
+            return self._send_query(api, query, content_key, method, access_token)
+        except (CPAuthorizationException, HTTPError) as error:
+            if isinstance(error, HTTPError) and getattr(error.response, "status_code", None) != 401:
+                raise
 
-        logger.debug(f"Querying API: {api} with query: {query}")
-        response = requests.request(
+            # The token was rejected, exchange the credentials once and retry the call
+            self._reauthenticate(access_token)
+            return self._send_query(api, query, content_key, method, self._access_token)
+
+    def _send_query(
+        self,
+        api: Literal["workflow", "repository"],
+        query: dict,
+        content_key: Optional[str],
+        method: str,
+        access_token: Optional[str],
+    ) -> Dict | List:
+        response = self._transport.request(
+            api,
             method,
-            url,
-            headers=headers,
+            headers=self._api_headers(access_token),
             json=query,  # Automatically encodes query to JSON
-            timeout=10,  # Set timeout for better resiliency
         )
 
-        logger.debug(f"Received response: {response.text}")
+        if logger.isEnabledFor(DEBUG):
+            logger.debug(f"Received response: {response.text}")
 
         # Raise an exception for HTTP errors
         response.raise_for_status()
 
-        response_json = response.json()
-
-        # Check for GraphQL-specific errors
-        if "errors" in response_json:
-            error = response_json["errors"][0]
-            error_type = error.get("errorType")
-            if error_type == "MalformedHttpRequestException":
-                raise CPMalformedHttpRequestException(error)
-            elif error_type == "Unauthorized":
-                raise CPAuthorizationException(error)
-            else:
-                raise Exception(error["message"])
-
-        return response_json["data"][content_key]
+        return self._unwrap_response(response.json(), content_key)
 
     def _query_api_dict(
-        self, api: Literal["workflow", "repository"], query: dict, content_key: str, method: str = "POST"
+        self, api: Literal["workflow", "repository"], query: dict, content_key: Optional[str], method: str = "POST"
     ) -> Dict:
         """
         Generic API function
 
         :param query: GraphQL query
         :param url: API endpoint
-        :param content_key: Key mapping the actual data of the response
+        :param content_key: Key mapping the actual data of the response, None for the whole data of the response
         :param method: (Optional) HTTP method
         :return: Response object
         """
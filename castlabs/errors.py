@@ -10,3 +10,7 @@ class CPAuthorizationException(CPGenericException):
 
 class CPMalformedHttpRequestException(CPGenericException):
     pass
+
+
+class CPCircuitOpenException(CPGenericException):
+    pass
@@ -0,0 +1,243 @@
+"""
+A local index of the folders and files of the repository, so that repeated listings and existence or size checks are
+answered without the API while the listing of a folder is fresh
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable, Dict, Optional
+
+from castlabs.records import DirectoryEntry, FileColumns, parse_timestamp
+from castlabs.repository import sub_route
+
+logger = getLogger("castlabs.index")
+
+# Database of the index shared by the processes of a host
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".castlabs", "index.sqlite3")
+# Seconds a folder listing is answered from the index before the folder is listed again
+DEFAULT_MAX_AGE = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    root TEXT NOT NULL,
+    route TEXT NOT NULL,
+    parent TEXT,
+    listed REAL,
+    PRIMARY KEY (root, route)
+);
+CREATE INDEX IF NOT EXISTS folders_parent ON folders (root, parent);
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    route TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER,
+    last_modified TEXT,
+    PRIMARY KEY (root, path)
+);
+CREATE INDEX IF NOT EXISTS files_route ON files (root, route);
+"""
+
+
+def _parent(route: str) -> Optional[str]:
+    return route.rsplit("/", 1)[0] if "/" in route else ("" if route else None)
+
+
+class RepositoryIndex:
+    """
+    The folders and files of storage locations in a SQLite database, filled by the folder listings of the size and
+    full projections. A folder listed less than `max_age` seconds ago is answered from the index; an older one is
+    listed again and only the files whose size or `last_modified` changed are written.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_INDEX_PATH,
+        max_age: float = DEFAULT_MAX_AGE,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param path: (Optional) Path of the database file
+        :param max_age: (Optional) Seconds a folder listing is answered from the index
+        :param clock: (Optional) Returns the current time in seconds since the epoch
+        """
+        self.path = path
+        self.max_age = max_age
+        self._clock = clock
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def is_fresh(self, root: str, route: str) -> bool:
+        """
+        :param root: The storage location, see :attr:`~castlabs.repository.StorageLocation.full_location`
+        :param route: Path of the folder within the storage location
+        :return: True if the folder was listed less than `max_age` seconds ago
+        """
+        row = (
+            self._connection()
+            .execute("SELECT listed FROM folders WHERE root = ? AND route = ?", (root, route.strip("/")))
+            .fetchone()
+        )
+        return row is not None and row[0] is not None and self._clock() - row[0] < self.max_age
+
+    def get_folder(self, root: str, route: str) -> Optional[Dict[str, Any]]:
+        """
+        :param root: The storage location
+        :param route: Path of the folder within the storage location
+        :return: The folder in the `sizes` projection of a listing, or None if it is not fresh
+        """
+        if not self.is_fresh(root, route):
+            return None
+        route = route.strip("/")
+        connection = self._connection()
+        folder_id = f"{root}{route}/" if route else root
+        folders = connection.execute(
+            "SELECT route FROM folders WHERE root = ? AND parent = ? ORDER BY route", (root, route)
+        ).fetchall()
+        files = connection.execute(
+            "SELECT name, size, last_modified FROM files WHERE root = ? AND route = ? ORDER BY name", (root, route)
+        ).fetchall()
+        return {
+            "id": folder_id,
+            "name": route.rsplit("/", 1)[-1],
+            "folders": [
+                {"id": f"{root}{folder_route}/", "name": folder_route.rsplit("/", 1)[-1]} for (folder_route,) in folders
+            ],
+            "files": [
+                {"id": f"{folder_id}{name}", "name": name, "size": size, "last_modified": last_modified}
+                for name, size, last_modified in files
+            ],
+        }
+
+    def record(self, root: str, route: str, folder: Dict[str, Any]) -> int:
+        """
+        Store the listing of a folder. Sub folders that are gone are removed with their contents.
+
+        :param root: The storage location
+        :param route: Path of the folder within the storage location
+        :param folder: The folder as listed with the `sizes` or `full` projection, without deleted files
+        :return: The number of files added, changed or removed
+        """
+        route = route.strip("/")
+        sub_folders = {sub_route(route, sub_folder["name"]) for sub_folder in folder["folders"]}
+        listed_files = {file["name"]: file for file in folder["files"] if not file.get("deleted")}
+
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO folders (root, route, parent, listed) VALUES (?, ?, ?, ?)",
+                (root, route, _parent(route), self._clock()),
+            )
+            known_folders = {
+                folder_route
+                for (folder_route,) in connection.execute(
+                    "SELECT route FROM folders WHERE root = ? AND parent = ?", (root, route)
+                )
+            }
+            for gone in known_folders - sub_folders:
+                self._remove_tree(connection, root, gone)
+            connection.executemany(
+                "INSERT OR IGNORE INTO folders (root, route, parent, listed) VALUES (?, ?, ?, NULL)",
+                [(root, folder_route, route) for folder_route in sub_folders - known_folders],
+            )
+
+            known_files = {
+                name: (size, last_modified)
+                for name, size, last_modified in connection.execute(
+                    "SELECT name, size, last_modified FROM files WHERE root = ? AND route = ?", (root, route)
+                )
+            }
+            changed = [
+                (root, sub_route(route, name), route, name, file.get("size"), file.get("last_modified"))
+                for name, file in listed_files.items()
+                if known_files.get(name) != (file.get("size"), file.get("last_modified"))
+            ]
+            removed = [(root, sub_route(route, name)) for name in known_files.keys() - listed_files.keys()]
+            connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", changed)
+            connection.executemany("DELETE FROM files WHERE root = ? AND path = ?", removed)
+
+        if changed or removed:
+            logger.debug(f"Index of {root}{route}: {len(changed)} files changed, {len(removed)} removed")
+        return len(changed) + len(removed)
+
+    @staticmethod
+    def _remove_tree(connection: sqlite3.Connection, root: str, route: str) -> None:
+        prefix = f"{route}/"
+        for table in ("folders", "files"):
+            column = "route" if table == "folders" else "path"
+            connection.execute(
+                f"DELETE FROM {table} WHERE root = ? AND ({column} = ? OR substr({column}, 1, ?) = ?)",
+                (root, route, len(prefix), prefix),
+            )
+
+    def invalidate(self, root: str, route: Optional[str] = None) -> None:
+        """
+        Mark a folder, or all folders of a storage location, to be listed again
+
+        :param root: The storage location
+        :param route: (Optional) Path of the folder within the storage location
+        """
+        with self._connection() as connection:
+            if route is None:
+                connection.execute("UPDATE folders SET listed = NULL WHERE root = ?", (root,))
+            else:
+                connection.execute(
+                    "UPDATE folders SET listed = NULL WHERE root = ? AND route = ?", (root, route.strip("/"))
+                )
+
+    def stat(self, root: str, path: str) -> Optional[DirectoryEntry]:
+        """
+        :param root: The storage location
+        :param path: Path of a file or folder within the storage location
+        :return: The indexed file or folder, or None if it is not in the index
+        """
+        path = path.strip("/")
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT name, size, last_modified FROM files WHERE root = ? AND path = ?", (root, path)
+        ).fetchone()
+        if row is not None:
+            name, size, last_modified = row
+            return DirectoryEntry(name, size=size, last_modified=parse_timestamp(last_modified))
+        if connection.execute("SELECT 1 FROM folders WHERE root = ? AND route = ?", (root, path)).fetchone():
+            return DirectoryEntry(path.rsplit("/", 1)[-1], is_folder=True)
+        return None
+
+    def files_with_prefix(self, root: str, prefix: str) -> FileColumns:
+        """
+        :param root: The storage location
+        :param prefix: The beginning of the paths within the storage location, e.g. `title_1/` or `title_1/seg`
+        :return: The indexed files whose path starts with the prefix, in the order of their paths
+        """
+        prefix = prefix.lstrip("/")
+        columns = FileColumns()
+        rows = self._connection().execute(
+            "SELECT path, size, last_modified FROM files WHERE root = ? AND path >= ? AND substr(path, 1, ?) = ? "
+            "ORDER BY path",
+            (root, prefix, len(prefix), prefix),
+        )
+        for path, size, last_modified in rows:
+            columns.append(path, {"size": size, "last_modified": last_modified})
+        return columns
+
+    def close(self) -> None:
+        """
+        Close the connection of the calling thread
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
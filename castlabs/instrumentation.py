@@ -0,0 +1,329 @@
+"""
+Instrumentation of the API calls and uploads. Listeners registered with :func:`add_listener` receive an event for
+every API call, every uploaded part and every uploaded file or stream. While no listener is registered, the calls and
+uploads are not measured at all; the only cost is the check of an empty tuple.
+
+:class:`HistogramCollector` is a listener that keeps latency histograms and counters in process and renders them in
+the Prometheus text format, for a metrics endpoint or a push gateway. Other backends, e.g. a tracer, are attached with
+a listener of their own.
+"""
+
+import bisect
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union
+
+logger = getLogger("castlabs.instrumentation")
+
+# Upper bounds in seconds of the latency buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TransferKind = Literal["part", "file"]
+
+
+class ApiCallEvent:
+    """
+    A call to an API host, including its retries
+    """
+
+    __slots__ = ("api", "operation", "status", "latency", "request_bytes", "response_bytes", "attempts", "error")
+
+    def __init__(
+        self,
+        api: str,
+        operation: Optional[str],
+        status: Optional[int],
+        latency: float,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+        attempts: int = 1,
+        error: Optional[str] = None,
+    ):
+        """
+        :param api: The API host, e.g. "workflow"
+        :param operation: The GraphQL `operationName`, None for other requests like the credential exchange
+        :param status: HTTP status of the last response, None if no response was received
+        :param latency: Seconds from the first attempt until the last response or error
+        :param request_bytes: (Optional) Size of the request body
+        :param response_bytes: (Optional) Size of the last response body
+        :param attempts: (Optional) Number of requests sent, 1 without retries
+        :param error: (Optional) Type of the exception the call failed with
+        """
+        self.api = api
+        self.operation = operation
+        self.status = status
+        self.latency = latency
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.attempts = attempts
+        self.error = error
+
+    @property
+    def retries(self) -> int:
+        return self.attempts - 1
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or self.status is None or self.status >= 400
+
+    def __repr__(self) -> str:
+        return f"ApiCallEvent({self.api!r}, {self.operation!r}, status={self.status}, latency={self.latency:.3f})"
+
+
+class TransferEvent:
+    """
+    An uploaded part, or a whole uploaded file or stream
+    """
+
+    __slots__ = ("kind", "key", "bytes", "seconds", "part_number")
+
+    def __init__(self, kind: TransferKind, key: str, bytes: int, seconds: float, part_number: Optional[int] = None):
+        """
+        :param kind: "part" for a request carrying content (a part, or a file uploaded in one request), "file" for a
+        whole file or stream
+        :param key: The object key
+        :param bytes: Bytes uploaded
+        :param seconds: Duration of the upload
+        :param part_number: (Optional) Number of the part of a multipart upload
+        """
+        self.kind = kind
+        self.key = key
+        self.bytes = bytes
+        self.seconds = seconds
+        self.part_number = part_number
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"TransferEvent({self.kind!r}, {self.key!r}, bytes={self.bytes}, seconds={self.seconds:.3f})"
+
+
+Event = Union[ApiCallEvent, TransferEvent]
+Listener = Callable[[Event], None]
+
+# replaced, never mutated, so that emitting needs no lock
+_listeners: Tuple[Listener, ...] = ()
+_lock = threading.Lock()
+
+
+def add_listener(listener: Listener) -> None:
+    """
+    :param listener: Called with every event, from the thread of the call or upload. It must be fast and thread safe.
+    """
+    global _listeners
+    with _lock:
+        _listeners = _listeners + (listener,)
+
+
+def remove_listener(listener: Listener) -> None:
+    global _listeners
+    with _lock:
+        _listeners = tuple(registered for registered in _listeners if registered != listener)
+
+
+def enabled() -> bool:
+    """
+    :return: True if events are measured, i.e. a listener is registered
+    """
+    return bool(_listeners)
+
+
+def emit(event: Event) -> None:
+    for listener in _listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            logger.warning(f"Instrumentation listener {listener!r} failed: {e}")
+
+
+def body_size(body: Any) -> int:
+    """
+    :param body: The body of a request: bytes, str, a sized stream or None
+    :return: Its size in bytes, 0 if it is unknown
+    """
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode())
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+
+def _s3_call_started(params: Dict[str, Any], context: Dict[str, Any], **kwargs: Any) -> None:
+    if _listeners:
+        size = params.get("ContentLength")
+        context["castlabs_transfer"] = (
+            time.perf_counter(),
+            params.get("Key", ""),
+            params.get("PartNumber"),
+            size if size is not None else body_size(params.get("Body")),
+        )
+
+
+def _s3_call_finished(context: Dict[str, Any], **kwargs: Any) -> None:
+    transfer = context.pop("castlabs_transfer", None)
+    if transfer is not None:
+        started, key, part_number, size = transfer
+        emit(TransferEvent("part", key, size, time.perf_counter() - started, part_number))
+
+
+def instrument_s3_client(s3_client: Any) -> None:
+    """
+    Emit a :class:`TransferEvent` for every part or object a boto3 S3 client uploads, including the parts of the
+    boto3 transfer manager
+    """
+    for operation in ("UploadPart", "PutObject"):
+        s3_client.meta.events.register(f"before-parameter-build.s3.{operation}", _s3_call_started)
+        s3_client.meta.events.register(f"after-call.s3.{operation}", _s3_call_finished)
+
+
+class Histogram:
+    """
+    Counts of observations per bucket, with the sum and the maximum
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "maximum")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param bounds: (Optional) Ascending upper bounds of the buckets, a last bucket takes larger values
+        """
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: The quantile, between 0 and 1
+        :return: The upper bound of the bucket of the quantile, the maximum for the last bucket
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return min(bound, self.maximum)
+        return self.maximum
+
+
+class HistogramCollector:
+    """
+    A listener keeping latency histograms of the API calls per API host and operation and of the uploaded parts and
+    files, with counters of calls, errors, retries, bytes and upload throughput
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param bounds: (Optional) Upper bounds in seconds of the latency buckets
+        """
+        self.bounds = bounds
+        # latency and counters per (api, operation)
+        self.calls: Dict[Tuple[str, str], Histogram] = {}
+        self.call_counters: Dict[Tuple[str, str], Dict[str, int]] = {}
+        # duration and bytes per transfer kind
+        self.transfers: Dict[str, Histogram] = {}
+        self.transfer_bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event) -> None:
+        with self._lock:
+            if isinstance(event, ApiCallEvent):
+                key = (event.api, event.operation or "")
+                if key not in self.calls:
+                    self.calls[key] = Histogram(self.bounds)
+                    self.call_counters[key] = {"errors": 0, "retries": 0, "request_bytes": 0, "response_bytes": 0}
+                self.calls[key].observe(event.latency)
+                counters = self.call_counters[key]
+                counters["errors"] += event.failed
+                counters["retries"] += event.retries
+                counters["request_bytes"] += event.request_bytes
+                counters["response_bytes"] += event.response_bytes
+            else:
+                if event.kind not in self.transfers:
+                    self.transfers[event.kind] = Histogram(self.bounds)
+                    self.transfer_bytes[event.kind] = 0
+                self.transfers[event.kind].observe(event.seconds)
+                self.transfer_bytes[event.kind] += event.bytes
+
+    def bytes_per_second(self, kind: TransferKind = "file") -> float:
+        """
+        :return: The average upload throughput of a single part or file
+        """
+        with self._lock:
+            histogram = self.transfers.get(kind)
+            return self.transfer_bytes[kind] / histogram.total if histogram and histogram.total else 0.0
+
+    def to_prometheus(self, prefix: str = "castlabs") -> str:
+        """
+        :param prefix: (Optional) Prefix of the metric names
+        :return: The metrics in the Prometheus text exposition format
+        """
+        lines: List[str] = []
+        with self._lock:
+            if self.calls:
+                lines += _histogram_lines(
+                    f"{prefix}_api_call_seconds",
+                    "Latency of the API calls including retries",
+                    {
+                        f'api="{api}",operation="{operation}"': histogram
+                        for (api, operation), histogram in self.calls.items()
+                    },
+                )
+                for name, help_text in (
+                    ("errors", "API calls that failed"),
+                    ("retries", "Requests sent again after a failure"),
+                    ("request_bytes", "Bytes of the request bodies"),
+                    ("response_bytes", "Bytes of the response bodies"),
+                ):
+                    lines += [
+                        f"# HELP {prefix}_api_call_{name}_total {help_text}",
+                        f"# TYPE {prefix}_api_call_{name}_total counter",
+                    ]
+                    lines += [
+                        f'{prefix}_api_call_{name}_total{{api="{api}",operation="{operation}"}} {counters[name]}'
+                        for (api, operation), counters in self.call_counters.items()
+                    ]
+            if self.transfers:
+                lines += _histogram_lines(
+                    f"{prefix}_upload_seconds",
+                    "Duration of the uploaded parts and files",
+                    {f'kind="{kind}"': histogram for kind, histogram in self.transfers.items()},
+                )
+                lines += [
+                    f"# HELP {prefix}_upload_bytes_total Bytes uploaded",
+                    f"# TYPE {prefix}_upload_bytes_total counter",
+                ]
+                lines += [
+                    f'{prefix}_upload_bytes_total{{kind="{kind}"}} {size}' for kind, size in self.transfer_bytes.items()
+                ]
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, help_text: str, histograms: Dict[str, Histogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in histograms.items():
+        cumulative = 0
+        for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
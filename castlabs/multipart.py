@@ -0,0 +1,799 @@
+"""
+Tuning of the multipart uploads to S3: part size, concurrency, threshold and bandwidth, progress reporting and
+resumable uploads
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import itertools
+import json
+import math
+import mmap
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from logging import getLogger
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from castlabs import instrumentation
+from castlabs.instrumentation import TransferEvent
+from castlabs.polling import RateLimiter
+
+logger = getLogger("castlabs.multipart")
+
+MiB = 1024 * 1024
+
+# Limits of S3 multipart uploads
+MIN_PART_SIZE = 5 * MiB
+MAX_PART_SIZE = 5 * 1024 * MiB
+MAX_PARTS = 10000
+
+# Files larger than this are uploaded in parts
+DEFAULT_MULTIPART_THRESHOLD = 16 * MiB
+# Smallest part size chosen automatically
+DEFAULT_MIN_PART_SIZE = 8 * MiB
+# Files are split into about this many parts when the part size is chosen automatically
+TARGET_PARTS = 1000
+# Number of parts uploaded at once
+DEFAULT_MAX_CONCURRENCY = 10
+
+# Directory of the state files of resumable uploads
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".castlabs", "uploads")
+
+# Receives the bytes transferred so far and the size of the file
+ProgressCallback = Callable[[int, int], None]
+
+# A binary file-like object, a bytes-like object or an iterable of byte chunks
+UploadSource = Union[BinaryIO, bytes, bytearray, memoryview, Iterable[bytes]]
+# Any upload source, or an async iterable of byte chunks
+AsyncUploadSource = Union[UploadSource, AsyncIterable[bytes]]
+
+# Checksums sent with the uploaded parts
+ChecksumAlgorithm = Literal["MD5", "CRC32"]
+
+
+class ChecksumMismatchError(ValueError):
+    """
+    The checksum of an upload computed by S3 differs from the checksum of the local file
+    """
+
+
+def auto_part_size(file_size: int, min_part_size: int = DEFAULT_MIN_PART_SIZE) -> int:
+    """
+    Choose a part size that splits a file into about `TARGET_PARTS` parts, rounded up to whole MiB
+
+    :param file_size: Size of the file in bytes
+    :param min_part_size: (Optional) Lower bound of the part size in bytes
+    :return: Part size in bytes
+    """
+    part_size = math.ceil(file_size / TARGET_PARTS / MiB) * MiB
+    return min(max(part_size, min_part_size, MIN_PART_SIZE), MAX_PART_SIZE)
+
+
+class UploadConfig:
+    """
+    Settings of a multipart upload. Without an explicit `part_size` the part size grows with the file, so that
+    multi-GB masters are uploaded in fewer, larger parts.
+    """
+
+    def __init__(
+        self,
+        part_size: Optional[int] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+        max_bandwidth: Optional[int] = None,
+        resumable: bool = False,
+        state_dir: str = DEFAULT_STATE_DIR,
+        checksum_algorithm: Optional[ChecksumAlgorithm] = None,
+    ):
+        """
+        :param part_size: (Optional) Size of the parts in bytes, chosen by the file size by default
+        :param max_concurrency: (Optional) Number of parts uploaded at once
+        :param multipart_threshold: (Optional) Files of at least this many bytes are uploaded in parts
+        :param max_bandwidth: (Optional) Upper bound of the upload rate in bytes per second
+        :param resumable: (Optional) Keep the progress of multipart uploads in a state file, so that a failed upload
+        continues with the missing parts when it is started again
+        :param state_dir: (Optional) Directory of the state files of resumable uploads
+        :param checksum_algorithm: (Optional) Send the 'MD5' or the 'CRC32' checksum of every part and check the
+        checksum of the whole file S3 computed. CRC32 takes a fraction of the CPU time of MD5.
+        """
+        if part_size is not None and not MIN_PART_SIZE <= part_size <= MAX_PART_SIZE:
+            raise ValueError(f"The part size must be between {MIN_PART_SIZE} and {MAX_PART_SIZE} bytes")
+        if max_concurrency < 1:
+            raise ValueError("The concurrency must be at least 1")
+        if checksum_algorithm not in (None, "MD5", "CRC32"):
+            raise ValueError(f"Unsupported checksum algorithm {checksum_algorithm}")
+
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.multipart_threshold = multipart_threshold
+        self.max_bandwidth = max_bandwidth
+        self.resumable = resumable
+        self.state_dir = state_dir
+        self.checksum_algorithm = checksum_algorithm
+
+    @property
+    def reads_parts(self) -> bool:
+        """
+        Whether large files are uploaded by :class:`MultipartUpload` instead of the boto3 transfer manager
+        """
+        return self.resumable or self.checksum_algorithm is not None
+
+    def part_size_for(self, file_size: int) -> int:
+        """
+        :param file_size: Size of the file in bytes
+        :return: The part size for the file, increased if the configured size needs more than `MAX_PARTS` parts
+        """
+        if self.part_size is None:
+            return auto_part_size(file_size)
+        return max(self.part_size, math.ceil(file_size / MAX_PARTS))
+
+    def transfer_config(self, file_size: int) -> TransferConfig:
+        """
+        :param file_size: Size of the file in bytes
+        :return: The boto3 transfer settings for the file
+        """
+        return TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.part_size_for(file_size),
+            max_concurrency=self.max_concurrency,
+            max_bandwidth=self.max_bandwidth,
+            use_threads=self.max_concurrency > 1,
+        )
+
+
+class ProgressTracker:
+    """
+    Sums up the bytes reported by the transfer threads and reports the total to a :data:`ProgressCallback`
+    """
+
+    def __init__(self, total: int, callback: ProgressCallback):
+        self.total = total
+        self.transferred = 0
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def __call__(self, bytes_amount: int) -> None:
+        with self._lock:
+            self.transferred += bytes_amount
+            self._callback(self.transferred, self.total)
+
+
+class _PartReader(io.RawIOBase):
+    """
+    A file-like view of a part, so that botocore streams the part from the memory map without copying it. The blocks
+    that botocore and urllib3 read are memoryview slices of the part, each released by the next read, seek or close so
+    that no slice keeps the memory map open.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+        self._chunk: Optional[memoryview] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> Union[bytes, memoryview]:  # type: ignore
+        """
+        :return: The next `size` bytes of the part as a slice that is valid until the next read, seek or close, or a
+            copy of the rest of the part if `size` is negative, for callers that keep the whole body
+        """
+        self._release_chunk()
+        if size is None or size < 0:
+            rest = bytes(self._view[self._position :])
+            self._position = len(self._view)
+            return rest
+        end = min(self._position + size, len(self._view))
+        self._chunk = self._view[self._position : end]
+        self._position = end
+        return self._chunk
+
+    def readinto(self, buffer: Any) -> int:
+        length = min(len(buffer), len(self._view) - self._position)
+        buffer[:length] = self._view[self._position : self._position + length]
+        self._position += length
+        return length
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._release_chunk()
+        start = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = min(max(start + offset, 0), len(self._view))
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def close(self) -> None:
+        self._release_chunk()
+        super().close()
+
+    def _release_chunk(self) -> None:
+        if self._chunk is not None:
+            self._chunk.release()
+            self._chunk = None
+
+
+class MultipartUpload:
+    """
+    A multipart upload of a local file. The parts are read through one shared read-only memory map as memoryview
+    slices, and their checksums are computed on the upload threads, without copying a part into a new buffer.
+
+    The upload id and the ETag and checksums of every completed part are kept in `state`. With a resumable config
+    the state is also written to a local state file, and running the upload again after a failure only sends the
+    missing parts. The state is dropped and the upload started over if the file changed in the meantime or the
+    platform no longer knows the upload.
+
+    With a `checksum_algorithm`, the checksum of the whole file is derived from the checksums of the parts the way S3
+    does for multipart uploads and compared with the one S3 returns when the upload is completed.
+    """
+
+    def __init__(self, s3_client: Any, bucket: str, key: str, file_name: str, config: UploadConfig):
+        """
+        :param s3_client: The boto3 S3 client
+        :param bucket: Target bucket
+        :param key: Target object key
+        :param file_name: Local file path of the file to upload
+        :param config: Part size, concurrency, bandwidth, checksums and state directory of the upload
+        """
+        self._s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.file_name = file_name
+        self._config = config
+        self._lock = threading.Lock()
+
+        stat = os.stat(file_name)
+        self.file_size = stat.st_size
+        self._file_id = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        upload_id = hashlib.sha1(f"{bucket}/{key}:{os.path.abspath(file_name)}".encode()).hexdigest()
+        self.state_file = os.path.join(config.state_dir, f"{upload_id}.json")
+        self.state: Dict[str, Any] = {}
+        # the checksums of the whole file, after the upload
+        self.checksums: Dict[str, str] = {}
+        self._mapped: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+    def run(self, progress: Optional[ProgressCallback] = None) -> None:
+        """
+        Upload the missing parts and complete the upload
+
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the file
+        """
+        self._load_state()
+        part_size = self.state["part_size"]
+        part_count = max(math.ceil(self.file_size / part_size), 1)
+        missing = [number for number in range(1, part_count + 1) if str(number) not in self.state["parts"]]
+
+        tracker = ProgressTracker(self.file_size, progress or (lambda sent, total: None))
+        done = self.file_size - sum(self._part_range(number)[1] for number in missing)
+        if done:
+            tracker(done)
+        logger.info(f"Uploading {len(missing)} of {part_count} parts of {self.file_name}")
+
+        limiter = RateLimiter(self._config.max_bandwidth, burst=part_size) if self._config.max_bandwidth else None
+        try:
+            self._upload_parts(missing, tracker, limiter)
+            response = self._complete()
+        except BaseException:
+            # the parts of a resumable upload are kept for the next run, the others would be stored and billed
+            if not self._config.resumable:
+                self._abort()
+            raise
+        if self._config.resumable:
+            os.remove(self.state_file)
+
+        self.checksums = composite_checksums([part for _, part in self._completed_parts()])
+        if self._config.checksum_algorithm:
+            self._check(response)
+
+    def _upload_parts(self, numbers: List[int], tracker: ProgressTracker, limiter: Optional[RateLimiter]) -> None:
+        """
+        Upload the parts through a memory map of the file, on `max_concurrency` threads
+        """
+        with open(self.file_name, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            self._mapped = mapped
+            self._view = memoryview(mapped)
+            try:
+                with ThreadPoolExecutor(max_workers=self._config.max_concurrency) as executor:
+                    futures = [executor.submit(self._upload_part, number, tracker, limiter) for number in numbers]
+                    try:
+                        for future in as_completed(futures):
+                            future.result()
+                    except BaseException:
+                        # fail fast, the parts completed so far are kept in the state
+                        for future in futures:
+                            future.cancel()
+                        raise
+            finally:
+                self._view.release()
+                self._view = None
+                self._mapped = None
+
+    def _completed_parts(self) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        :return: The number and the ETag and checksums of every completed part, in order
+        """
+        return sorted(self.state["parts"].items(), key=lambda item: int(item[0]))
+
+    def _complete(self) -> Dict[str, Any]:
+        """
+        :return: The response of S3 to completing the upload with the parts of the state
+        """
+        crc32 = self.state.get("checksum_algorithm") == "CRC32"
+        return self._s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.state["upload_id"],
+            MultipartUpload={
+                "Parts": [
+                    {
+                        "PartNumber": int(number),
+                        "ETag": part["etag"],
+                        **({"ChecksumCRC32": part["crc32"]} if crc32 else {}),
+                    }
+                    for number, part in self._completed_parts()
+                ]
+            },
+        )
+
+    def _abort(self) -> None:
+        """
+        Drop the parts uploaded so far
+        """
+        logger.warning(f"Upload of {self.file_name} failed, aborting")
+        try:
+            self._s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.state["upload_id"])
+        except ClientError:
+            pass
+
+    def _check(self, response: Dict[str, Any]) -> None:
+        """
+        Compare the checksums S3 computed for the upload with the ones of the local parts
+        """
+        expected = {"etag": self.checksums.get("etag"), "crc32": self.checksums.get("crc32")}
+        etag = response.get("ETag")
+        actual = {"etag": etag.strip('"') if etag else None, "crc32": response.get("ChecksumCRC32")}
+        for name, value in actual.items():
+            if value is not None and expected[name] is not None and value != expected[name]:
+                raise ChecksumMismatchError(
+                    f"The {name} of {self.key} is {value}, {expected[name]} was expected from {self.file_name}"
+                )
+        logger.info(f"Checksums of {self.key} match: {self.checksums}")
+
+    def _load_state(self) -> None:
+        """
+        Continue the upload of the state file if the file and the upload are unchanged, or start a new one
+        """
+        state = None
+        if self._config.resumable and os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                state = json.load(f)
+
+        if (
+            state is not None
+            and state["file"] == self._file_id
+            and state.get("checksum_algorithm") == self._config.checksum_algorithm
+        ):
+            try:
+                uploaded = self._list_parts(state["upload_id"])
+                # parts the platform lost or stored differently are sent again
+                state["parts"] = {
+                    number: part for number, part in state["parts"].items() if uploaded.get(int(number)) == part["etag"]
+                }
+                self.state = state
+                logger.info(f"Resuming upload of {self.file_name} with {len(state['parts'])} completed parts")
+                return
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+                    raise
+                logger.info(f"Upload of {self.file_name} expired, starting over")
+        elif state is not None:
+            logger.info(f"{self.file_name} changed, starting the upload over")
+            try:
+                self._s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=state["upload_id"])
+            except ClientError:
+                pass
+
+        kwargs = {"ChecksumAlgorithm": "CRC32"} if self._config.checksum_algorithm == "CRC32" else {}
+        response = self._s3.create_multipart_upload(Bucket=self.bucket, Key=self.key, **kwargs)
+        self.state = {
+            "bucket": self.bucket,
+            "key": self.key,
+            "upload_id": response["UploadId"],
+            "file": self._file_id,
+            "part_size": self._config.part_size_for(self.file_size),
+            "checksum_algorithm": self._config.checksum_algorithm,
+            "parts": {},
+        }
+        self._save_state()
+
+    def _list_parts(self, upload_id: str) -> Dict[int, str]:
+        """
+        :return: The ETag of every part the platform received, by part number
+        """
+        parts: Dict[int, str] = {}
+        kwargs = {"Bucket": self.bucket, "Key": self.key, "UploadId": upload_id}
+        while True:
+            response = self._s3.list_parts(**kwargs)
+            parts.update({part["PartNumber"]: part["ETag"] for part in response.get("Parts", [])})
+            if not response.get("IsTruncated"):
+                return parts
+            kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+    def _part_range(self, number: int) -> Tuple[int, int]:
+        """
+        :return: Offset and length of a part
+        """
+        offset = (number - 1) * self.state["part_size"]
+        return offset, min(self.state["part_size"], self.file_size - offset)
+
+    def _upload_part(self, number: int, tracker: ProgressTracker, limiter: Optional[RateLimiter]) -> None:
+        offset, length = self._part_range(number)
+        if hasattr(mmap, "MADV_WILLNEED") and offset % mmap.PAGESIZE == 0:
+            # read the part ahead in large blocks instead of one page fault at a time
+            self._mapped.madvise(mmap.MADV_WILLNEED, offset, length)
+        with self._view[offset : offset + length] as body, _PartReader(body) as reader:
+            if limiter:
+                limiter.acquire(length)
+            # hashlib and zlib release the GIL, the parts are hashed in parallel
+            part = {}
+            if self.state.get("checksum_algorithm") == "CRC32":
+                part["crc32"] = base64.b64encode(zlib.crc32(body).to_bytes(4, "big")).decode()
+                kwargs = {"ChecksumCRC32": part["crc32"]}
+            else:
+                md5 = hashlib.md5(body)
+                part["md5"] = md5.hexdigest()
+                kwargs = {"ContentMD5": base64.b64encode(md5.digest()).decode()}
+            response = self._s3.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.state["upload_id"],
+                PartNumber=number,
+                Body=reader,
+                **kwargs,
+            )
+
+        if hasattr(mmap, "MADV_DONTNEED") and offset % mmap.PAGESIZE == 0:
+            # the pages of a sent part no longer count towards the memory of the process
+            self._mapped.madvise(mmap.MADV_DONTNEED, offset, length)
+
+        with self._lock:
+            self.state["parts"][str(number)] = {"etag": response["ETag"], **part}
+            self._save_state()
+        tracker(length)
+
+    def _save_state(self) -> None:
+        """
+        Write the state file of a resumable upload atomically, a crash leaves the previous state
+        """
+        if not self._config.resumable:
+            return
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        temporary_file = f"{self.state_file}.tmp"
+        with open(temporary_file, "w") as f:
+            json.dump(self.state, f)
+        os.replace(temporary_file, self.state_file)
+
+
+def composite_checksums(parts: List[Dict[str, str]]) -> Dict[str, str]:
+    """
+    The checksums S3 computes for a multipart upload from the checksums of its parts: the MD5 or CRC32 checksum of the
+    concatenated part checksums followed by the number of parts
+
+    :param parts: The 'md5' (hex) or 'crc32' (base64) checksums of the parts, in order
+    :return: The 'etag' if the parts have MD5 checksums, the 'crc32' if they have CRC32 checksums
+    """
+    checksums = {}
+    if parts and all("md5" in part for part in parts):
+        md5 = hashlib.md5(b"".join(bytes.fromhex(part["md5"]) for part in parts))
+        checksums["etag"] = f"{md5.hexdigest()}-{len(parts)}"
+    if parts and all("crc32" in part for part in parts):
+        crc32 = zlib.crc32(b"".join(base64.b64decode(part["crc32"]) for part in parts))
+        checksums["crc32"] = f"{base64.b64encode(crc32.to_bytes(4, 'big')).decode()}-{len(parts)}"
+    return checksums
+
+
+def iter_chunks(source: UploadSource, chunk_size: int) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Read an upload source in chunks without loading it at once
+
+    :param source: A binary file-like object, a bytes-like object or an iterable of byte chunks
+    :param chunk_size: Size of the chunks read from file-like and bytes-like sources
+    :return: The chunks of the source
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source).cast("B")
+        for offset in range(0, len(view), chunk_size):
+            yield view[offset : offset + chunk_size]
+    elif hasattr(source, "read"):
+        while chunk := source.read(chunk_size):
+            yield chunk
+    else:
+        yield from source
+
+
+async def aiter_chunks(source: AsyncUploadSource, chunk_size: int) -> AsyncIterator[Union[bytes, memoryview]]:
+    """
+    Read an upload source in chunks. Blocking sources are read in a worker thread.
+
+    :param source: An async iterable of byte chunks or any source of :func:`iter_chunks`
+    :param chunk_size: Size of the chunks read from file-like and bytes-like sources
+    :return: The chunks of the source
+    """
+    if hasattr(source, "__aiter__"):
+        async for chunk in source:
+            yield chunk
+        return
+
+    chunks = iter_chunks(source, chunk_size)  # type: ignore[arg-type]
+    while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+        yield chunk
+
+
+class _PartBuffer:
+    """
+    Collects chunks of any size into parts of exactly `part_size` bytes, the last part may be smaller
+    """
+
+    def __init__(self, part_size: int):
+        self.part_size = part_size
+        self._buffer = bytearray()
+
+    def add(self, chunk: Union[bytes, memoryview]) -> Iterator[bytes]:
+        if not self._buffer and len(chunk) == self.part_size:
+            yield bytes(chunk)
+            return
+        self._buffer += chunk
+        while len(self._buffer) >= self.part_size:
+            yield bytes(self._buffer[: self.part_size])
+            del self._buffer[: self.part_size]
+
+    def flush(self) -> Iterator[bytes]:
+        if self._buffer:
+            yield bytes(self._buffer)
+            self._buffer = bytearray()
+
+
+def split_parts(chunks: Iterable[Union[bytes, memoryview]], part_size: int) -> Iterator[bytes]:
+    """
+    :param chunks: Byte chunks of any size
+    :param part_size: Size of the parts
+    :return: Parts of exactly `part_size` bytes, the last part may be smaller
+    """
+    buffer = _PartBuffer(part_size)
+    for chunk in chunks:
+        yield from buffer.add(chunk)
+    yield from buffer.flush()
+
+
+async def asplit_parts(chunks: AsyncIterable[Union[bytes, memoryview]], part_size: int) -> AsyncIterator[bytes]:
+    """
+    :param chunks: Byte chunks of any size
+    :param part_size: Size of the parts
+    :return: Parts of exactly `part_size` bytes, the last part may be smaller
+    """
+    buffer = _PartBuffer(part_size)
+    async for chunk in chunks:
+        for part in buffer.add(chunk):
+            yield part
+    for part in buffer.flush():
+        yield part
+
+
+class StreamingUpload:
+    """
+    Upload from a stream of unknown length without staging it on disk. The stream is cut into parts that are
+    uploaded in parallel while the next part is read; at most `max_concurrency` parts are held in memory at once.
+    A stream that ends before the multipart threshold is uploaded in a single request.
+
+    Without a `size` the part size is `part_size` of the config or `DEFAULT_MIN_PART_SIZE`, which limits the stream to
+    `MAX_PARTS` parts.
+    """
+
+    def __init__(self, s3_client: Any, bucket: str, key: str, config: UploadConfig, size: Optional[int] = None):
+        """
+        :param s3_client: The boto3 S3 client
+        :param bucket: Target bucket
+        :param key: Target object key
+        :param config: Part size, concurrency and bandwidth of the upload
+        :param size: (Optional) Size of the stream in bytes if it is known, to choose the part size
+        """
+        self._s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self._config = config
+        self.part_size = config.part_size_for(size) if size else config.part_size or DEFAULT_MIN_PART_SIZE
+        self.upload_id: Optional[str] = None
+        self.parts: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._limiter = RateLimiter(config.max_bandwidth, burst=self.part_size) if config.max_bandwidth else None
+        self._tracker = ProgressTracker(size or 0, lambda sent, total: None)
+
+    def run(self, source: UploadSource, progress: Optional[ProgressCallback] = None) -> None:
+        """
+        Upload the stream
+
+        :param source: A binary file-like object, a bytes-like object or an iterable of byte chunks
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the stream, 0 if unknown
+        """
+        started = time.perf_counter() if instrumentation.enabled() else None
+        self._tracker = ProgressTracker(self.size or 0, progress or (lambda sent, total: None))
+        parts = split_parts(iter_chunks(source, self.part_size), self.part_size)
+        first = next(parts, b"")
+        second = next(parts, None)
+        if second is None and len(first) < self._config.multipart_threshold:
+            self.put(first)
+            self._report(started)
+            return
+
+        self.start()
+        slots = threading.BoundedSemaphore(self._config.max_concurrency)
+        failed = threading.Event()
+
+        def done(future: Future) -> None:
+            if future.exception() is not None:
+                failed.set()
+            slots.release()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._config.max_concurrency) as executor:
+                futures = []
+                for number, body in enumerate(itertools.chain([first, second], parts), 1):
+                    # wait for a free slot before reading the next part
+                    slots.acquire()
+                    if failed.is_set():
+                        slots.release()
+                        break
+                    future = executor.submit(self.upload_part, number, body)
+                    future.add_done_callback(done)
+                    futures.append(future)
+                for future in futures:
+                    future.result()
+            self.complete()
+        except BaseException:
+            self.abort()
+            raise
+        self._report(started)
+
+    async def run_async(self, source: AsyncUploadSource, progress: Optional[ProgressCallback] = None) -> None:
+        """
+        Upload the stream from asyncio, the requests are sent in worker threads
+
+        :param source: An async iterable of byte chunks or any source of :meth:`run`
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the stream, 0 if unknown
+        """
+        started = time.perf_counter() if instrumentation.enabled() else None
+        self._tracker = ProgressTracker(self.size or 0, progress or (lambda sent, total: None))
+        parts = asplit_parts(aiter_chunks(source, self.part_size), self.part_size)
+        first = await anext(parts, b"")
+        second = await anext(parts, None)
+        if second is None and len(first) < self._config.multipart_threshold:
+            await asyncio.to_thread(self.put, first)
+            self._report(started)
+            return
+
+        await asyncio.to_thread(self.start)
+        slots = asyncio.Semaphore(self._config.max_concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def upload_part(number: int, body: bytes) -> None:
+            try:
+                await asyncio.to_thread(self.upload_part, number, body)
+            finally:
+                slots.release()
+
+        async def all_parts() -> AsyncIterator[bytes]:
+            yield first
+            yield second
+            async for part in parts:
+                yield part
+
+        try:
+            number = 0
+            async for body in all_parts():
+                await slots.acquire()
+                if any(task.done() and not task.cancelled() and task.exception() for task in tasks):
+                    break
+                number += 1
+                tasks.append(asyncio.create_task(upload_part(number, body)))
+            await asyncio.gather(*tasks)
+            await asyncio.to_thread(self.complete)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.to_thread(self.abort)
+            raise
+        self._report(started)
+
+    def _report(self, started: Optional[float]) -> None:
+        if started is not None:
+            instrumentation.emit(
+                TransferEvent("file", self.key, self._tracker.transferred, time.perf_counter() - started)
+            )
+
+    def put(self, body: bytes) -> None:
+        """
+        Upload a short stream in a single request
+        """
+        if self._limiter:
+            self._limiter.acquire(len(body))
+        self._s3.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=body,
+            ContentMD5=base64.b64encode(hashlib.md5(body).digest()).decode(),
+        )
+        self._tracker(len(body))
+
+    def start(self) -> None:
+        self.upload_id = self._s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+        logger.info(f"Streaming upload to {self.key} started")
+
+    def upload_part(self, number: int, body: bytes) -> None:
+        if self._limiter:
+            self._limiter.acquire(len(body))
+        response = self._s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=body,
+            ContentMD5=base64.b64encode(hashlib.md5(body).digest()).decode(),
+        )
+        with self._lock:
+            self.parts[number] = response["ETag"]
+        self._tracker(len(body))
+
+    def complete(self) -> None:
+        self._s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={
+                "Parts": [{"PartNumber": number, "ETag": etag} for number, etag in sorted(self.parts.items())]
+            },
+        )
+        logger.info(f"Streaming upload to {self.key} completed with {len(self.parts)} parts")
+
+    def abort(self) -> None:
+        """
+        Drop the parts uploaded so far
+        """
+        if self.upload_id is None:
+            return
+        logger.warning(f"Streaming upload to {self.key} failed, aborting")
+        try:
+            self._s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except ClientError:
+            pass
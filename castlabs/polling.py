@@ -0,0 +1,235 @@
+"""
+Scheduling of status polls: an exponential backoff with jitter per process, depending on its state, and a request
+rate limit shared by all polls of a platform.
+"""
+
+import heapq
+import random
+import threading
+import time
+from logging import getLogger
+from typing import TYPE_CHECKING, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from castlabs.workflow import Process, Workflow
+
+logger = getLogger("castlabs.polling")
+
+# States in which a process no longer changes
+COMPLETE_STATES = ("PUBLISH_SUCCESS", "ENCODING_FAILED", "PUBLISH_FAILED")
+
+# Maximum number of poll requests per second of a platform
+DEFAULT_MAX_POLL_RATE = 5.0
+
+# Initial and maximum poll interval in seconds per state, or per state prefix. A freshly started encoding is polled
+# tightly, a running encode takes minutes to hours and is polled relaxed.
+DEFAULT_INTERVALS: Dict[str, Tuple[float, float]] = {
+    "ENCODING_PENDING": (2.0, 10.0),
+    "ENCODING": (15.0, 120.0),
+    "PUBLISH": (5.0, 30.0),
+}
+
+
+class Backoff:
+    """
+    Exponentially growing delays, each shortened by a random share of up to `jitter` so that processes started
+    together are not polled in lockstep.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        maximum: float,
+        factor: float = 2.0,
+        jitter: float = 0.5,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        :param initial: First delay in seconds
+        :param maximum: Upper bound of the delay in seconds
+        :param factor: (Optional) Growth of the delay per step
+        :param jitter: (Optional) Share of the delay that is randomized, between 0 and 1
+        :param rng: (Optional) Source of the jitter
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+        self._interval = initial
+
+    def reset(self) -> None:
+        self._interval = self.initial
+
+    def next_delay(self) -> float:
+        """
+        :return: The next delay in seconds
+        """
+        delay = self._interval
+        self._interval = min(self._interval * self.factor, self.maximum)
+        return delay * (1 - self.jitter * self._rng.random())
+
+
+class PollPolicy:
+    """
+    Chooses the backoff of a process by its state
+    """
+
+    def __init__(
+        self,
+        intervals: Optional[Dict[str, Tuple[float, float]]] = None,
+        factor: float = 2.0,
+        jitter: float = 0.5,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        :param intervals: (Optional) Initial and maximum interval per state, or per state prefix like "ENCODING"
+        :param factor: (Optional) Growth of the interval per poll without a state change
+        :param jitter: (Optional) Share of the interval that is randomized, between 0 and 1
+        :param rng: (Optional) Source of the jitter
+        """
+        self.intervals = intervals or DEFAULT_INTERVALS
+        self.factor = factor
+        self.jitter = jitter
+        self._rng = rng or random.Random()
+
+    def backoff(self, state: str) -> Backoff:
+        initial, maximum = self.intervals.get(state) or self.intervals.get(state.split("_")[0]) or (5.0, 60.0)
+        return Backoff(initial, maximum, factor=self.factor, jitter=self.jitter, rng=self._rng)
+
+
+class RateLimiter:
+    """
+    A token bucket shared by threads: at most `rate` tokens per second, with bursts of up to `burst` tokens
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        :param rate: Tokens per second
+        :param burst: (Optional) Capacity of the bucket, `rate` by default
+        :param clock: (Optional) Monotonic clock in seconds
+        :param sleep: (Optional) Sleep function matching the clock
+        """
+        self.rate = rate
+        self.burst = burst or max(rate, 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket, waiting until they are available
+
+        :param tokens: (Optional) Number of tokens, e.g. requests
+        :return: Seconds waited
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the tokens right away, concurrent callers queue up behind the debt
+            self._tokens -= tokens
+            wait = max(-self._tokens / self.rate, 0.0)
+
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+class PollScheduler:
+    """
+    Polls the state of many processes until they are complete. Every process is polled on its own backoff,
+    due processes are refreshed together in batches and every request of a refresh, of the batch as of the publish
+    processes looked up after it, takes a token of the rate limiter.
+    """
+
+    def __init__(
+        self,
+        workflow: "Workflow",
+        limiter: RateLimiter,
+        batch_size: int,
+        policy: Optional[PollPolicy] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        :param workflow: The workflow API used to refresh the processes
+        :param limiter: Rate limit of the refresh requests
+        :param batch_size: Number of processes refreshed per request
+        :param policy: (Optional) Poll intervals per state
+        :param clock: (Optional) Monotonic clock in seconds
+        :param sleep: (Optional) Sleep function matching the clock
+        """
+        self._workflow = workflow
+        self._limiter = limiter
+        self._batch_size = batch_size
+        self._policy = policy or PollPolicy()
+        self._clock = clock
+        self._sleep = sleep
+
+    def watch(self, processes: Dict[Hashable, "Process"], timeout: Optional[float] = None) -> Iterator[Hashable]:
+        """
+        Yields the key of every process as soon as it is complete
+
+        :param processes: The processes to watch by key
+        :param timeout: (Optional) Seconds until a TimeoutError is raised for the processes still running
+        :return: Iterator of keys in the order of completion
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        backoffs: Dict[Hashable, Tuple[str, Backoff]] = {}
+        # (due time, sequence, key), the sequence keeps the order of keys due at the same time
+        queue: List[Tuple[float, int, Hashable]] = []
+        sequence = 0
+
+        def schedule(key: Hashable, state: str, now: float) -> None:
+            nonlocal sequence
+            previous = backoffs.get(key)
+            if previous is None or previous[0] != state:
+                backoffs[key] = (state, self._policy.backoff(state))
+            heapq.heappush(queue, (now + backoffs[key][1].next_delay(), sequence, key))
+            sequence += 1
+
+        now = self._clock()
+        for key, process in processes.items():
+            if process.state in COMPLETE_STATES:
+                yield key
+            else:
+                schedule(key, process.state, now)
+
+        while queue:
+            due = queue[0][0]
+            if deadline is not None and due > deadline:
+                raise TimeoutError(f"{len(queue)} processes still running after {timeout}s")
+            delay = due - self._clock()
+            if delay > 0:
+                self._sleep(delay)
+
+            now = self._clock()
+            keys = []
+            while queue and queue[0][0] <= now:
+                keys.append(heapq.heappop(queue)[2])
+
+            for start in range(0, len(keys), self._batch_size):
+                batch = keys[start : start + self._batch_size]
+                errors = self._workflow.refresh_states(
+                    [processes[key] for key in batch], self._batch_size, limiter=self._limiter
+                )
+
+                now = self._clock()
+                for key, error in zip(batch, errors):
+                    process = processes[key]
+                    if error is not None:
+                        logger.warning(f"Polling {key} failed, retrying: {error}")
+                        schedule(key, backoffs[key][0], now)
+                    elif process.state in COMPLETE_STATES:
+                        yield key
+                    else:
+                        schedule(key, process.state, now)
@@ -0,0 +1,419 @@
+"""
+GraphQL documents of the workflow and repository APIs, shared by the blocking and the asyncio clients.
+
+Every function returns the request body expected by :func:`~castlabs.client.Client._query_api`.
+"""
+
+from typing import List, Literal, Tuple
+
+
+def get_roots() -> dict:
+    return {
+        "operationName": "GetRootsurn_janus_organization",
+        "variables": {},
+        "query": """
+            query GetRootsurn_janus_organization {
+                roots {
+                    id
+                    name
+                    __typename
+                }
+            }""",
+    }
+
+
+FOLDER_FILE_NAME_FIELDS = """
+    id
+    name
+"""
+
+FOLDER_FILE_SIZE_FIELDS = """
+    id
+    name
+    size
+    last_modified
+"""
+
+FOLDER_FILE_FIELDS = """
+    id
+    name
+    size
+    last_modified
+    deleted
+    archived
+    archive {
+        restore_state
+        expiration
+        extra {
+            restore_tier
+            restore_eta
+        }
+    }
+"""
+
+# Field sets of the files of a folder: the names only, the names with size and modification time, or everything
+FOLDER_PROJECTIONS = {
+    "names": FOLDER_FILE_NAME_FIELDS,
+    "sizes": FOLDER_FILE_SIZE_FIELDS,
+    "full": FOLDER_FILE_FIELDS,
+}
+
+FolderProjection = Literal["names", "sizes", "full"]
+
+
+def get_folder(aws_key: str, show_deleted: bool = False, fields: FolderProjection = "full") -> dict:
+    operation_name = "filefolderlistwitharchive" if fields == "full" else f"FileFolderList{fields.capitalize()}"
+    return {
+        "operationName": operation_name,
+        "variables": {"id": aws_key, "show_deleted": show_deleted},
+        "query": f"""
+            query {operation_name}($id: ID!, $show_deleted: Boolean) {{
+                folder(id: $id) {{
+                    id
+                    name
+                    folders {{
+                        id
+                        name
+                    }}
+                    files(show_deleted: $show_deleted) {{{FOLDER_PROJECTIONS[fields]}}}
+                }}
+            }}""",
+    }
+
+
+def create_upload_ticket(aws_key: str, message: str) -> dict:
+    return {
+        "operationName": "create_upload_ticket",
+        "variables": {"folder_id": aws_key, "message": message},
+        "query": """
+            mutation create_upload_ticket($folder_id: ID!, $message: String!) {
+                createUploadTicket(input: {
+                    folder_id: $folder_id, message: $message
+                }) {
+                    directory
+                    token
+                    url
+                }
+            }""",
+    }
+
+
+def start_workflow_vod_default(
+    input_brefix: str,
+    po_item_id: str,
+    po_name: str,
+    po_destination: str,
+    vtk_template: str,
+    auto_publish: bool,
+    format_specific_data: dict | str,
+) -> dict:
+    return {
+        "operationName": "start_workflow_vod_default",
+        "variables": {
+            "input_brefix": input_brefix,
+            "po_item_id": po_item_id,
+            "po_name": po_name,
+            "po_destination": po_destination,
+            "vtk_template": vtk_template,
+            "auto_publish": auto_publish,
+            "format_specific_data": format_specific_data,
+        },
+        "query": """
+            mutation start_workflow_vod_default(
+            $po_item_id: String!,
+            $po_name: String!,
+            $input_brefix: String!,
+            $po_destination: String!,
+            $auto_publish: Boolean!,
+            $vtk_template: String!,
+            $format_specific_data: AWSJSON!,
+            $email_notification: [AWSEmail!]) {
+                start_workflow_vod_default(
+                    input: {
+                        po_name: $po_name,
+                        po_item_id: $po_item_id,
+                        input_brefix: $input_brefix,
+                        po_destination: $po_destination,
+                        auto_publish: $auto_publish,
+                        email_notification: $email_notification,
+                        vtk_template: $vtk_template,
+                        format_specific_data: $format_specific_data
+                    }) {
+                    state
+                    message
+                    input
+                    data
+                    action
+                    id
+                    start_date
+                    end_date
+                    __typename
+                }
+            }""",
+    }
+
+
+def get_pos(airline: str) -> dict:
+    return {
+        "operationName": "GetPOs",
+        "variables": {"airline": airline},
+        "query": """
+            query GetPOs($airline: String!) {
+                list_POs(input: {filter: {airline: {eq: $airline}}}) {
+                    pos {
+                        id
+                        airline
+                        po_name
+                        date_due
+                        date_created
+                        target_system
+                        __typename
+                    }
+                  __typename
+                }
+            }""",
+    }
+
+
+PO_ITEM_FIELDS = """
+    input_brefix
+    filename
+    id
+    po_item_id
+    po_destination
+    output_brefix
+    po {
+        po_name
+    }
+    publish_process {
+        id
+        state
+        data
+        message
+        start_date
+        end_date
+    }
+    workflow_process {
+        id
+        state
+        data
+        message
+        start_date
+        end_date
+    }
+    watermark
+    workflow
+    aspect_ratio
+    format_specific_data
+    preview {
+        dash_manifest_last_modified
+        dash_manifest_url
+        hls_manifest_url
+        hls_manifest_last_modified
+    }
+    tracks {
+        codec_type
+        messages
+        source {
+            codec_type
+            index
+            key
+            lang
+        }
+        lang
+    }
+    checkpoint_content_uploaded
+    checkpoint_content_complete
+    checkpoint_encodes_done
+    checkpoint_metadata_available
+"""
+
+
+PO_ITEM_MINIMAL_FIELDS = """
+    id
+    po_item_id
+"""
+
+PO_ITEM_STATUS_FIELDS = """
+    id
+    po_item_id
+    output_brefix
+    publish_process {
+        id
+        state
+        message
+        start_date
+        end_date
+    }
+    workflow_process {
+        id
+        state
+        message
+        start_date
+        end_date
+    }
+"""
+
+# Field sets of a PO item: the identifiers only, what is needed for the state and content URL, or everything
+PO_ITEM_PROJECTIONS = {
+    "minimal": PO_ITEM_MINIMAL_FIELDS,
+    "status": PO_ITEM_STATUS_FIELDS,
+    "full": PO_ITEM_FIELDS,
+}
+
+Projection = Literal["minimal", "status", "full"]
+
+
+def po_item_list(po_name: str, fields: Projection = "full") -> dict:
+    operation_name = f"PoItemList{fields.capitalize()}"
+    return {
+        "operationName": operation_name,
+        "variables": {
+            "po_name": po_name,
+        },
+        "query": f"""
+            query {operation_name}($po_name: String!) {{
+                list_POs(input: {{filter: {{po_name: {{eq: $po_name}}}}}}) {{
+                    pos {{
+                        id
+                        poitems {{{PO_ITEM_PROJECTIONS[fields]}}}
+                    }}
+                }}
+            }}""",
+    }
+
+
+def po_item(po_name: str, po_item_id: str, fields: Projection = "full") -> dict:
+    """
+    Looks up a single item of a PO, the server filters the items by `po_item_id`
+    """
+    return {
+        "operationName": "PoItem",
+        "variables": {"po_name": po_name, "po_item_id": po_item_id},
+        "query": f"""
+            query PoItem($po_name: String!, $po_item_id: String) {{
+                list_POs(input: {{filter: {{po_name: {{eq: $po_name}}}}}}) {{
+                    pos {{
+                        id
+                        poitems(po_item_id: $po_item_id) {{{PO_ITEM_PROJECTIONS[fields]}}}
+                    }}
+                }}
+            }}""",
+    }
+
+
+def po_items(lookups: List[Tuple[str, str]], fields: Projection = "status") -> dict:
+    """
+    Looks up several PO items with one request. The `list_POs` payload of the lookup at index `i` is returned under the
+    alias `i{i}`.
+
+    :param lookups: (po_name, po_item_id) pairs
+    """
+    definitions = ", ".join(f"$po_name{index}: String!, $po_item_id{index}: String" for index in range(len(lookups)))
+    selections = "".join(
+        f"""
+                i{index}: list_POs(input: {{filter: {{po_name: {{eq: $po_name{index}}}}}}}) {{
+                    pos {{
+                        id
+                        poitems(po_item_id: $po_item_id{index}) {{{PO_ITEM_PROJECTIONS[fields]}}}
+                    }}
+                }}"""
+        for index in range(len(lookups))
+    )
+    variables = {}
+    for index, (po_name, po_item_id) in enumerate(lookups):
+        variables[f"po_name{index}"] = po_name
+        variables[f"po_item_id{index}"] = po_item_id
+    return {
+        "operationName": "PoItems",
+        "variables": variables,
+        "query": f"""
+            query PoItems({definitions}) {{{selections}
+            }}""",
+    }
+
+
+PROCESS_FIELDS = """
+    action
+    data
+    id
+    message
+    state
+    start_date
+    end_date
+"""
+
+
+def get_process(process_id: str) -> dict:
+    return {
+        "operationName": "GetProcess",
+        "variables": {"id": process_id},
+        "query": f"""
+            query GetProcess($id: ID!) {{
+                process(id: $id) {{{PROCESS_FIELDS}}}
+            }}""",
+    }
+
+
+def get_processes(process_ids: List[str]) -> dict:
+    """
+    Looks up several processes with one request. The process at index `i` is returned under the alias `p{i}`.
+    """
+    definitions = ", ".join(f"$id{index}: ID!" for index in range(len(process_ids)))
+    selections = "".join(
+        f"""
+                p{index}: process(id: $id{index}) {{{PROCESS_FIELDS}}}"""
+        for index in range(len(process_ids))
+    )
+    return {
+        "operationName": "GetProcesses",
+        "variables": {f"id{index}": process_id for index, process_id in enumerate(process_ids)},
+        "query": f"""
+            query GetProcesses({definitions}) {{{selections}
+            }}""",
+    }
+
+
+def register_webhook(process_id: str, url: str) -> dict:
+    return {
+        "operationName": "registerWebhook",
+        "variables": {"input": {"process_id": process_id, "webhook_url": url}},
+        "query": """
+            mutation registerWebhook($input: RegisterWebhookInput!) {
+                registerWebhook(input: $input) {
+                    id
+                    state
+                    message
+                    action
+                }
+            }""",
+    }
+
+
+def register_webhooks(registrations: List[Tuple[str, str]]) -> dict:
+    """
+    Registers several webhooks with one request. The registration at index `i` is returned under the alias `w{i}`.
+
+    :param registrations: (process id, webhook URL) pairs
+    """
+    definitions = ", ".join(f"$input{index}: RegisterWebhookInput!" for index in range(len(registrations)))
+    selections = "".join(
+        f"""
+                w{index}: registerWebhook(input: $input{index}) {{
+                    id
+                    state
+                    message
+                    action
+                }}"""
+        for index in range(len(registrations))
+    )
+    return {
+        "operationName": "registerWebhooks",
+        "variables": {
+            f"input{index}": {"process_id": process_id, "webhook_url": url}
+            for index, (process_id, url) in enumerate(registrations)
+        },
+        "query": f"""
+            mutation registerWebhooks({definitions}) {{{selections}
+            }}""",
+    }
@@ -0,0 +1,252 @@
+"""
+Compact records of directory entries and processes for holding large listings in memory. The records keep the fields
+needed to reconcile listings, with interned names and timestamps parsed to seconds since the epoch, instead of the
+nested dicts returned by the API.
+"""
+
+import sys
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from castlabs.repository import FolderListing
+
+# Size and modification time of the files without one in a columnar listing
+MISSING_SIZE = -1
+MISSING_TIMESTAMP = float("nan")
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """
+    :param value: An ISO 8601 timestamp as returned by the API
+    :return: Seconds since the epoch, or None if the value is missing or invalid
+    """
+    try:
+        return datetime.fromisoformat(value).timestamp()  # type: ignore
+    except (TypeError, ValueError):
+        return None
+
+
+def combined_state(encoding_state: Optional[str], publish_state: Optional[str]) -> str:
+    """
+    :return: The state of a process: the state of its encoding until it is done, the state of its publishing after
+    """
+    # TODO: Check if failure state is correct
+    if encoding_state not in ("SUCCESS", "ERROR"):
+        return f"ENCODING_{encoding_state}"
+    return f"PUBLISH_{publish_state}"
+
+
+def content_url(output_brefix: str) -> str:
+    """
+    :param output_brefix: The output prefix of a PO item
+    :return: The Cloudfront content URL of the item
+    """
+    return (
+        "/".join(output_brefix.split("/")[:-2]).replace(
+            "content-repo-prod-output-castlabs-vod/castlabs-vod", "https://vod.cp.castlabs.com"
+        )
+        + "/"
+    )
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+class DirectoryEntry:
+    """
+    A folder or file of a directory listing
+    """
+
+    __slots__ = ("name", "is_folder", "size", "last_modified", "deleted", "archived")
+
+    def __init__(
+        self,
+        name: str,
+        is_folder: bool = False,
+        size: Optional[int] = None,
+        last_modified: Optional[float] = None,
+        deleted: bool = False,
+        archived: bool = False,
+    ):
+        """
+        :param name: Name of the folder or file
+        :param is_folder: (Optional) True for folders
+        :param size: (Optional) Size of the file in bytes
+        :param last_modified: (Optional) Modification time of the file in seconds since the epoch
+        :param deleted: (Optional) True for deleted files
+        :param archived: (Optional) True for archived files
+        """
+        self.name = sys.intern(name)
+        self.is_folder = is_folder
+        self.size = size
+        self.last_modified = last_modified
+        self.deleted = deleted
+        self.archived = archived
+
+    @classmethod
+    def from_content(cls, content: Dict[str, Any], is_folder: bool = False) -> "DirectoryEntry":
+        """
+        :param content: A folder or file of a listing as returned by the API, of any projection
+        :param is_folder: (Optional) True for the folders of the listing
+        """
+        size = content.get("size")
+        return cls(
+            content["name"],
+            is_folder,
+            int(size) if size is not None else None,
+            parse_timestamp(content.get("last_modified")),
+            bool(content.get("deleted")),
+            bool(content.get("archived")),
+        )
+
+    @classmethod
+    def from_folder(cls, folders: Iterable[Dict[str, Any]], files: Iterable[Dict[str, Any]]) -> List["DirectoryEntry"]:
+        """
+        :return: The entries of the sub folders and files of a folder
+        """
+        return [cls.from_content(folder, True) for folder in folders] + [cls.from_content(file) for file in files]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DirectoryEntry):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"DirectoryEntry({self.name!r}, is_folder={self.is_folder}, size={self.size})"
+
+
+class FileColumns:
+    """
+    The files of a folder tree in columns: a list of paths relative to the root of the tree, and arrays of the sizes
+    and modification times. A file costs about the size of its path plus 16 bytes.
+    """
+
+    __slots__ = ("paths", "sizes", "mtimes")
+
+    def __init__(self) -> None:
+        self.paths: List[str] = []
+        # bytes, MISSING_SIZE if the listing has no size
+        self.sizes = array("q")
+        # seconds since the epoch, MISSING_TIMESTAMP if the listing has no modification time
+        self.mtimes = array("d")
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def append(self, path: str, content: Dict[str, Any]) -> None:
+        """
+        :param path: Path of the file relative to the root of the tree
+        :param content: The file as returned by the API
+        """
+        size = content.get("size")
+        mtime = parse_timestamp(content.get("last_modified"))
+        self.paths.append(path)
+        self.sizes.append(int(size) if size is not None else MISSING_SIZE)
+        self.mtimes.append(mtime if mtime is not None else MISSING_TIMESTAMP)
+
+    @classmethod
+    def from_walk(cls, listings: Iterable[FolderListing], root: str) -> "FileColumns":
+        """
+        :param listings: The listings of a folder tree, see :meth:`~castlabs.repository.Repository.walk`
+        :param root: The route of the walked folder
+        :return: The files of the tree that are not deleted
+        """
+        columns = cls()
+        prefix = root.strip("/")
+        for route, _, files in listings:
+            folder = route.strip("/")[len(prefix) :].strip("/")
+            for content in files:
+                if not content.get("deleted"):
+                    columns.append(f"{folder}/{content['name']}" if folder else content["name"], content)
+        return columns
+
+    def __iter__(self) -> Iterator[Tuple[str, int, float]]:
+        """
+        :return: The path, size and modification time of every file
+        """
+        return zip(self.paths, self.sizes, self.mtimes)
+
+    @property
+    def total_size(self) -> int:
+        return sum(size for size in self.sizes if size != MISSING_SIZE)
+
+
+class ProcessRecord:
+    """
+    The state of a process without the track, preview and format data of its PO item
+    """
+
+    __slots__ = (
+        "name",
+        "encoding_id",
+        "encoding_state",
+        "publish_id",
+        "publish_state",
+        "output_brefix",
+        "start_date",
+        "end_date",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        encoding_id: Optional[str] = None,
+        encoding_state: Optional[str] = None,
+        publish_id: Optional[str] = None,
+        publish_state: Optional[str] = None,
+        output_brefix: Optional[str] = None,
+        start_date: Optional[float] = None,
+        end_date: Optional[float] = None,
+    ):
+        """
+        :param name: Name of the process, the PO item id
+        :param encoding_id: (Optional) Id of the encoding sub-process
+        :param encoding_state: (Optional) State of the encoding sub-process
+        :param publish_id: (Optional) Id of the publish sub-process
+        :param publish_state: (Optional) State of the publish sub-process
+        :param output_brefix: (Optional) The output prefix of the PO item
+        :param start_date: (Optional) Start of the encoding in seconds since the epoch
+        :param end_date: (Optional) End of the publishing, or of the encoding before it is published
+        """
+        self.name = sys.intern(name)
+        self.encoding_id = encoding_id
+        self.encoding_state = _intern(encoding_state)
+        self.publish_id = publish_id
+        self.publish_state = _intern(publish_state)
+        self.output_brefix = output_brefix
+        self.start_date = start_date
+        self.end_date = end_date
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "ProcessRecord":
+        """
+        :param item: A PO item as returned by the API, of any projection
+        """
+        encoding_process = item.get("workflow_process") or {}
+        publish_process = item.get("publish_process") or {}
+        return cls(
+            item["po_item_id"],
+            encoding_process.get("id"),
+            encoding_process.get("state"),
+            publish_process.get("id"),
+            publish_process.get("state"),
+            item.get("output_brefix"),
+            parse_timestamp(encoding_process.get("start_date")),
+            parse_timestamp(publish_process.get("end_date") or encoding_process.get("end_date")),
+        )
+
+    @property
+    def state(self) -> str:
+        """
+        :return: The state of the process as of its listing, see :attr:`~castlabs.workflow.Process.state`
+        """
+        return combined_state(self.encoding_state, self.publish_state)
+
+    @property
+    def content_url(self) -> Optional[str]:
+        return content_url(self.output_brefix) if self.output_brefix else None
+
+    def __repr__(self) -> str:
+        return f"ProcessRecord({self.name!r}, state={self.state!r})"
@@ -1,16 +1,51 @@
 import json
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
 from logging import getLogger
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple, TypedDict
 from urllib.parse import urlparse
 from urllib.request import Request, urlopen
 
 import boto3
+import botocore.loaders
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
+from botocore.exceptions import ClientError
 
 import castlabs.client as client
+from castlabs import instrumentation, queries
+from castlabs.cache import CREDENTIALS_REFRESH_MARGIN, DEFAULT_TTL, Cache
+from castlabs.instrumentation import TransferEvent, instrument_s3_client
+from castlabs.multipart import (
+    ProgressCallback,
+    MultipartUpload,
+    ProgressTracker,
+    StreamingUpload,
+    UploadConfig,
+    UploadSource,
+)
+from castlabs.queries import FolderProjection
+
+if TYPE_CHECKING:  # pragma: no cover
+    from castlabs.aio import AsyncRepository
+    from castlabs.index import RepositoryIndex
 
 logger = getLogger("castlabs.repository")
 
+# Assumed lifetime of upload credentials that come without an expiration, the minimum of an STS session
+DEFAULT_CREDENTIALS_LIFETIME = 900
+# Keep-alive connections to S3 per S3 client
+DEFAULT_MAX_POOL_CONNECTIONS = 64
+# Number of upload tickets whose S3 clients are kept
+DEFAULT_MAX_S3_CLIENTS = 64
+# Number of folders listed at once while walking a folder tree
+DEFAULT_WALK_CONCURRENCY = 8
+
 
 class ContentsOfDirectory(TypedDict):
     id: str
@@ -22,6 +57,18 @@ class ContentsOfDirectory(TypedDict):
     archive: Any
 
 
+# A folder of a walk: its route, its sub folders and its files
+FolderListing = Tuple[str, List[ContentsOfDirectory], List[ContentsOfDirectory]]
+
+
+def sub_route(route: str, name: str) -> str:
+    """
+    :return: The route of a sub folder or file of the folder at `route`
+    """
+    route = route.strip("/")
+    return f"{route}/{name}" if route else name
+
+
 class Repository:
     """
     The Repository class exposes functionality directly related to the repository and file-management
@@ -29,27 +76,24 @@ class Repository:
     to do this manually.
     """
 
-    def __init__(self, client: client.Client):
-
+    def __init__(self, client: client.Client, cache: Optional[Cache] = None, index: Optional["RepositoryIndex"] = None):
+        """
+        :param client: The API client
+        :param cache: (Optional) Cache of the storage locations, upload tickets and upload credentials
+        :param index: (Optional) Local index answering the listings of recently listed folders
+        """
         self.client = client
+        self.cache = cache
+        self.index = index
+        self.s3_clients = S3ClientFactory()
 
     def get_storage_locations(self) -> list:
-        logger.info("Getting storage locations")
-        storage_configs = self.client._query_api(
-            "repository",
-            query={
-                "operationName": "GetRootsurn_janus_organization",
-                "variables": {},
-                "query": """
-                    query GetRootsurn_janus_organization {
-                        roots {
-                            id
-                            name
-                            __typename
-                        }
-                    }""",
-            },
-            content_key="roots",
+        def get_roots() -> list:
+            logger.info("Getting storage locations")
+            return self.client._query_api("repository", query=queries.get_roots(), content_key="roots")
+
+        storage_configs = (
+            self.cache.get_or_set(f"roots|{self.client.cache_namespace}", get_roots) if self.cache else get_roots()
         )
         return [StorageLocation(storage_config, self) for storage_config in storage_configs]
 
@@ -75,44 +119,86 @@ class Repository:
     def get_content_of_directory(
         self, storage: "StorageLocation", route: str, show_deleted: bool = False
     ) -> List[ContentsOfDirectory]:
+        return list(self.iter_directory(storage, route, show_deleted))
+
+    def _get_folder(
+        self, storage: "StorageLocation", route: str, show_deleted: bool = False, fields: FolderProjection = "full"
+    ) -> Dict[str, Any]:
+        """
+        With an index, the names and sizes of a recently listed folder are answered from the index, other listings
+        are stored in it
+        """
+        indexed = self.index is not None and not show_deleted
+        if indexed and fields != "full":
+            folder = self.index.get_folder(storage.full_location, route)  # type: ignore
+            if folder is not None:
+                return folder
+            fields = "sizes"
+
         aws_key = storage.get_location_with_path(route, is_folder=True)
         logger.info(f"Getting content of directory {aws_key}")
         folder = self.client._query_api_dict(
-            "repository",
-            query={
-                "operationName": "filefolderlistwitharchive",
-                "variables": {"id": aws_key, "show_deleted": show_deleted},
-                "query": """
-                    query filefolderlistwitharchive($id: ID!, $show_deleted: Boolean) {
-                        folder(id: $id) {
-                            id
-                            name
-                            folders {
-                                id
-                                name
-                            }
-                            files(show_deleted: $show_deleted) {
-                                id
-                                name
-                                size
-                                last_modified
-                                deleted
-                                archived
-                                archive {
-                                    restore_state
-                                    expiration
-                                    extra {
-                                        restore_tier
-                                        restore_eta
-                                    }
-                                }
-                             }
-                        }
-                    }""",
-            },
-            content_key="folder",
+            "repository", query=queries.get_folder(aws_key, show_deleted, fields), content_key="folder"
         )
-        return folder["folders"] + folder["files"]  # type: ignore
+        if indexed:
+            self.index.record(storage.full_location, route, folder)  # type: ignore
+        return folder
+
+    def iter_directory(
+        self, storage: "StorageLocation", route: str, show_deleted: bool = False, fields: FolderProjection = "full"
+    ) -> Iterator[ContentsOfDirectory]:
+        """
+        The sub folders of a folder followed by its files, without copying the listing
+
+        :param storage: The storage location of the folder
+        :param route: Path of the folder within the storage location
+        :param show_deleted: (Optional) Include deleted files
+        :param fields: (Optional) The fields of the files: 'names', 'sizes' (name, size and last_modified) or 'full'
+        """
+        folder = self._get_folder(storage, route, show_deleted, fields)
+        yield from folder["folders"]
+        yield from folder["files"]
+
+    def walk(
+        self,
+        storage: "StorageLocation",
+        route: str,
+        show_deleted: bool = False,
+        fields: FolderProjection = "full",
+        max_concurrency: int = DEFAULT_WALK_CONCURRENCY,
+    ) -> Iterator[FolderListing]:
+        """
+        Walk a folder and all of its sub folders, listing up to `max_concurrency` folders at once. Folders are yielded
+        as their listings arrive, each after its parent folder; at most `max_concurrency` listings are held at a time.
+
+        :param storage: The storage location of the folder
+        :param route: Path of the folder within the storage location
+        :param show_deleted: (Optional) Include deleted files
+        :param fields: (Optional) The fields of the files: 'names', 'sizes' (name, size and last_modified) or 'full'
+        :param max_concurrency: (Optional) Maximum number of folder listings in flight
+        :return: The route, the sub folders and the files of every folder
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        pending: Deque[str] = deque([route])
+        running: Dict[Future, str] = {}
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="castlabs-walk")
+        try:
+            while pending or running:
+                while pending and len(running) < max_concurrency:
+                    folder_route = pending.popleft()
+                    running[executor.submit(self._get_folder, storage, folder_route, show_deleted, fields)] = (
+                        folder_route
+                    )
+                done: Set[Future] = wait(running, return_when=FIRST_COMPLETED).done
+                for future in done:
+                    folder_route = running.pop(future)
+                    folder = future.result()
+                    pending.extend(sub_route(folder_route, sub_folder["name"]) for sub_folder in folder["folders"])
+                    yield folder_route, folder["folders"], folder["files"]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def create_upload_ticket(self, aws_key: str, message: str) -> str:
         """
@@ -122,34 +208,26 @@ class Repository:
         :param message: A message that will be shown to the user if this url is accessed via a browser
         :return: HTTP URL
         """
-        logger.info(f"Creating upload ticket for {aws_key}")
-        upload_payload = self.client._query_api_dict(
-            "repository",
-            query={
-                "operationName": "create_upload_ticket",
-                "variables": {"folder_id": aws_key, "message": message},
-                "query": """
-                    mutation create_upload_ticket($folder_id: ID!, $message: String!) {
-                        createUploadTicket(input: {
-                            folder_id: $folder_id, message: $message
-                        }) {
-                            directory
-                            token
-                            url
-                        }
-                    }""",
-            },
-            content_key="createUploadTicket",
-        )
-        return upload_payload["url"]
+
+        def create() -> str:
+            logger.info(f"Creating upload ticket for {aws_key}")
+            upload_payload = self.client._query_api_dict(
+                "repository", query=queries.create_upload_ticket(aws_key, message), content_key="createUploadTicket"
+            )
+            return upload_payload["url"]
+
+        if self.cache is None:
+            return create()
+        return self.cache.get_or_set(f"ticket|{self.client.cache_namespace}|{aws_key}|{message}", create, DEFAULT_TTL)
 
 
-class StorageLocation:
+class BaseStorageLocation:
     """
-    The StorageLocation class technically represents a root folder location accessible by the user
+    A root folder location accessible by the user, shared by :class:`StorageLocation` and
+    :class:`~castlabs.aio.AsyncStorageLocation`
     """
 
-    def __init__(self, config: dict, repository: Repository) -> None:
+    def __init__(self, config: dict, repository: "Repository | AsyncRepository") -> None:
         self.name = config["name"]
         self.bucket = urlparse(config["id"]).netloc
         self.path = urlparse(config["id"]).path.lstrip("/")
@@ -163,13 +241,124 @@ class StorageLocation:
         full_path = self.full_location + path
         return full_path + "/" if not full_path.endswith("/") and is_folder else full_path
 
-    def create_upload_client(self, path: str, message: str = "") -> "UploadClient":
+
+class StorageLocation(BaseStorageLocation):
+    """
+    The StorageLocation class technically represents a root folder location accessible by the user
+    """
+
+    repository: Repository
+
+    def __init__(self, config: dict, repository: Repository) -> None:
+        super().__init__(config, repository)
+
+    def create_upload_client(
+        self, path: str, message: str = "", upload_config: Optional[UploadConfig] = None
+    ) -> "UploadClient":
         """
         :param path: Defines a folder path to which you want to upload within the StorageLocation
         :param message: A message that will be shown to the user if this url is accessed via a browser
+        :param upload_config: (Optional) Part size, concurrency and bandwidth of the uploads
         :return: A URL which can be used in the
         """
-        return UploadClient(self, path, message)
+        return UploadClient(
+            self,
+            path,
+            message,
+            upload_config=upload_config,
+            cache=self.repository.cache,
+            s3_clients=self.repository.s3_clients,
+        )
+
+
+class _TicketCredentialProvider(CredentialProvider):
+    """
+    Hands the credentials of an upload ticket to a botocore session
+    """
+
+    METHOD = "castlabs-upload-ticket"
+
+    def __init__(self, credentials: RefreshableCredentials):
+        super().__init__()
+        self._credentials = credentials
+
+    def load(self) -> RefreshableCredentials:
+        return self._credentials
+
+
+class S3ClientFactory:
+    """
+    Creates and owns the S3 clients of the upload tickets. Every client gets a botocore session whose only credentials
+    are the ones of its ticket, fetched again before they expire. The sessions share one loader, so the service model
+    is read once. The client of a ticket is reused by all upload clients of the ticket, which ask for it on every use
+    and keep no reference, so dropping the clients of the least recently used tickets bounds the number of S3 clients
+    and their connection pools.
+    """
+
+    def __init__(
+        self, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS, max_clients: int = DEFAULT_MAX_S3_CLIENTS
+    ):
+        """
+        :param max_pool_connections: (Optional) Maximum number of keep-alive connections per S3 client
+        :param max_clients: (Optional) Number of upload tickets whose clients are kept
+        """
+        self._config = Config(max_pool_connections=max_pool_connections)
+        self._max_clients = max_clients
+        self._loader = botocore.loaders.create_loader()
+        self._clients: "OrderedDict[str, Any]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get_client(self, upload_url: str, fetch_credentials: Callable[[], Dict[str, str]]) -> Any:
+        """
+        :param upload_url: The upload ticket
+        :param fetch_credentials: Returns the current credentials of the ticket in the format of botocore
+        :return: Boto3 S3 client
+        """
+        with self._lock:
+            if upload_url in self._clients:
+                self._clients.move_to_end(upload_url)
+                return self._clients[upload_url]
+            pending = self._pending.get(upload_url)
+            if pending is None:
+                pending = self._pending[upload_url] = Future()
+                creating = True
+            else:
+                creating = False
+
+        if not creating:
+            return pending.result()
+
+        # the client is created outside of the lock, other threads asking for the ticket wait
+        try:
+            s3 = self._create_client(fetch_credentials)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[upload_url]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[upload_url]
+            self._clients[upload_url] = s3
+            while len(self._clients) > self._max_clients:
+                self._clients.popitem(last=False)
+        pending.set_result(s3)
+        return s3
+
+    def _create_client(self, fetch_credentials: Callable[[], Dict[str, str]]) -> Any:
+        credentials = RefreshableCredentials.create_from_metadata(
+            metadata=fetch_credentials(), refresh_using=fetch_credentials, method=_TicketCredentialProvider.METHOD
+        )
+        session = botocore.session.Session()
+        session.register_component("data_loader", self._loader)
+        session.register_component("credential_provider", CredentialResolver([_TicketCredentialProvider(credentials)]))
+        s3 = boto3.Session(botocore_session=session, region_name="us-east-1").client("s3", config=self._config)
+        instrument_s3_client(s3)
+        return s3
 
 
 class UploadClient:
@@ -177,53 +366,189 @@ class UploadClient:
     This client allows the user to upload files programmatically to a storage location
     """
 
-    def __init__(self, storage_location: StorageLocation, path: str, message: str) -> None:
+    def __init__(
+        self,
+        storage_location: BaseStorageLocation,
+        path: str,
+        message: str,
+        upload_url: Optional[str] = None,
+        upload_config: Optional[UploadConfig] = None,
+        cache: Optional[Cache] = None,
+        s3_clients: Optional[S3ClientFactory] = None,
+    ) -> None:
+        """
+        :param storage_location: The StorageLocation to upload to
+        :param path: Folder path within the StorageLocation
+        :param message: A message that will be shown to the user if the upload ticket is accessed via a browser
+        :param upload_url: (Optional) An existing upload ticket for the path. A new ticket is created otherwise, which
+        requires a :class:`StorageLocation`.
+        :param upload_config: (Optional) Part size, concurrency and bandwidth of the uploads
+        :param cache: (Optional) Cache of the upload credentials, until shortly before they expire
+        :param s3_clients: (Optional) The S3 clients of the repository, shared with the other upload clients of the
+        ticket
+        """
         self._storage_location = storage_location
+        self._cache = cache
         self._message = message
-        self._aws_s3_client = None
+        self.upload_config = upload_config or UploadConfig()
+        self._s3_clients = s3_clients if s3_clients is not None else S3ClientFactory()
 
         full_path = storage_location.path + path
         self._path = full_path if full_path.endswith("/") else full_path + "/"
-
-        aws_key = storage_location.get_location_with_path(path, is_folder=True)
-        self.upload_url = storage_location.repository.create_upload_ticket(aws_key, self._message)
+        self._route = path
+
+        if upload_url is None:
+            if not isinstance(storage_location, StorageLocation):
+                raise TypeError(
+                    "An upload client of an AsyncStorageLocation needs an upload ticket, "
+                    "create it with AsyncStorageLocation.create_upload_client"
+                )
+            aws_key = storage_location.get_location_with_path(path, is_folder=True)
+            upload_url = storage_location.repository.create_upload_ticket(aws_key, self._message)
+        self.upload_url = upload_url
 
     @property
     def aws_s3_client(self) -> Any:
         """
-        Based on the upload-ticket the user can retrieve an AWS BOTO3 S3 client
+        Based on the upload-ticket the user can retrieve an AWS BOTO3 S3 client. Its credentials are fetched again
+        from the upload ticket before they expire, so the client can be kept and shared by threads for transfers of
+        any length. The client is shared with the other upload clients of the ticket and owned by the
+        :class:`S3ClientFactory`, it is not kept by the upload client.
 
         :return: Boto3 S3 client
         """
-        if not self._aws_s3_client:
-            # authenticate with the uploader tool
-            uploader_auth_request = Request(url=self.upload_url.replace("/#/", "/api_v1/upload/"), method="GET")
-            uploader_auth_response = urlopen(uploader_auth_request).read().decode()
-            uploader_auth_json = json.loads(uploader_auth_response)
-            aws_session = boto3.Session(
-                aws_access_key_id=uploader_auth_json["AccessKeyId"],
-                aws_secret_access_key=uploader_auth_json["SecretAccessKey"],
-                aws_session_token=uploader_auth_json["SessionToken"],
-                region_name="us-east-1",
-            )
-            self._aws_s3_client = aws_session.client("s3")
-            return self.aws_s3_client
+        return self._s3_clients.get_client(self.upload_url, self._fetch_credentials)
 
-        return self._aws_s3_client
+    def _fetch_credentials(self) -> Dict[str, str]:
+        """
+        Authenticate with the uploader tool of the upload ticket
 
-    def upload_file(self, file_name: str) -> bool:
+        :return: Temporary AWS credentials in the format of botocore
+        """
+        cache_key = f"credentials|{self.upload_url}"
+        if self._cache is not None and (credentials := self._cache.get(cache_key)) is not None:
+            return credentials
+
+        logger.info("Fetching upload credentials")
+        uploader_auth_request = Request(url=self.upload_url.replace("/#/", "/api_v1/upload/"), method="GET")
+        uploader_auth_response = urlopen(uploader_auth_request).read().decode()
+        uploader_auth_json = json.loads(uploader_auth_response)
+
+        expiration = uploader_auth_json.get("Expiration")
+        if isinstance(expiration, (int, float)):
+            expiration = datetime.fromtimestamp(expiration, timezone.utc).isoformat()
+        expiry_time = (
+            expiration or (datetime.now(timezone.utc) + timedelta(seconds=DEFAULT_CREDENTIALS_LIFETIME)).isoformat()
+        )
+        credentials = {
+            "access_key": uploader_auth_json["AccessKeyId"],
+            "secret_key": uploader_auth_json["SecretAccessKey"],
+            "token": uploader_auth_json["SessionToken"],
+            "expiry_time": expiry_time,
+        }
+        if self._cache is not None:
+            expires = datetime.fromisoformat(expiry_time)
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+            ttl = (expires - datetime.now(timezone.utc)).total_seconds()
+            if ttl > CREDENTIALS_REFRESH_MARGIN:
+                self._cache.set(cache_key, credentials, ttl - CREDENTIALS_REFRESH_MARGIN)
+        return credentials
+
+    def upload_file(
+        self, file_name: str, progress: Optional[ProgressCallback] = None, config: Optional[UploadConfig] = None
+    ) -> bool:
         """
-        Programmatically upload a file to the storage location
+        Programmatically upload a file to the storage location. Large files are uploaded in parallel parts.
+        With a resumable config, uploading a file again after a failure only sends the parts that are missing.
 
         :param file_name: Local file path of the file to upload
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the file
+        :param config: (Optional) Overrides the upload config of the client for this file
         :return: True if successfully uploaded. An error is raised otherwise.
         """
-        # Todo: a callback for progress tracking could be established:
-        # https://boto3.amazonaws.com/v1/documentation/api/latest/guide/s3-uploading-files.html#the-callback-parameter
         object_name = self._path + os.path.basename(file_name)
-        self.aws_s3_client.upload_file(file_name, self._storage_location.bucket, object_name)
+        file_size = os.path.getsize(file_name)
+        config = config or self.upload_config
+        logger.info(f"Uploading {file_name} ({file_size} bytes) to {object_name}")
+        started = time.perf_counter() if instrumentation.enabled() else None
+
+        if config.reads_parts and file_size >= config.multipart_threshold:
+            upload = MultipartUpload(self.aws_s3_client, self._storage_location.bucket, object_name, file_name, config)
+            upload.run(progress)
+        else:
+            self.aws_s3_client.upload_file(
+                file_name,
+                self._storage_location.bucket,
+                object_name,
+                Config=config.transfer_config(file_size),
+                Callback=ProgressTracker(file_size, progress) if progress else None,
+            )
+        if started is not None:
+            instrumentation.emit(TransferEvent("file", object_name, file_size, time.perf_counter() - started))
+        self.invalidate_listing()
+        return True
+
+    def upload_stream(
+        self,
+        source: UploadSource,
+        name: str,
+        size: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        config: Optional[UploadConfig] = None,
+    ) -> bool:
+        """
+        Upload from a file-like object, a bytes-like object or an iterator of byte chunks without writing it to disk.
+        The stream is read and uploaded in parts, so memory stays bounded by the part size and concurrency.
+
+        :param source: A binary file-like object, a bytes-like object or an iterable of byte chunks
+        :param name: Name of the remote file
+        :param size: (Optional) Size of the stream in bytes if it is known, to choose the part size
+        :param progress: (Optional) Called with the bytes transferred so far and the size of the stream, 0 if unknown
+        :param config: (Optional) Overrides the upload config of the client for this stream
+        :return: True if successfully uploaded. An error is raised otherwise.
+        """
+        self.create_streaming_upload(name, size, config).run(source, progress)
+        self.invalidate_listing()
         return True
 
+    def create_streaming_upload(
+        self, name: str, size: Optional[int] = None, config: Optional[UploadConfig] = None
+    ) -> StreamingUpload:
+        """
+        :param name: Name of the remote file
+        :param size: (Optional) Size of the stream in bytes if it is known, to choose the part size
+        :param config: (Optional) Overrides the upload config of the client for this stream
+        :return: An upload to the folder of the client that is fed by :meth:`StreamingUpload.run` or
+        :meth:`StreamingUpload.run_async`
+        """
+        object_name = self._path + name
+        logger.info(f"Streaming upload to {object_name}")
+        return StreamingUpload(
+            self.aws_s3_client, self._storage_location.bucket, object_name, config or self.upload_config, size
+        )
+
+    def invalidate_listing(self) -> None:
+        """
+        Have the folder of the client listed again after an upload, if the repository keeps an index
+        """
+        repository = self._storage_location.repository
+        if repository is not None and repository.index is not None:
+            repository.index.invalidate(self._storage_location.full_location, self._route)
+
+    def remote_etag(self, name: str) -> Optional[str]:
+        """
+        :param name: Name of a file in the folder of the client
+        :return: The ETag of the remote file without quotes, or None if there is no such file
+        """
+        try:
+            response = self.aws_s3_client.head_object(Bucket=self._storage_location.bucket, Key=self._path + name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["ETag"].strip('"')
+
     def generate_presigned_url(self, expiration: int = 3600) -> Dict[str, str | Dict[str, str]]:
         """
         Generate a presigned URL to share an object
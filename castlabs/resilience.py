@@ -0,0 +1,242 @@
+"""
+Retries, circuit breakers and adaptive concurrency limits for the requests to the API hosts.
+
+Queries are retried on throttling (429), server errors (5xx), timeouts and dropped connections. Mutations are only
+retried when the server cannot have processed them: when the connection could not be opened or the request was
+throttled. Retries wait for `Retry-After` when the server sends one, and a decorrelated jitter otherwise, so that
+clients failing together do not retry in lockstep.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from logging import getLogger
+from typing import Callable, Literal, Optional
+
+logger = getLogger("castlabs.resilience")
+
+# Responses worth another attempt of an idempotent request
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Responses telling the client to send fewer requests
+THROTTLING_STATUSES = frozenset({429, 503})
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.2
+DEFAULT_MAX_DELAY = 20.0
+# Consecutive failures of a host that open its circuit, and seconds until a request is let through again
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+def is_mutation(query: Optional[dict]) -> bool:
+    """
+    :param query: The body of a GraphQL request
+    :return: True if the request changes data on the server
+    """
+    return bool(query) and query.get("query", "").lstrip().startswith("mutation")  # type: ignore
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    :param value: A `Retry-After` header, in seconds or as HTTP date
+    :return: Seconds to wait, None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed request is sent again and how long to wait before
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        rng: Optional[random.Random] = None,
+    ):
+        """
+        :param max_attempts: (Optional) Attempts per request including the first one, 1 disables retries
+        :param base_delay: (Optional) Shortest delay in seconds before a retry
+        :param max_delay: (Optional) Longest delay in seconds before a retry, a longer `Retry-After` fails the request
+        :param rng: (Optional) Source of the jitter
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def should_retry(
+        self,
+        attempt: int,
+        idempotent: bool,
+        status: Optional[int] = None,
+        connect_failed: bool = False,
+        retry_after: Optional[float] = None,
+    ) -> bool:
+        """
+        :param attempt: Number of the attempt that failed, starting with 1
+        :param idempotent: False for requests that must not be processed twice, like mutations
+        :param status: (Optional) HTTP status of the response, None if no response was received
+        :param connect_failed: (Optional) True if the connection could not be opened, the request was not sent
+        :param retry_after: (Optional) Seconds the server asked to wait, no retry is sent if it exceeds `max_delay`
+        :return: True if the request should be sent again
+        """
+        if attempt >= self.max_attempts or (retry_after is not None and retry_after > self.max_delay):
+            return False
+        if connect_failed or status == 429:
+            return True
+        if status is None or status in RETRYABLE_STATUSES:
+            return idempotent
+        return False
+
+    def next_delay(self, previous: float, retry_after: Optional[float] = None) -> float:
+        """
+        Decorrelated jitter: a random delay between the base delay and three times the previous one
+
+        :param previous: The previous delay, 0 before the first retry
+        :param retry_after: (Optional) Seconds the server asked to wait
+        :return: Seconds to wait before the next attempt
+        """
+        if retry_after is not None:
+            return retry_after
+        return min(self.max_delay, self._rng.uniform(self.base_delay, max(previous, self.base_delay) * 3))
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a host after `failure_threshold` consecutive failures. After `reset_timeout` seconds a
+    single request is let through: its success closes the circuit again, its failure keeps it open.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param failure_threshold: (Optional) Consecutive failures that open the circuit
+        :param reset_timeout: (Optional) Seconds the circuit stays open before a request is tried again
+        :param clock: (Optional) Monotonic clock in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._clock() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """
+        :return: True if a request may be sent
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or self._clock() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+class AdaptiveLimit:
+    """
+    An additive increase, multiplicative decrease (AIMD) limit of the requests in flight. Every response below the
+    latency tolerance raises the limit by about one per round-trip of all requests in flight; a throttled response,
+    or a latency above `latency_tolerance` times the smoothed latency, halves it, at most once per smoothed latency.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        latency_tolerance: Optional[float] = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param maximum: Largest limit, and the limit to start with
+        :param minimum: (Optional) Smallest limit
+        :param latency_tolerance: (Optional) Factor of the smoothed latency above which the limit is decreased, None
+        to adapt to throttling only
+        :param clock: (Optional) Monotonic clock in seconds
+        """
+        self.maximum = maximum
+        self.minimum = minimum
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._decreased_at = float("-inf")
+
+    def acquire(self) -> None:
+        """
+        Wait until a request may be sent
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, throttled: bool = False) -> None:
+        """
+        :param latency: Seconds until the response of the request arrived
+        :param throttled: (Optional) True if the server asked for fewer requests
+        """
+        with self._condition:
+            self.in_flight -= 1
+            slow = (
+                self.latency is not None
+                and self.latency_tolerance is not None
+                and latency > self.latency * self.latency_tolerance
+            )
+            if throttled or slow:
+                now = self._clock()
+                if now - self._decreased_at >= (self.latency or 0.0):
+                    self._decreased_at = now
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    logger.debug(f"Concurrency limit decreased to {int(self.limit)}")
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            if not throttled:
+                self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+            self._condition.notify_all()
@@ -0,0 +1,230 @@
+"""
+Submission of many encodings at once: every group is listed once to skip the encodings that already exist, the
+workflows are started in parallel under a rate ceiling and the webhooks are registered in batches.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from logging import getLogger
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, computed_field
+
+from castlabs import queries
+from castlabs.polling import RateLimiter
+from castlabs.records import ProcessRecord, combined_state
+from castlabs.repository import StorageLocation
+from castlabs.workflow import DEFAULT_BATCH_SIZE, Workflow, find_item
+
+logger = getLogger("castlabs.submissions")
+
+# Number of workflows started at once
+DEFAULT_SUBMIT_CONCURRENCY = 8
+# Maximum number of workflows started per second
+DEFAULT_MAX_SUBMIT_RATE = 5.0
+# Webhook error of an encoding whose publish sub-process does not exist yet when its webhooks are registered
+PUBLISH_NOT_CREATED = "The publish process is not created yet, poll the encoding to follow its publishing"
+
+
+class EncodingJob(BaseModel):
+    remote_path: str
+    group_name: str = "default_group"
+    encode_name: Optional[str] = None
+    template: str = "cmaf-abr"
+    format_specific_data: dict | str = "{}"
+    webhook_url: Optional[str] = None
+
+    @computed_field
+    @property
+    def name(self) -> str:
+        return self.encode_name or self.remote_path.split("/")[-1]
+
+
+class SubmissionResult(BaseModel):
+    job: EncodingJob
+    # id of the encoding sub-process
+    process_id: Optional[str] = None
+    state: Optional[str] = None
+    # True if the encoding already existed and was not started again
+    skipped: bool = False
+    webhook_error: Optional[str] = None
+    error: Optional[str] = None
+
+    @computed_field
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+    @property
+    def encoding(self) -> Tuple[str, str]:
+        """
+        :return: The (group_name, encode_name) pair to follow the encoding with, e.g.
+        :func:`~castlabs.api.ContentPlatform.iter_completed`
+        """
+        return self.job.group_name, self.job.name
+
+
+def list_existing(
+    workflow: Workflow, group_names: Iterable[str]
+) -> Tuple[Dict[Tuple[str, str], ProcessRecord], Dict[str, Exception]]:
+    """
+    Lists every group once
+
+    :return: The processes per (group_name, encode_name) and the exception raised per group that could not be listed
+    """
+    existing: Dict[Tuple[str, str], ProcessRecord] = {}
+    errors: Dict[str, Exception] = {}
+    for group_name in dict.fromkeys(group_names):
+        try:
+            for record in workflow.get_process_records(group_name, fields="status"):
+                existing[(group_name, record.name)] = record
+        except Exception as e:
+            errors[group_name] = e
+    return existing, errors
+
+
+def submit_encodings(
+    jobs: Iterable[EncodingJob],
+    workflow: Workflow,
+    storage_location: StorageLocation,
+    max_concurrency: int = DEFAULT_SUBMIT_CONCURRENCY,
+    max_rate: float = DEFAULT_MAX_SUBMIT_RATE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[SubmissionResult]:
+    """
+    Start many encodings. Jobs whose encoding already exists in its group, or that repeat an earlier job, are skipped
+    and nothing is started for the jobs of a group that cannot be listed. The webhooks are registered in batches of
+    the submissions completed meanwhile, for the encoding sub-process and, if the platform created it already, the
+    publish sub-process, before the results of the batch are yielded. A publish sub-process that does not exist yet
+    is reported as the `webhook_error` of its result, see :data:`PUBLISH_NOT_CREATED`. Closing the iterator early
+    cancels the submissions not started yet and still registers the webhooks of the ones started.
+
+    :param jobs: The encodings to start
+    :param workflow: The workflow API
+    :param storage_location: The storage location of the remote paths
+    :param max_concurrency: (Optional) Number of workflows started at once
+    :param max_rate: (Optional) Maximum number of workflows started per second
+    :param batch_size: (Optional) Number of webhooks registered per request
+    :return: Iterator of the result per job, in the order of completion
+    """
+    jobs = list(jobs)
+    existing, group_errors = list_existing(workflow, (job.group_name for job in jobs))
+
+    to_submit: Dict[Tuple[str, str], EncodingJob] = {}
+    for job in jobs:
+        encoding = (job.group_name, job.name)
+        if job.group_name in group_errors:
+            yield SubmissionResult(
+                job=job, error=f"Listing group {job.group_name} failed: {group_errors[job.group_name]}"
+            )
+        elif encoding in existing:
+            record = existing[encoding]
+            yield SubmissionResult(job=job, process_id=record.encoding_id, state=record.state, skipped=True)
+        elif encoding in to_submit:
+            yield SubmissionResult(job=job, skipped=True)
+        else:
+            to_submit[encoding] = job
+
+    limiter = RateLimiter(max_rate)
+
+    def submit(job: EncodingJob) -> dict:
+        limiter.acquire()
+        return workflow.submit_vod_encoding(
+            storage_location,
+            job.remote_path,
+            job.group_name,
+            job.name,
+            template=job.template,
+            format_specific_data=job.format_specific_data,
+        )
+
+    futures: Dict[Future, EncodingJob] = {}
+    awaiting_webhook: List[SubmissionResult] = []
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        futures = {executor.submit(submit, job): job for job in to_submit.values()}
+        pending = set(futures)
+        while pending or awaiting_webhook:
+            # register the webhooks collected so far when no other submission is complete yet
+            done, pending = wait(pending, timeout=0 if awaiting_webhook else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = submission_result(futures.pop(future), future)
+                if result.success and result.job.webhook_url and result.process_id:
+                    awaiting_webhook.append(result)
+                else:
+                    yield result
+            if awaiting_webhook and (not done or len(awaiting_webhook) >= batch_size):
+                registered, awaiting_webhook = awaiting_webhook, []
+                yield from register_webhooks(workflow, registered, batch_size)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        # the encodings started but not yielded when the iterator is closed early still get their webhooks
+        unreported = awaiting_webhook + [
+            result
+            for result in (submission_result(job, future) for future, job in futures.items() if not future.cancelled())
+            if result.success and result.job.webhook_url and result.process_id
+        ]
+        if unreported:
+            register_webhooks(workflow, unreported, batch_size)
+
+
+def submission_result(job: EncodingJob, future: Future) -> SubmissionResult:
+    try:
+        process = future.result()
+    except Exception as e:
+        logger.warning(f"Starting the encoding of {job.remote_path} failed: {e}")
+        return SubmissionResult(job=job, error=str(e))
+    return SubmissionResult(job=job, process_id=process.get("id"), state=combined_state(process.get("state"), None))
+
+
+def register_webhooks(workflow: Workflow, results: List[SubmissionResult], batch_size: int) -> List[SubmissionResult]:
+    """
+    Registers the webhooks of the encoding sub-processes of started encodings and of the publish sub-processes the
+    platform created already, looking up the PO items of `batch_size` encodings per request
+
+    :return: The results, with the `webhook_error` of every encoding whose webhooks are not all registered
+    """
+    registrations: List[Tuple[SubmissionResult, str]] = []
+    for start in range(0, len(results), batch_size):
+        batch = results[start : start + batch_size]
+        lookups = [(f"{workflow.client.organization_urn}_{result.job.group_name}", result.job.name) for result in batch]
+        try:
+            response_data = workflow.client._query_api_dict(
+                "workflow", query=queries.po_items(lookups), content_key=None
+            )
+            publish_ids = [
+                publish_id(response_data[f"i{alias}"], result.job.name) for alias, result in enumerate(batch)
+            ]
+            lookup_error = PUBLISH_NOT_CREATED
+        except Exception as e:
+            logger.warning(f"Looking up the publish processes of {len(batch)} encodings failed: {e}")
+            publish_ids = [None] * len(batch)
+            lookup_error = f"Looking up the publish process failed: {e}"
+
+        for result, process_id in zip(batch, publish_ids):
+            registrations.append((result, result.process_id))  # type: ignore
+            if process_id:
+                registrations.append((result, process_id))
+            else:
+                result.webhook_error = lookup_error
+
+    errors = workflow.register_webhooks(
+        [(process_id, result.job.webhook_url) for result, process_id in registrations], batch_size  # type: ignore
+    )
+    for (result, process_id), error in zip(registrations, errors):
+        if error is not None:
+            logger.warning(f"Registering the webhook of process {process_id} of {result.job.name} failed: {error}")
+            result.webhook_error = str(error)
+    return results
+
+
+def publish_id(response_data: dict, process_name: str) -> Optional[str]:
+    """
+    :param response_data: The `list_POs` payload of a PoItem query
+    :param process_name: Name of the encoding process
+    :return: The id of the publish sub-process, None if it is not created yet
+    """
+    try:
+        item = find_item(response_data, process_name)
+    except KeyError:
+        return None
+    return (item.get("publish_process") or {}).get("id")
@@ -0,0 +1,329 @@
+"""
+Incremental uploads of a local directory: files that are already in the remote folder are skipped
+"""
+
+import hashlib
+import json
+import os
+from logging import getLogger
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional
+
+from pydantic import BaseModel, computed_field
+
+from castlabs.multipart import MiB, UploadConfig
+from castlabs.records import parse_timestamp
+from castlabs.repository import ContentsOfDirectory, FolderListing, sub_route
+from castlabs.transfers import UploadReport, plan_directory
+
+logger = getLogger("castlabs.sync")
+
+# Directory of the manifests of the checksums uploaded by earlier syncs
+DEFAULT_SYNC_DIR = os.path.join(os.path.expanduser("~"), ".castlabs", "sync")
+
+# How a local file is compared with the remote file of the same name
+#  size: the size only
+#  mtime: the size, and the local file must not be newer than the remote one
+#  checksum: the size, and the MD5 checksum must match the one recorded when the file was last uploaded. A file the
+#   manifest has no checksum of, e.g. on the first sync on a host, is compared by its ETag, or by its modification
+#   time if the ETag was computed with another part size
+#  etag: the size, and the S3 ETag computed locally must match the ETag of the remote object
+CompareMode = Literal["size", "mtime", "checksum", "etag"]
+
+# Reasons of the sync actions
+NEW = "new"
+SIZE_CHANGED = "size"
+MODIFIED = "modified"
+CHECKSUM_CHANGED = "checksum"
+ETAG_CHANGED = "etag"
+REMOTE_CHANGED = "remote_changed"
+UNCHANGED = "unchanged"
+REMOTE_ONLY = "remote_only"
+
+_CHUNK_SIZE = 8 * MiB
+
+
+class SyncEntry(BaseModel):
+    relative_path: str
+    local_path: Optional[str] = None
+    remote_path: str
+    size: Optional[int] = None
+    upload: bool
+    reason: str
+
+
+class SyncReport(BaseModel):
+    entries: List[SyncEntry]
+    upload_report: Optional[UploadReport] = None
+
+    @computed_field
+    @property
+    def to_upload(self) -> List[SyncEntry]:
+        return [entry for entry in self.entries if entry.upload]
+
+    @computed_field
+    @property
+    def unchanged(self) -> List[SyncEntry]:
+        return [entry for entry in self.entries if entry.reason == UNCHANGED]
+
+    @computed_field
+    @property
+    def remote_only(self) -> List[SyncEntry]:
+        return [entry for entry in self.entries if entry.reason == REMOTE_ONLY]
+
+    @computed_field
+    @property
+    def bytes_to_upload(self) -> int:
+        return sum(entry.size or 0 for entry in self.to_upload)
+
+    @computed_field
+    @property
+    def bytes_skipped(self) -> int:
+        return sum(entry.size or 0 for entry in self.unchanged)
+
+
+def file_md5(file_name: str) -> str:
+    """
+    :param file_name: Local file path
+    :return: The hex MD5 checksum of the file, read in chunks
+    """
+    md5 = hashlib.md5()
+    with open(file_name, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def s3_etag(file_name: str, config: UploadConfig) -> str:
+    """
+    The ETag S3 assigns to the file when it is uploaded with the config: the MD5 checksum of a single part upload,
+    or the MD5 checksum of the part checksums followed by the number of parts
+
+    :param file_name: Local file path
+    :param config: The part size and multipart threshold of the upload
+    :return: The ETag without quotes
+    """
+    file_size = os.path.getsize(file_name)
+    if file_size < config.multipart_threshold:
+        return file_md5(file_name)
+
+    part_size = config.part_size_for(file_size)
+    digests = []
+    with open(file_name, "rb") as f:
+        for _ in range(0, file_size, part_size):
+            md5 = hashlib.md5()
+            remaining = part_size
+            while remaining and (chunk := f.read(min(_CHUNK_SIZE, remaining))):
+                md5.update(chunk)
+                remaining -= len(chunk)
+            digests.append(md5.digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+class SyncManifest:
+    """
+    The MD5 checksum of every file uploaded by a sync, with the size and modification time of the local file and the
+    `last_modified` of the remote file at the time. A local file whose size and modification time are unchanged is
+    not read again, and a remote file changed by someone else is uploaded again.
+    """
+
+    def __init__(self, local_dir: str, remote_path: str, sync_dir: str = DEFAULT_SYNC_DIR):
+        """
+        :param local_dir: The local directory
+        :param remote_path: The remote folder of the directory
+        :param sync_dir: (Optional) Directory of the manifest files
+        """
+        manifest_id = hashlib.sha1(f"{os.path.abspath(local_dir)}:{remote_path}".encode()).hexdigest()
+        self.path = os.path.join(sync_dir, f"{manifest_id}.json")
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.files = json.load(f)["files"]
+
+    def checksum(self, relative_path: str, local_path: str) -> str:
+        """
+        :return: The MD5 checksum of the local file, from the manifest if the file is unchanged since
+        """
+        stat = os.stat(local_path)
+        record = self.files.get(relative_path)
+        if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+            return record["md5"]
+        return file_md5(local_path)
+
+    def record(self, relative_path: str, local_path: str, md5: str, remote_last_modified: Optional[str]) -> None:
+        stat = os.stat(local_path)
+        self.files[relative_path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "md5": md5,
+            "remote_last_modified": remote_last_modified,
+        }
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically, a crash leaves the previous manifest
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_file = f"{self.path}.tmp"
+        with open(temporary_file, "w") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(temporary_file, self.path)
+
+
+def list_remote_tree(tree: Iterable[FolderListing], remote_path: str) -> Dict[str, ContentsOfDirectory]:
+    """
+    Collect the files of a remote folder and its sub folders
+
+    :param tree: The listings of the remote folder and its sub folders, see :meth:`~castlabs.repository.Repository.walk`
+    :param remote_path: The remote folder
+    :return: The files by their path relative to the remote folder
+    """
+    files: Dict[str, ContentsOfDirectory] = {}
+    prefix = remote_path.strip("/")
+    for route, _, folder_files in tree:
+        relative_folder = route.strip("/")[len(prefix) :].strip("/")
+        for content in folder_files:
+            if not content.get("deleted"):
+                files[sub_route(relative_folder, content["name"])] = content
+    return files
+
+
+def compare_unrecorded(
+    local_path: str,
+    remote: ContentsOfDirectory,
+    remote_folder: str,
+    remote_etag: Optional[Callable[[str, str], Optional[str]]],
+    config: UploadConfig,
+) -> str:
+    """
+    Compare a local file with a remote file of the same size the manifest has no checksum of, e.g. uploaded by a sync
+    on another host. The ETags are compared if both are computed with the same number of parts, the modification
+    times otherwise.
+
+    :param local_path: Local file path
+    :param remote: The remote file
+    :param remote_folder: The remote folder of the file
+    :param remote_etag: (Optional) Returns the ETag of a file in a remote folder
+    :param config: The upload config, to compute the ETags of multipart uploads
+    :return: The reason of the sync action
+    """
+    etag = remote_etag(remote_folder, os.path.basename(local_path)) if remote_etag else None
+    if etag:
+        local_etag = s3_etag(local_path, config)
+        if etag.partition("-")[2] == local_etag.partition("-")[2]:
+            return UNCHANGED if etag == local_etag else ETAG_CHANGED
+    remote_mtime = parse_timestamp(remote["last_modified"])
+    return MODIFIED if remote_mtime is None or os.path.getmtime(local_path) > remote_mtime else UNCHANGED
+
+
+def plan_sync(
+    local_dir: str,
+    remote_path: str,
+    remote_files: Dict[str, ContentsOfDirectory],
+    compare: CompareMode = "checksum",
+    manifest: Optional[SyncManifest] = None,
+    remote_etag: Optional[Callable[[str, str], Optional[str]]] = None,
+    config: Optional[UploadConfig] = None,
+) -> List[SyncEntry]:
+    """
+    Compare a local directory with the listing of its remote folder
+
+    :param local_dir: The local directory
+    :param remote_path: The remote folder of the directory
+    :param remote_files: The remote files by their relative path, see :func:`list_remote_tree`
+    :param compare: (Optional) How a local file is compared with the remote one, see :data:`CompareMode`
+    :param manifest: The checksums of earlier syncs, required to compare checksums
+    :param remote_etag: Returns the ETag of a file in a remote folder, required to compare ETags. Compares the files
+        the manifest has no checksum of, by modification time without it.
+    :param config: (Optional) The upload config, to compute the ETags of multipart uploads
+    :return: An entry per local file, and per remote file without a local one
+    """
+    if compare == "checksum" and manifest is None:
+        raise ValueError("Comparing checksums needs a manifest")
+    if compare == "etag" and remote_etag is None:
+        raise ValueError("Comparing ETags needs the remote ETags")
+    config = config or UploadConfig()
+
+    entries = []
+    for local_path, remote_folder in plan_directory(local_dir, remote_path):
+        relative_path = os.path.relpath(local_path, local_dir).replace(os.sep, "/")
+        size = os.path.getsize(local_path)
+        remote = remote_files.get(relative_path)
+
+        if remote is None:
+            reason = NEW
+        elif int(remote["size"]) != size:
+            reason = SIZE_CHANGED
+        elif compare == "mtime":
+            remote_mtime = parse_timestamp(remote["last_modified"])
+            reason = MODIFIED if remote_mtime is None or os.path.getmtime(local_path) > remote_mtime else UNCHANGED
+        elif compare == "checksum":
+            record = manifest.files.get(relative_path)
+            if record is None:
+                reason = compare_unrecorded(local_path, remote, remote_folder, remote_etag, config)
+            elif record["remote_last_modified"] != remote["last_modified"]:
+                reason = REMOTE_CHANGED
+            elif manifest.checksum(relative_path, local_path) != record["md5"]:
+                reason = CHECKSUM_CHANGED
+            else:
+                reason = UNCHANGED
+        elif compare == "etag":
+            etag = remote_etag(remote_folder, os.path.basename(local_path))
+            reason = UNCHANGED if etag == s3_etag(local_path, config) else ETAG_CHANGED
+        else:
+            reason = UNCHANGED
+
+        entries.append(
+            SyncEntry(
+                relative_path=relative_path,
+                local_path=local_path,
+                remote_path=remote_folder,
+                size=size,
+                upload=reason != UNCHANGED,
+                reason=reason,
+            )
+        )
+
+    local_paths = {entry.relative_path for entry in entries}
+    for relative_path, remote in sorted(remote_files.items()):
+        if relative_path not in local_paths:
+            remote_folder = f"{remote_path.rstrip('/')}/{relative_path}".rsplit("/", 1)[0]
+            entries.append(
+                SyncEntry(
+                    relative_path=relative_path,
+                    remote_path=remote_folder,
+                    size=int(remote["size"]),
+                    upload=False,
+                    reason=REMOTE_ONLY,
+                )
+            )
+
+    uploads = [entry for entry in entries if entry.upload]
+    logger.info(f"Sync of {local_dir}: {len(uploads)} of {len(local_paths)} files to upload")
+    return entries
+
+
+def record_uploads(
+    manifest: SyncManifest,
+    entries: Iterable[SyncEntry],
+    upload_report: UploadReport,
+    remote_files: Dict[str, ContentsOfDirectory],
+) -> None:
+    """
+    Record the checksums of the uploaded files and the files found unchanged in the manifest
+
+    :param manifest: The manifest to update
+    :param entries: The entries of the sync
+    :param upload_report: The result of the uploads
+    :param remote_files: The remote files after the upload, by their relative path
+    """
+    uploaded = {result.local_path for result in upload_report.results if result.success}
+    for entry in entries:
+        if entry.local_path is None or (entry.upload and entry.local_path not in uploaded):
+            continue
+        remote = remote_files.get(entry.relative_path)
+        manifest.record(
+            entry.relative_path,
+            entry.local_path,
+            manifest.checksum(entry.relative_path, entry.local_path),
+            remote["last_modified"] if remote else None,
+        )
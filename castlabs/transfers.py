@@ -0,0 +1,229 @@
+"""
+Uploads of many files at once: small files run at a high concurrency, large files fewer at a time with their parts
+uploaded in parallel.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import getLogger
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, computed_field
+
+from castlabs.cache import DEFAULT_TTL
+from castlabs.multipart import ProgressCallback, ProgressTracker, UploadConfig
+from castlabs.repository import UploadClient
+
+logger = getLogger("castlabs.transfers")
+
+# Number of small files uploaded at once
+DEFAULT_SMALL_FILE_CONCURRENCY = 16
+# Number of large files uploaded at once, each with the part concurrency of its UploadConfig
+DEFAULT_LARGE_FILE_CONCURRENCY = 2
+# Number of remote folders whose upload clients are kept. They hold no S3 client, the S3 clients and their
+# connections are bounded by the S3ClientFactory of the repository.
+DEFAULT_MAX_UPLOAD_CLIENTS = 1024
+
+# A local file and the remote folder it is uploaded to
+UploadJob = Tuple[str, str]
+
+
+class UploadResult(BaseModel):
+    local_path: str
+    remote_path: str
+    size: int
+    seconds: float
+    error: Optional[str] = None
+
+    @computed_field
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+class UploadReport(BaseModel):
+    results: List[UploadResult]
+    seconds: float
+
+    @computed_field
+    @property
+    def total_bytes(self) -> int:
+        return sum(result.size for result in self.results if result.success)
+
+    @computed_field
+    @property
+    def bytes_per_second(self) -> float:
+        return self.total_bytes / self.seconds if self.seconds else 0.0
+
+    @computed_field
+    @property
+    def failed(self) -> List[UploadResult]:
+        return [result for result in self.results if not result.success]
+
+
+def plan_directory(local_dir: str, remote_path: str) -> List[UploadJob]:
+    """
+    Map the files of a local tree to remote folders, keeping the structure of the tree
+
+    :param local_dir: The local directory
+    :param remote_path: The remote folder of the directory
+    :return: (local file, remote folder) pairs
+    """
+    jobs = []
+    for root, dirs, files in os.walk(local_dir):
+        dirs.sort()
+        relative = os.path.relpath(root, local_dir)
+        remote_folder = remote_path if relative == "." else f"{remote_path.rstrip('/')}/{relative.replace(os.sep, '/')}"
+        jobs.extend((os.path.join(root, name), remote_folder) for name in sorted(files))
+    return jobs
+
+
+def upload_jobs(
+    jobs: Iterable[UploadJob],
+    get_upload_client: Callable[[str], UploadClient],
+    config: Optional[UploadConfig] = None,
+    progress: Optional[ProgressCallback] = None,
+    small_file_concurrency: int = DEFAULT_SMALL_FILE_CONCURRENCY,
+    large_file_concurrency: int = DEFAULT_LARGE_FILE_CONCURRENCY,
+) -> UploadReport:
+    """
+    Upload many files. Files below the multipart threshold share a pool of `small_file_concurrency` workers, the
+    large files a pool of `large_file_concurrency` workers. A failed file does not stop the others.
+
+    :param jobs: (local file, remote folder) pairs
+    :param get_upload_client: Returns the upload client of a remote folder
+    :param config: (Optional) Part size, concurrency and bandwidth of the uploads
+    :param progress: (Optional) Called with the bytes transferred so far and the size of all files
+    :param small_file_concurrency: (Optional) Number of small files uploaded at once
+    :param large_file_concurrency: (Optional) Number of large files uploaded at once
+    :return: The result per file, in the order of the jobs, and the aggregate throughput
+    """
+    config = config or UploadConfig()
+    sized_jobs = [(local_path, remote_path, os.path.getsize(local_path)) for local_path, remote_path in jobs]
+    total = ProgressTracker(sum(size for _, _, size in sized_jobs), progress or (lambda sent, total: None))
+
+    def upload(local_path: str, remote_path: str, size: int) -> UploadResult:
+        reported = 0
+
+        def file_progress(sent: int, file_size: int) -> None:
+            nonlocal reported
+            total(sent - reported)
+            reported = sent
+
+        started = time.monotonic()
+        try:
+            get_upload_client(remote_path).upload_file(local_path, progress=file_progress, config=config)
+            error = None
+        except Exception as e:
+            logger.warning(f"Uploading {local_path} failed: {e}")
+            error = f"{type(e).__name__}: {e}"
+        return UploadResult(
+            local_path=local_path,
+            remote_path=remote_path,
+            size=size,
+            seconds=time.monotonic() - started,
+            error=error,
+        )
+
+    started = time.monotonic()
+    with (
+        ThreadPoolExecutor(small_file_concurrency, thread_name_prefix="castlabs-small-upload") as small_files,
+        ThreadPoolExecutor(large_file_concurrency, thread_name_prefix="castlabs-large-upload") as large_files,
+    ):
+        futures = []
+        # the large files start first, they take longest
+        for local_path, remote_path, size in sorted(sized_jobs, key=lambda job: -job[2]):
+            executor = large_files if size >= config.multipart_threshold else small_files
+            futures.append(executor.submit(upload, local_path, remote_path, size))
+        results = {(result.local_path, result.remote_path): result for result in (f.result() for f in futures)}
+
+    logger.info(f"Uploaded {len(sized_jobs)} files ({total.transferred} bytes)")
+    return UploadReport(
+        results=[results[(local_path, remote_path)] for local_path, remote_path, _ in sized_jobs],
+        seconds=time.monotonic() - started,
+    )
+
+
+class UploadClientCache:
+    """
+    The upload clients of the most recently used remote folders. A client is created once even if several threads ask
+    for it at the same time; the least recently used one is dropped when there are more than `max_size`, and a client
+    is created again with a new upload ticket once it is older than `ttl`.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[str], UploadClient],
+        max_size: int = DEFAULT_MAX_UPLOAD_CLIENTS,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param create: Creates the upload client of a remote folder
+        :param max_size: (Optional) Maximum number of upload clients kept
+        :param ttl: (Optional) Seconds an upload client is kept after it was created
+        :param clock: (Optional) Returns the current time in seconds
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._create = create
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._clients: "OrderedDict[str, Tuple[float, UploadClient]]" = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            return self._get(path) is not None
+
+    def _get(self, path: str) -> Optional[UploadClient]:
+        entry = self._clients.get(path)
+        if entry is None:
+            return None
+        created, upload_client = entry
+        if self._clock() - created >= self.ttl:
+            del self._clients[path]
+            return None
+        self._clients.move_to_end(path)
+        return upload_client
+
+    def __getitem__(self, path: str) -> UploadClient:
+        with self._lock:
+            upload_client = self._get(path)
+            if upload_client is not None:
+                return upload_client
+            pending = self._pending.get(path)
+            if pending is None:
+                pending = self._pending[path] = Future()
+                creating = True
+            else:
+                creating = False
+
+        if not creating:
+            return pending.result()
+
+        # the upload ticket of a folder is created outside of the lock, other threads asking for the folder wait
+        try:
+            upload_client = self._create(path)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[path]
+            pending.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._pending[path]
+            self._clients[path] = (self._clock(), upload_client)
+            while len(self._clients) > self.max_size:
+                evicted, _ = self._clients.popitem(last=False)
+                logger.debug(f"Dropped the upload client of {evicted}")
+        pending.set_result(upload_client)
+        return upload_client
@@ -0,0 +1,243 @@
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from castlabs import instrumentation
+from castlabs.errors import CPCircuitOpenException
+from castlabs.instrumentation import ApiCallEvent
+from castlabs.resilience import (
+    DEFAULT_FAILURE_THRESHOLD,
+    DEFAULT_RESET_TIMEOUT,
+    THROTTLING_STATUSES,
+    AdaptiveLimit,
+    CircuitBreaker,
+    RetryPolicy,
+    is_mutation,
+    parse_retry_after,
+)
+from castlabs.urls import ApiName, ApiUrls
+
+logger = getLogger("castlabs.transport")
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 10
+
+
+def connect_failed(error: requests.RequestException) -> bool:
+    """
+    :return: True if the connection could not be opened, so the request was not sent
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class Transport:
+    """
+    The Transport owns the HTTP connections of a Client. Every API host (credential exchange, workflow and
+    repository) gets its own keep-alive session with a connection pool, so consecutive calls reuse the
+    TCP+TLS connection instead of performing a new handshake per request.
+
+    The sessions are created lazily and can be shared between threads. HTTP/2 is not available in the
+    requests/urllib3 stack, connections use HTTP/1.1 keep-alive.
+
+    Failed requests are retried according to the retry policy, see :mod:`castlabs.resilience`. Every host has a
+    circuit breaker, which fails requests right away while the host keeps failing, and an adaptive limit of the
+    requests in flight, which is lowered while the host throttles (429/503) and, with a `latency_tolerance`, while it
+    slows down.
+
+    Every call, including its retries, emits an :class:`~castlabs.instrumentation.ApiCallEvent` while an
+    instrumentation listener is registered.
+    """
+
+    def __init__(
+        self,
+        urls: ApiUrls,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pool_block: bool = False,
+        timeout: float = DEFAULT_TIMEOUT,
+        retry_policy: Optional[RetryPolicy] = None,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        adaptive_concurrency: bool = True,
+        latency_tolerance: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        :param urls: The API URLs of the environment
+        :param pool_size: (Optional) Maximum number of connections kept alive per API host
+        :param pool_block: (Optional) Wait for a free connection instead of opening an extra, non-pooled one
+        when all pooled connections are in use
+        :param timeout: (Optional) Timeout in seconds for every request
+        :param retry_policy: (Optional) When and after which delay failed requests are sent again,
+        `RetryPolicy(max_attempts=1)` disables retries
+        :param failure_threshold: (Optional) Consecutive failures of a host that open its circuit
+        :param reset_timeout: (Optional) Seconds a circuit stays open before a request is tried again
+        :param adaptive_concurrency: (Optional) Limit the requests in flight per host, starting at `pool_size`, and
+        lower the limit while the host throttles
+        :param latency_tolerance: (Optional) Also lower the limit when a response takes longer than this factor of the
+        smoothed latency of the host. Off by default, since slow calls like large listings would throttle unrelated
+        calls to the same host.
+        :param sleep: (Optional) Sleep function used between retries
+        """
+        self.urls = urls
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.timeout = timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.adaptive_concurrency = adaptive_concurrency
+        self.latency_tolerance = latency_tolerance
+        self._sleep = sleep
+
+        self._sessions: Dict[ApiName, requests.Session] = {}
+        self._breakers: Dict[ApiName, CircuitBreaker] = {}
+        self._limits: Dict[ApiName, AdaptiveLimit] = {}
+        self._lock = threading.Lock()
+
+    def session(self, api: ApiName) -> requests.Session:
+        """
+        Returns the pooled session of an API host
+
+        :param api: API endpoint
+        :return: requests Session
+        """
+        if api not in self._sessions:
+            with self._lock:
+                if api not in self._sessions:
+                    logger.debug(f"Creating connection pool for {api} with {self.pool_size} connections")
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=self.pool_block)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._sessions[api] = session
+
+        return self._sessions[api]
+
+    def breaker(self, api: ApiName) -> CircuitBreaker:
+        """
+        :param api: API endpoint
+        :return: The circuit breaker of an API host
+        """
+        with self._lock:
+            if api not in self._breakers:
+                self._breakers[api] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[api]
+
+    def limit(self, api: ApiName) -> AdaptiveLimit:
+        """
+        :param api: API endpoint
+        :return: The limit of the requests in flight to an API host
+        """
+        with self._lock:
+            if api not in self._limits:
+                self._limits[api] = AdaptiveLimit(self.pool_size, latency_tolerance=self.latency_tolerance)
+            return self._limits[api]
+
+    def request(
+        self, api: ApiName, method: str = "POST", idempotent: Optional[bool] = None, **kwargs: Any
+    ) -> requests.Response:
+        """
+        Send a request to an API host over its pooled session, retrying it according to the retry policy
+
+        :param api: API endpoint
+        :param method: (Optional) HTTP method
+        :param idempotent: (Optional) Whether the request may be processed twice, by default every request except
+        GraphQL mutations
+        :param kwargs: Further arguments passed to requests (headers, json, data, ...)
+        :return: Response object, the last one if all attempts failed
+        :raise CPCircuitOpenException: If the circuit of the host is open
+        """
+        if idempotent is None:
+            idempotent = not is_mutation(kwargs.get("json"))
+        breaker = self.breaker(api)
+        started = time.perf_counter() if instrumentation.enabled() else None
+        delay = 0.0
+        attempt = 1
+        while True:
+            if not breaker.allow():
+                if started is not None:
+                    self._emit(api, kwargs, started, attempt - 1, error=CPCircuitOpenException.__name__)
+                raise CPCircuitOpenException({"message": f"Circuit of {api} is open after repeated failures"})
+
+            try:
+                response = self._send(api, method, **kwargs)
+            except requests.RequestException as error:
+                breaker.record_failure()
+                if not self.retry_policy.should_retry(attempt, idempotent, connect_failed=connect_failed(error)):
+                    if started is not None:
+                        self._emit(api, kwargs, started, attempt, error=type(error).__name__)
+                    raise
+                logger.info(f"Request to {api} failed, retrying: {error}")
+                delay = self.retry_policy.next_delay(delay)
+            else:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if not self.retry_policy.should_retry(
+                    attempt, idempotent, status=response.status_code, retry_after=retry_after
+                ):
+                    if started is not None:
+                        self._emit(api, kwargs, started, attempt, response=response)
+                    return response
+                logger.info(f"Request to {api} failed with HTTP {response.status_code}, retrying")
+                delay = self.retry_policy.next_delay(delay, retry_after)
+
+            self._sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _emit(
+        api: ApiName,
+        kwargs: Dict[str, Any],
+        started: float,
+        attempts: int,
+        response: Optional[requests.Response] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        query = kwargs.get("json")
+        instrumentation.emit(
+            ApiCallEvent(
+                api,
+                query.get("operationName") if isinstance(query, dict) else None,
+                response.status_code if response is not None else None,
+                time.perf_counter() - started,
+                request_bytes=instrumentation.body_size(response.request.body) if response is not None else 0,
+                response_bytes=len(response.content) if response is not None else 0,
+                attempts=attempts,
+                error=error,
+            )
+        )
+
+    def _send(self, api: ApiName, method: str, **kwargs: Any) -> requests.Response:
+        if not self.adaptive_concurrency:
+            return self.session(api).request(method, self.urls[api], timeout=self.timeout, **kwargs)
+
+        limit = self.limit(api)
+        limit.acquire()
+        started = time.monotonic()
+        throttled = False
+        try:
+            response = self.session(api).request(method, self.urls[api], timeout=self.timeout, **kwargs)
+            throttled = response.status_code in THROTTLING_STATUSES
+            return response
+        finally:
+            limit.release(time.monotonic() - started, throttled)
+
+    def close(self) -> None:
+        """
+        Close all pooled connections
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -1,5 +1,7 @@
 from typing import Dict, Literal, TypedDict
 
+ApiName = Literal["credential_exchange", "workflow", "repository"]
+
 
 class ApiUrls(TypedDict):
     credential_exchange: str
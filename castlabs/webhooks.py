@@ -0,0 +1,382 @@
+"""
+An embeddable asyncio receiver for the webhook events of the workflow API.
+
+The platform calls a webhook once a sub-process (encoding or publishing) reaches a terminal state, with a JSON body
+of the form `{"process_id", "state", "data", "message", "action"}`. The receiver keeps the status of every tracked
+encoding up to date from these events and wakes the tasks waiting for it. The publish sub-process of an encoding is
+usually created once the encoding succeeded, so it is looked up right away when the encoding succeeds and when an
+event of an unknown process arrives. Encodings that stay quiet for longer than `quiet_after` seconds are polled.
+"""
+
+import asyncio
+import json
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from castlabs.aio import AsyncContentPlatform, AsyncProcess
+from castlabs.api import Encoding
+from castlabs.polling import COMPLETE_STATES
+
+logger = getLogger("castlabs.webhooks")
+
+# Seconds without an event after which an encoding is polled
+DEFAULT_QUIET_AFTER = 600.0
+# Maximum size of a webhook request body
+MAX_BODY_SIZE = 1024 * 1024
+# Seconds a connection may stay idle, or a request may take to arrive, before it is closed
+DEFAULT_READ_TIMEOUT = 30.0
+# Events received before their process is tracked, kept until it is
+MAX_PENDING_EVENTS = 10000
+
+EncodingKey = Tuple[str, str]
+
+_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class _Tracked:
+    """
+    A tracked encoding: its process, the time of the last update and the tasks waiting for completion
+    """
+
+    def __init__(self, key: EncodingKey, process: AsyncProcess, now: float):
+        self.key = key
+        self.process = process
+        self.updated = now
+        self.done = asyncio.Event()
+
+
+class WebhookReceiver:
+    """
+    Receives webhook events on `http://{host}:{port}{path}` and keeps a table of :func:`~castlabs.api.Encoding`
+    statuses up to date. Register :attr:`url` (or the `public_url` it is reachable at) as webhook of the encodings.
+
+        async with AsyncContentPlatform(...) as platform, WebhookReceiver(platform, public_url=...) as receiver:
+            await platform.start_encoding("media/title_1", webhook_url=receiver.url)
+            await receiver.watch("default_group", "title_1")
+            encoding = await receiver.wait("default_group", "title_1")
+    """
+
+    def __init__(
+        self,
+        platform: AsyncContentPlatform,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        path: str = "/",
+        public_url: Optional[str] = None,
+        quiet_after: float = DEFAULT_QUIET_AFTER,
+        check_interval: Optional[float] = None,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+    ):
+        """
+        :param platform: The platform used to look up and poll encodings
+        :param host: (Optional) Interface to listen on
+        :param port: (Optional) Port to listen on, a free port by default
+        :param path: (Optional) Path of the webhook
+        :param public_url: (Optional) URL the platform reaches the receiver at, e.g. behind a proxy
+        :param quiet_after: (Optional) Seconds without an event after which an encoding is polled
+        :param check_interval: (Optional) Seconds between the checks for quiet encodings, a tenth of `quiet_after`
+        by default
+        :param read_timeout: (Optional) Seconds a connection may stay idle, or a request may take to arrive, before it
+        is closed
+        """
+        self._platform = platform
+        self._host = host
+        self._port = port
+        self._path = path
+        self._public_url = public_url
+        self._quiet_after = quiet_after
+        self._check_interval = check_interval or quiet_after / 10
+        self._read_timeout = read_timeout
+
+        self._tracked: Dict[EncodingKey, _Tracked] = {}
+        # sub-process id -> encoding
+        self._by_process_id: Dict[str, EncodingKey] = {}
+        self._pending_events: Dict[str, dict] = {}
+        # encodings whose publish sub-process is to be looked up
+        self._lookups: Set[EncodingKey] = set()
+        self._lookup_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.Server] = None
+        self._fallback_task: Optional[asyncio.Task] = None
+
+    @property
+    def url(self) -> str:
+        """
+        The URL to register as webhook
+        """
+        if self._public_url:
+            return self._public_url
+        if self._server is None:
+            raise RuntimeError("The webhook receiver is not started")
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}{self._path}"
+
+    async def start(self) -> "WebhookReceiver":
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        self._fallback_task = asyncio.create_task(self._poll_quiet_encodings())
+        logger.info(f"Receiving webhooks on {self.url}")
+        return self
+
+    async def stop(self) -> None:
+        for task in (self._fallback_task, self._lookup_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "WebhookReceiver":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def track(self, process: AsyncProcess, group_name: str, encode_name: str) -> Encoding:
+        """
+        Keep the status of an encoding up to date
+
+        :param process: The process of the encoding
+        :param group_name: The group name
+        :param encode_name: The encode name
+        :return: The current status of the encoding
+        """
+        key = (group_name, encode_name)
+        self._tracked[key] = _Tracked(key, process, asyncio.get_running_loop().time())
+        self._index(self._tracked[key])
+        return self.status(group_name, encode_name)
+
+    async def watch(self, group_name: str, encode_name: str) -> Encoding:
+        """
+        Look up an encoding and keep its status up to date
+
+        :param group_name: The group name
+        :param encode_name: The encode name
+        :return: The current status of the encoding
+        """
+        process = await self._platform._workflow.get_process(group_name, encode_name, fields="status")
+        return self.track(process, group_name, encode_name)
+
+    def status(self, group_name: str, encode_name: str) -> Encoding:
+        """
+        :return: The last known status of a tracked encoding
+        """
+        return Encoding.from_process(self._tracked[(group_name, encode_name)].process, group_name, encode_name)
+
+    @property
+    def statuses(self) -> Dict[EncodingKey, Encoding]:
+        """
+        The last known status of every tracked encoding
+        """
+        return {key: Encoding.from_process(tracked.process, *key) for key, tracked in self._tracked.items()}
+
+    async def wait(self, group_name: str, encode_name: str, timeout: Optional[float] = None) -> Encoding:
+        """
+        Wait until a tracked encoding is complete
+
+        :param group_name: The group name
+        :param encode_name: The encode name
+        :param timeout: (Optional) Seconds until a TimeoutError is raised
+        :return: The completed encoding
+        """
+        await asyncio.wait_for(self._tracked[(group_name, encode_name)].done.wait(), timeout)
+        return self.status(group_name, encode_name)
+
+    async def wait_all(self, encodings: Iterable[EncodingKey], timeout: Optional[float] = None) -> List[Encoding]:
+        """
+        Wait until all tracked encodings of the list are complete
+
+        :param encodings: (group_name, encode_name) pairs
+        :param timeout: (Optional) Seconds until a TimeoutError is raised
+        :return: The completed encodings in the order of the input
+        """
+        return await asyncio.wait_for(asyncio.gather(*(self.wait(*key) for key in encodings)), timeout)
+
+    def handle_event(self, event: dict) -> Optional[Encoding]:
+        """
+        Apply a webhook event to the status table
+
+        :param event: The decoded webhook body
+        :return: The updated encoding, None if the process is not tracked (yet)
+        """
+        process_id = event.get("process_id")
+        key = self._by_process_id.get(process_id)
+        if key is None:
+            logger.debug(f"Keeping event of untracked process {process_id}")
+            self._pending_events[process_id] = event
+            if len(self._pending_events) > MAX_PENDING_EVENTS:
+                self._pending_events.pop(next(iter(self._pending_events)))
+            # it may be the publish sub-process of an encoding that succeeded meanwhile
+            self._look_up_publish_processes(
+                key for key, tracked in self._tracked.items() if self._awaits_publish_process(tracked)
+            )
+            return None
+
+        tracked = self._tracked[key]
+        process = tracked.process
+        attr_name = "encoding_process" if process.encoding_process.get("id") == process_id else "publish_process"
+        sub_process = dict(getattr(process, attr_name) or {})
+        sub_process.update({name: event[name] for name in ("state", "data", "message", "action") if name in event})
+        sub_process["id"] = process_id
+        setattr(process, attr_name, sub_process)
+        process._stale = False
+
+        tracked.updated = asyncio.get_running_loop().time()
+        encoding = Encoding.from_process(process, *key)
+        logger.info(f"Webhook event for {key}: {encoding.status}")
+        if encoding.complete:
+            tracked.done.set()
+        elif self._awaits_publish_process(tracked):
+            self._look_up_publish_processes([key])
+        return encoding
+
+    @staticmethod
+    def _awaits_publish_process(tracked: _Tracked) -> bool:
+        """
+        :return: True if the encoding succeeded but its publish sub-process is not known yet
+        """
+        process = tracked.process
+        return (
+            not tracked.done.is_set()
+            and process.encoding_process.get("state") == "SUCCESS"
+            and not (process.publish_process or {}).get("id")
+        )
+
+    def _look_up_publish_processes(self, keys: Iterable[EncodingKey]) -> None:
+        """
+        Refresh the encodings in the background, so that their publish sub-processes and the events that arrived for
+        them are applied without waiting for `quiet_after`. Lookups requested meanwhile are sent together after the
+        running one.
+        """
+        self._lookups.update(keys)
+        if self._lookups and (self._lookup_task is None or self._lookup_task.done()):
+            self._lookup_task = asyncio.get_running_loop().create_task(self._run_lookups())
+
+    async def _run_lookups(self) -> None:
+        while self._lookups:
+            keys, self._lookups = self._lookups, set()
+            logger.info(f"Looking up the publish process of {len(keys)} encodings")
+            await self._refresh(
+                [self._tracked[key] for key in keys if self._awaits_publish_process(self._tracked[key])]
+            )
+
+    async def _poll_quiet_encodings(self) -> None:
+        """
+        Poll the incomplete encodings that had no update for `quiet_after` seconds
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self._check_interval)
+            now = loop.time()
+            quiet = [
+                tracked
+                for tracked in self._tracked.values()
+                if not tracked.done.is_set() and now - tracked.updated >= self._quiet_after
+            ]
+            if not quiet:
+                continue
+
+            logger.info(f"Polling {len(quiet)} quiet encodings")
+            await self._refresh(quiet)
+
+    async def _refresh(self, tracked_encodings: List[_Tracked]) -> None:
+        """
+        Pull the state of the encodings and apply it
+        """
+        errors = await self._platform._workflow.refresh_states([tracked.process for tracked in tracked_encodings])
+        now = asyncio.get_running_loop().time()
+        for tracked, error in zip(tracked_encodings, errors):
+            if error is not None:
+                logger.warning(f"Polling encoding {tracked.key} failed: {error}")
+                continue
+            tracked.updated = now
+            self._index(tracked)
+
+    def _index(self, tracked: _Tracked) -> None:
+        """
+        Map the sub-processes of a tracked encoding to it, apply the events that arrived before and wake the
+        waiting tasks if the encoding is complete
+        """
+        for sub_process in (tracked.process.encoding_process, tracked.process.publish_process):
+            if sub_process and sub_process.get("id"):
+                self._by_process_id[sub_process["id"]] = tracked.key
+                event = self._pending_events.pop(sub_process["id"], None)
+                if event is not None:
+                    self.handle_event(event)
+
+        if tracked.process.state in COMPLETE_STATES:
+            tracked.done.set()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        A minimal HTTP/1.1 server: POST requests with a JSON body on keep-alive connections
+        """
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), self._read_timeout)
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                if body is None:
+                    self._respond(writer, 400, close=True)
+                    break
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                self._respond(writer, self._handle_request(method, target, body), close=not keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except asyncio.TimeoutError:
+            logger.debug("Closing idle webhook connection")
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.debug(f"Closing webhook connection: {e}")
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(
+        reader: asyncio.StreamReader,
+    ) -> Optional[Tuple[str, str, str, Dict[str, str], Optional[bytes]]]:
+        """
+        :return: The method, target, version, headers and body of the next request, None at the end of the
+        connection. The body is None if it exceeds the maximum size.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, version = request_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_SIZE:
+            return method, target, version, headers, None
+        return method, target, version, headers, await reader.readexactly(length)
+
+    def _handle_request(self, method: str, target: str, body: bytes) -> int:
+        if target.split("?")[0] != self._path:
+            return 404
+        if method != "POST":
+            return 405
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(event, dict) or not event.get("process_id"):
+            return 400
+
+        self.handle_event(event)
+        return 204
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: int, close: bool) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Length: 0\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode("latin-1")
+        )
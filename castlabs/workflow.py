@@ -1,13 +1,22 @@
 import time
 from datetime import datetime, timedelta
 from logging import getLogger
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple, Type, TypeVar
 
-from .client import Client
+from . import queries
+from .client import BaseClient, Client
+from .polling import Backoff, RateLimiter
+from .queries import Projection
+from .records import ProcessRecord, combined_state, content_url
 from .repository import StorageLocation
 
 logger = getLogger("castlabs.workflow")
 
+# Number of processes looked up per request by Workflow.refresh_states
+DEFAULT_BATCH_SIZE = 50
+
+P = TypeVar("P", bound="BaseProcess")
+
 
 class Workflow:
     """
@@ -49,69 +58,23 @@ class Workflow:
         of the encoded files is necessary this can be set to 'False'. A preview can be requested and publishing can be
         triggered manually.
         :param webhook_url: (Optional) The webhook URL to notify events to your backend
-        :return: :func:`~contentPlatformSDK/workflow/process/Process`
+        :param wait_timeout: (Optional) Seconds to wait for the process to be listed when its details are first needed
+        :return: :func:`~contentPlatformSDK/workflow/process/Process` with the state returned by the mutation, the
+        rest of its PO item is looked up when first needed, see :func:`~Process.load_details`
         """
-        logger.info(f"Creating VOD encoding for {origin_folder}")
-        self.client._query_api_dict(
-            "workflow",
-            query={
-                "operationName": "start_workflow_vod_default",
-                "variables": {
-                    "input_brefix": storage_location.get_location_with_path(origin_folder, True)[5:],  # no s3://
-                    "po_item_id": process_name,
-                    "po_name": f"{self.client.organization_urn}_{group_name}",
-                    "po_destination": destination,
-                    "vtk_template": template,
-                    "auto_publish": auto_publish,
-                    "format_specific_data": format_specific_data,
-                },
-                "query": """
-                    mutation start_workflow_vod_default(
-                    $po_item_id: String!,
-                    $po_name: String!,
-                    $input_brefix: String!,
-                    $po_destination: String!,
-                    $auto_publish: Boolean!,
-                    $vtk_template: String!,
-                    $format_specific_data: AWSJSON!,
-                    $email_notification: [AWSEmail!]) {
-                        start_workflow_vod_default(
-                            input: {
-                                po_name: $po_name,
-                                po_item_id: $po_item_id,
-                                input_brefix: $input_brefix,
-                                po_destination: $po_destination,
-                                auto_publish: $auto_publish,
-                                email_notification: $email_notification,
-                                vtk_template: $vtk_template,
-                                format_specific_data: $format_specific_data
-                            }) {
-                            state
-                            message
-                            input
-                            data
-                            action
-                            id
-                            start_date
-                            end_date
-                            __typename
-                        }
-                    }""",
-            },
-            content_key="start_workflow_vod_default",
+        workflow_process = self.submit_vod_encoding(
+            storage_location,
+            origin_folder,
+            group_name,
+            process_name,
+            destination=destination,
+            template=template,
+            format_specific_data=format_specific_data,
+            auto_publish=auto_publish,
+        )
+        process = Process.from_submission(
+            workflow_process, f"{self.client.organization_urn}_{group_name}", process_name, self.client, wait_timeout
         )
-
-        # Wait for the process to be created
-        timeout = datetime.now() + timedelta(seconds=wait_timeout)
-        process = None
-        while datetime.now() < timeout and process is None:
-            try:
-                process = self.get_process(group_name, process_name)
-            except KeyError:  # pragma: no cover
-                time.sleep(1)
-
-        if not process:  # pragma: no cover
-            raise Exception("Timed out waiting for process to be created")
 
         if webhook_url:
             process.register_webhook(webhook_url)
@@ -121,140 +84,385 @@ class Workflow:
             # and we don't want to run it twice
             return process
 
+    def submit_vod_encoding(
+        self,
+        storage_location: StorageLocation,
+        origin_folder: str,
+        group_name: str,
+        process_name: str,
+        destination: str = "vod",
+        template: str = "cmaf-abr",
+        format_specific_data: dict | str = "{}",
+        auto_publish: bool = True,
+    ) -> dict:
+        """
+        Starts a workflow without waiting for its process to be listed, see :func:`create_vod_encoding`
+
+        :return: The encoding sub-process as returned by the mutation
+        """
+        logger.info(f"Creating VOD encoding for {origin_folder}")
+        return self.client._query_api_dict(
+            "workflow",
+            query=queries.start_workflow_vod_default(
+                input_brefix=storage_location.get_location_with_path(origin_folder, True)[5:],  # no s3://
+                po_item_id=process_name,
+                po_name=f"{self.client.organization_urn}_{group_name}",
+                po_destination=destination,
+                vtk_template=template,
+                auto_publish=auto_publish,
+                format_specific_data=format_specific_data,
+            ),
+            content_key="start_workflow_vod_default",
+        )
+
+    def register_webhooks(
+        self, registrations: List[Tuple[str, str]], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[Optional[Exception]]:
+        """
+        Registers many webhooks, `batch_size` registrations per request
+
+        :param registrations: (process id, webhook URL) pairs
+        :param batch_size: (Optional) Number of registrations per request
+        :return: The error per registration if its batch failed, None otherwise
+        """
+        errors: List[Optional[Exception]] = [None] * len(registrations)
+        for start in range(0, len(registrations), batch_size):
+            batch = registrations[start : start + batch_size]
+            logger.info(f"Registering {len(batch)} webhooks")
+            try:
+                self.client._query_api_dict("workflow", query=queries.register_webhooks(batch), content_key=None)
+            except Exception as e:
+                errors[start : start + len(batch)] = [e] * len(batch)
+
+        return errors
+
     def get_groups(self) -> List[str]:
         logger.info("Getting groups")
         response_data = self.client._query_api_dict(
             "workflow",
-            query={
-                "operationName": "GetPOs",
-                "variables": {"airline": self.client.organization_urn},
-                "query": """
-                    query GetPOs($airline: String!) {
-                        list_POs(input: {filter: {airline: {eq: $airline}}}) {
-                            pos {
-                                id
-                                airline
-                                po_name
-                                date_due
-                                date_created
-                                target_system
-                                __typename
-                            }
-                          __typename
-                        }
-                    }""",
-            },
+            query=queries.get_pos(self.client.organization_urn),
             content_key="list_POs",
             method="POST",
         )
         return [po["po_name"].replace(f"{self.client.organization_urn}_", "") for po in response_data["pos"]]
 
-    def get_processes(self, group_name: str) -> List["Process"]:
+    def get_processes(self, group_name: str, fields: Projection = "full", lazy_refresh: bool = True) -> List["Process"]:
+        """
+        Lists the processes of a group with a single request
+
+        :param group_name: Name of the group you have specified
+        :param fields: (Optional) The fields requested per process: "minimal" (names only), "status" (state and
+        content URL) or "full" (including tracks, preview and format specific data)
+        :param lazy_refresh: (Optional) Pull the current state of a process when its state is read for the first time.
+        Otherwise the state as listed is used.
+        :return: List of :func:`~contentPlatformSDK.workflow.Process`
+        """
         logger.info(f"Getting processes for group {group_name}")
+        po_name = f"{self.client.organization_urn}_{group_name}"
         response_data = self.client._query_api_dict(
-            "workflow",
-            query={
-                "operationName": "PoItemListFull",
-                "variables": {
-                    "po_name": f"{self.client.organization_urn}_{group_name}",
-                },
-                "query": """
-                    query PoItemListFull($po_name: String!) {
-                        list_POs(input: {filter: {po_name: {eq: $po_name}}}) {
-                            pos {
-                                id
-                                poitems {
-                                    input_brefix
-                                    filename
-                                    id
-                                    po_item_id
-                                    po_destination
-                                    output_brefix
-                                    po {
-                                        po_name
-                                    }
-                                    publish_process {
-                                        id
-                                        state
-                                        data
-                                        message
-                                        start_date
-                                        end_date
-                                    }
-                                    workflow_process {
-                                        id
-                                        state
-                                        data
-                                        message
-                                        start_date
-                                        end_date
-                                    }
-                                    watermark
-                                    workflow
-                                    aspect_ratio
-                                    format_specific_data
-                                    preview {
-                                        dash_manifest_last_modified
-                                        dash_manifest_url
-                                        hls_manifest_url
-                                        hls_manifest_last_modified
-                                    }
-                                    tracks {
-                                        codec_type
-                                        messages
-                                        source {
-                                            codec_type
-                                            index
-                                            key
-                                            lang
-                                        }
-                                        lang
-                                    }
-                                    checkpoint_content_uploaded
-                                    checkpoint_content_complete
-                                    checkpoint_encodes_done
-                                    checkpoint_metadata_available
-                                }
-                            }
-                        }
-                    }""",
-            },
-            content_key="list_POs",
+            "workflow", query=queries.po_item_list(po_name, fields), content_key="list_POs"
         )
         return (
-            [Process(process_data, self.client).refresh_state() for process_data in response_data["pos"][0]["poitems"]]
+            [
+                Process(process_data, self.client, stale=lazy_refresh, po_name=po_name)
+                for process_data in response_data["pos"][0]["poitems"]
+            ]
             if response_data["pos"]
             else []
         )
 
-    # TODO: create a better query
-    def get_process(self, group_name: str, process_name: str) -> "Process":
+    def get_process_records(self, group_name: str, fields: Projection = "status") -> List[ProcessRecord]:
         """
-        Returns a process based on the group and process_name
+        Lists the processes of a group with a single request as compact records, the PO items are not kept
+
+        :param group_name: Name of the group you have specified
+        :param fields: (Optional) The fields requested per process, see :func:`get_processes`
+        :return: List of :func:`~castlabs.records.ProcessRecord` with the state as listed
+        """
+        logger.info(f"Getting process records for group {group_name}")
+        response_data = self.client._query_api_dict(
+            "workflow",
+            query=queries.po_item_list(f"{self.client.organization_urn}_{group_name}", fields),
+            content_key="list_POs",
+        )
+        if not response_data["pos"]:
+            return []
+        return [ProcessRecord.from_item(process_data) for process_data in response_data["pos"][0]["poitems"]]
+
+    def get_process(self, group_name: str, process_name: str, fields: Projection = "full") -> "Process":
+        """
+        Returns a process based on the group and process_name. Only the matching item of the group is requested.
 
         :param group_name: Name of the group you have specified
         :param process_name: Name of the encoding process
+        :param fields: (Optional) The fields requested for the process, see :func:`get_processes`
         :return: :func:`~contentPlatformSDK.workflow.Process`
         """
-        processes = [process for process in self.get_processes(group_name) if process.pk == process_name]
-        if processes:
-            return processes[0]
+        logger.info(f"Getting process {process_name} of group {group_name}")
+        po_name = f"{self.client.organization_urn}_{group_name}"
+        response_data = self.client._query_api_dict(
+            "workflow", query=queries.po_item(po_name, process_name, fields), content_key="list_POs"
+        )
+        return find_process(response_data, process_name, self.client, po_name)
 
-        raise KeyError("Process not found")
+    def refresh_states(
+        self, processes: List["Process"], batch_size: int = DEFAULT_BATCH_SIZE, limiter: Optional[RateLimiter] = None
+    ) -> List[Optional[Exception]]:
+        """
+        Pulls the current state of many processes, looking up `batch_size` processes per request
+
+        :param processes: The processes to refresh
+        :param batch_size: (Optional) Number of processes per request
+        :param limiter: (Optional) Rate limit that every request takes a token of
+        :return: The error per process if its batch failed, None otherwise
+        """
+        errors: List[Optional[Exception]] = [None] * len(processes)
+        for batch in batch_refreshes(processes, batch_size):
+            logger.info(f"Refreshing state for {len(batch)} processes")
+            if limiter:
+                limiter.acquire()
+            try:
+                response_data = self.client._query_api_dict(
+                    "workflow",
+                    query=queries.get_processes([process_id for _, _, process_id in batch]),
+                    content_key=None,
+                )
+                for alias, (_, process, _) in enumerate(batch):
+                    process._apply_refresh(response_data[f"p{alias}"])
+            except Exception as e:
+                for index, _, _ in batch:
+                    errors[index] = e
+
+        # the publish sub-process of an encoding that succeeded is only found through its PO item
+        for items in batch_item_lookups(processes, errors, batch_size):
+            logger.info(f"Looking up the publish process of {len(items)} processes")
+            if limiter:
+                limiter.acquire()
+            try:
+                response_data = self.client._query_api_dict(
+                    "workflow",
+                    query=queries.po_items([process._item_lookup() for _, process in items]),  # type: ignore
+                    content_key=None,
+                )
+                for alias, (_, process) in enumerate(items):
+                    process._apply_item(response_data[f"i{alias}"])
+            except Exception as e:
+                for index, _ in items:
+                    errors[index] = e
 
+        return errors
 
-class Process:
+
+def batch_refreshes(processes: Sequence[P], batch_size: int) -> List[List[Tuple[int, P, str]]]:
     """
-    A Process manages a specific content operation, composed of encoding (content-preparation) and publishing
+    Splits the processes that need a refresh into batches of (index, process, sub-process id)
     """
+    pending = []
+    for index, process in enumerate(processes):
+        process_id = process._refresh_id()
+        if process_id is None:
+            process._stale = False
+        else:
+            pending.append((index, process, process_id))
+
+    return [pending[start : start + batch_size] for start in range(0, len(pending), batch_size)]
 
-    def __init__(self, data: dict, client: Client) -> None:
+
+def batch_item_lookups(
+    processes: Sequence[P], errors: List[Optional[Exception]], batch_size: int
+) -> List[List[Tuple[int, P]]]:
+    """
+    Splits the refreshed processes whose publish sub-process is only found through their PO item into batches of
+    (index, process)
+    """
+    pending = [
+        (index, process)
+        for index, process in enumerate(processes)
+        if errors[index] is None and process._item_lookup() is not None
+    ]
+    return [pending[start : start + batch_size] for start in range(0, len(pending), batch_size)]
+
+
+def find_item(response_data: dict, process_name: str) -> dict:
+    """
+    Picks the PO item of a process from the response of a PoItem query
+
+    :param response_data: The `list_POs` payload
+    :param process_name: Name of the encoding process
+    :return: The PO item
+    """
+    for po in response_data["pos"]:
+        for process_data in po["poitems"]:
+            if process_data["po_item_id"] == process_name:
+                return process_data
+
+    raise KeyError("Process not found")
+
+
+def find_process(response_data: dict, process_name: str, client: Client, po_name: Optional[str] = None) -> "Process":
+    """
+    Picks a process from the response of a PoItem query
+
+    :param response_data: The `list_POs` payload
+    :param process_name: Name of the encoding process
+    :param client: The client of the process
+    :param po_name: (Optional) The PO of the group, to look up the item again
+    :return: :func:`~contentPlatformSDK.workflow.Process`
+    """
+    return Process(find_item(response_data, process_name), client, po_name=po_name)
+
+
+class BaseProcess:
+    """
+    The state of a process and its PO item, shared by :class:`Process` and :class:`~castlabs.aio.AsyncProcess`.
+    Requests to the API are made by the subclasses.
+    """
+
+    def __init__(self, data: dict, client: BaseClient, stale: bool = False, po_name: Optional[str] = None) -> None:
+        """
+        :param data: The PO item as returned by the API
+        :param client: The client used to refresh the process
+        :param stale: (Optional) Refresh the state the first time it is read
+        :param po_name: (Optional) The PO of the group, to look up the item again when the publish sub-process is
+        created after the item was listed
+        """
         self.pk = data["po_item_id"]
-        self.encoding_process = data.get("workflow_process", {})
-        self.publish_process = data.get("publish_process", {})
+        self.encoding_process = data.get("workflow_process") or {}
+        self.publish_process = data.get("publish_process") or {}
 
         self.raw_data = data
         self._client = client
+        self._stale = stale
+        self._po = po_name or (data.get("po") or {}).get("po_name")
+        # PO of a process created from the response of its submission, until its PO item is looked up
+        self._po_name: Optional[str] = None
+        self._wait_timeout = 0.0
+
+    @classmethod
+    def from_submission(
+        cls: Type[P],
+        workflow_process: dict,
+        po_name: str,
+        process_name: str,
+        client: BaseClient,
+        wait_timeout: float = 10,
+    ) -> P:
+        """
+        :param workflow_process: The encoding sub-process returned by the start_workflow_vod_default mutation
+        :param po_name: The PO of the group
+        :param process_name: Name of the encoding process
+        :param client: The client used to look up and refresh the process
+        :param wait_timeout: (Optional) Seconds to wait for the process to be listed when its details are first needed
+        :return: A process with the state of its submission
+        """
+        process = cls({"po_item_id": process_name, "workflow_process": workflow_process}, client, po_name=po_name)
+        process._po_name = po_name
+        process._wait_timeout = wait_timeout
+        return process
+
+    @property
+    def state(self):
+        """
+        Determines the state based on the encoding and publishing process
+
+        :return: state of Process
+        """
+        return combined_state(self.encoding_process.get("state"), self.publish_process.get("state"))
+
+    def to_record(self) -> ProcessRecord:
+        """
+        :return: A compact record of the current state of the process, without the rest of its PO item
+        """
+        return ProcessRecord.from_item(
+            {
+                "po_item_id": self.pk,
+                "workflow_process": self.encoding_process,
+                "publish_process": self.publish_process,
+                "output_brefix": self.raw_data.get("output_brefix"),
+            }
+        )
+
+    def _apply_details(self, response_data: dict) -> bool:
+        """
+        Fill in the PO item from the response of a PoItem query
+
+        :return: False if the item is not listed yet
+        """
+        try:
+            data = find_item(response_data, self.pk)
+        except KeyError:  # pragma: no cover
+            return False
+
+        self._po_name = None
+        self.raw_data = data
+        self.encoding_process = data.get("workflow_process") or self.encoding_process
+        self.publish_process = data.get("publish_process") or self.publish_process
+        return True
+
+    def _refresh_id(self) -> Optional[str]:
+        """
+        :return: The id of the sub-process whose state is still changing, None if there is nothing to refresh
+        """
+        if self.encoding_process.get("state") != "SUCCESS":
+            return self.encoding_process.get("id")
+        elif self.publish_process.get("state") not in ("SUCCESS", "FAILED"):
+            return self.publish_process.get("id")
+        return None
+
+    def _item_lookup(self) -> Optional[Tuple[str, str]]:
+        """
+        :return: The (po_name, po_item_id) of the PO item if the encoding succeeded but its publish sub-process is not
+        known yet, None otherwise
+        """
+        if self._po is None or self.encoding_process.get("state") != "SUCCESS" or self.publish_process.get("id"):
+            return None
+        return self._po, self.pk
+
+    def _item_query(self) -> Optional[dict]:
+        """
+        :return: The query of the PO item if its publish sub-process is to be looked up, see :func:`_item_lookup`
+        """
+        lookup = self._item_lookup()
+        return None if lookup is None else queries.po_item(*lookup, "status")
+
+    def _apply_item(self: P, response_data: dict) -> P:
+        """
+        Update the sub-processes with the response of a PoItem query
+        """
+        for po in response_data["pos"]:
+            for process_data in po["poitems"]:
+                if process_data["po_item_id"] == self.pk:
+                    self.encoding_process = process_data.get("workflow_process") or self.encoding_process
+                    self.publish_process = process_data.get("publish_process") or self.publish_process
+        return self
+
+    def _apply_refresh(self: P, response_data: dict) -> P:
+        """
+        Update the matching sub-process with the response of a GetProcess query
+        """
+        self._stale = False
+        if response_data.get("action") == "start_workflow_vod_default":
+            setattr(self, "encoding_process", response_data)
+        elif response_data.get("action") == "publishPo":
+            setattr(self, "publish_process", response_data)
+        else:  # pragma: no cover
+            raise NotImplementedError("Unknown action")
+
+        return self
+
+
+class Process(BaseProcess):
+    """
+    A Process manages a specific content operation, composed of encoding (content-preparation) and publishing
+    """
+
+    _client: Client
+
+    def __init__(self, data: dict, client: Client, stale: bool = False, po_name: Optional[str] = None) -> None:
+        """
+        See :class:`BaseProcess`
+        """
+        super().__init__(data, client, stale, po_name)
 
     @property
     def state(self):
@@ -263,10 +471,10 @@ class Process:
 
         :return: state of Process
         """
-        # TODO: Check if failure state is correct
-        if self.encoding_process.get("state", None) not in ("SUCCESS", "ERROR"):
-            return f"ENCODING_{self.encoding_process.get('state')}"
-        return f"PUBLISH_{self.publish_process.get('state')}"
+        if self._stale:
+            self.refresh_state()
+
+        return super().state
 
     @property
     def content_url(self):
@@ -275,56 +483,49 @@ class Process:
 
         :return: URL
         """
-        return (
-            "/".join(self.raw_data.get("output_brefix", None).split("/")[:-2]).replace(
-                "content-repo-prod-output-castlabs-vod/castlabs-vod", "https://vod.cp.castlabs.com"
+        self.load_details()
+        return content_url(self.raw_data.get("output_brefix", None))
+
+    def load_details(self) -> "Process":
+        """
+        Looks up the PO item of a process created from the response of its submission, waiting with a backoff until
+        the item is listed. Does nothing for processes that were listed.
+        """
+        if self._po_name is None:
+            return self
+
+        timeout = datetime.now() + timedelta(seconds=self._wait_timeout)
+        backoff = Backoff(0.25, 2.0)
+        while True:
+            logger.info(f"Getting details of process {self.pk}")
+            response_data = self._client._query_api_dict(
+                "workflow", query=queries.po_item(self._po_name, self.pk, "full"), content_key="list_POs"
             )
-            + "/"
-        )
+            if self._apply_details(response_data):
+                return self
+            if datetime.now() >= timeout:  # pragma: no cover
+                raise Exception("Timed out waiting for process to be created")
+            time.sleep(backoff.next_delay())  # pragma: no cover
 
     def refresh_state(self) -> "Process":
         """
         Since the Processes are ASYNC of nature the status can be pulled. Remember that you can also register
         a webhook in order to receive event updates
         """
-        if self.encoding_process.get("state") != "SUCCESS":
-            process_id = self.encoding_process.get("id")
-        # TODO: Delete this or write unit tests for this
-        # elif self.publish_process.get("state") != "SUCCESS":
-        #     process_id = self.publish_process.get("id")
-        else:
+        process_id = self._refresh_id()
+        if process_id is None:
+            self._stale = False
+            query = self._item_query()
+            if query is not None:
+                logger.info(f"Looking up the publish process of {self.pk}")
+                self._apply_item(self._client._query_api_dict("workflow", query=query, content_key="list_POs"))
             return self
 
         logger.info(f"Refreshing state for process {process_id}")
         response_data = self._client._query_api_dict(
-            "workflow",
-            query={
-                "operationName": "GetProcess",
-                "variables": {"id": process_id},
-                "query": """
-                        query GetProcess($id: ID!) {
-                            process(id: $id) {
-                                action
-                                data
-                                id
-                                message
-                                state
-                                start_date
-                                end_date
-                            }
-                        }""",
-            },
-            content_key="process",
+            "workflow", query=queries.get_process(process_id), content_key="process"
         )
-        if response_data.get("action") == "start_workflow_vod_default":
-            setattr(self, "encoding_process", response_data)
-        # TODO: Delete this or write unit tests for this
-        # elif response_data.get("action") == "publishPo":
-        #     setattr(self, "publish_process", response_data)
-        else:  # pragma: no cover
-            raise NotImplementedError("Unknown action")
-
-        return self
+        return self._apply_refresh(response_data)
 
     def register_webhook(self, url):
         """
@@ -340,38 +541,22 @@ class Process:
 
             # If it's missing, try to refresh the state once to catch a
             # quick creation on the server
-            if not sub_process or not sub_process.get('id'): # pragma: no cover
+            if not sub_process or not sub_process.get("id"):
                 logger.info(f"{attr_name} not found, refreshing state...")
-                self.refresh_state()
+                if self._po_name is not None:
+                    self.load_details()
+                else:  # pragma: no cover
+                    self.refresh_state()
                 sub_process = getattr(self, attr_name)
 
             # Final check
-            if not sub_process or not sub_process.get('id'): # pragma: no cover
+            if not sub_process or not sub_process.get("id"):  # pragma: no cover
                 logger.warning(f"Could not register webhook for {attr_name}: Not initialized by server.")
-                continue # Better than a crash, but logs the failure
+                continue  # Better than a crash, but logs the failure
 
-            process_id = sub_process.get('id')
+            process_id = sub_process.get("id")
             logger.info(f"Registering webhook for {attr_name} (ID: {process_id})")
 
             self._client._query_api(
-                "workflow",
-                query={
-                    "operationName": "registerWebhook",
-                    "variables": {
-                        "input": {
-                            "process_id": process_id,
-                            "webhook_url": url
-                        }
-                    },
-                    "query": """
-                        mutation registerWebhook($input: RegisterWebhookInput!) {
-                            registerWebhook(input: $input) {
-                                id
-                                state
-                                message
-                                action
-                            }
-                        }""",
-                },
-                content_key="registerWebhook",
+                "workflow", query=queries.register_webhook(process_id, url), content_key="registerWebhook"
             )
@@ -0,0 +1,134 @@
+"""
+Local emulators of the content platform and S3 shared by the benchmarks, and the baselines that fail a benchmark when
+one of its metrics regresses.
+
+The baselines in `baselines.json` are metrics that do not depend on the speed of the machine: requests per call,
+bytes held per entry and the time of an SDK call relative to a bare request. Record them again after an intended
+change with:
+
+    pytest tests/benchmarks --no-cov --update-baselines
+
+Timings are compared between runs on the same machine by pytest-benchmark, see `--benchmark-compare-fail`.
+"""
+
+import json
+import os
+from typing import Callable, Dict, Iterator
+
+import boto3
+import pytest
+from moto.server import ThreadedMotoServer
+
+from castlabs import ContentPlatform
+from castlabs.urls import API_URLS
+from stub_server import FakeContentPlatform, StubServer
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Relative increase of a metric over its baseline that fails the benchmark
+BASELINE_TOLERANCE = 0.1
+
+Baseline = Callable[..., None]
+Rate = Callable[[str, float], None]
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--update-baselines", action="store_true", default=False, help="record the measured benchmark baselines"
+    )
+
+
+def load_baselines() -> Dict[str, float]:
+    if not os.path.exists(BASELINES_FILE):
+        return {}
+    with open(BASELINES_FILE) as baselines_file:
+        return json.load(baselines_file)
+
+
+@pytest.fixture(name="recorded_baselines", scope="session")
+def fixture_recorded_baselines(request: pytest.FixtureRequest) -> Iterator[Dict[str, float]]:
+    baselines = load_baselines()
+    measured: Dict[str, float] = {}
+    yield measured
+
+    if request.config.getoption("--update-baselines") and measured:
+        baselines.update(measured)
+        with open(BASELINES_FILE, "w") as baselines_file:
+            json.dump(dict(sorted(baselines.items())), baselines_file, indent=2)
+            baselines_file.write("\n")
+
+
+@pytest.fixture(name="baseline")
+def fixture_baseline(request: pytest.FixtureRequest, benchmark, recorded_baselines: Dict[str, float]) -> Baseline:
+    """
+    Checks a metric against its baseline, lower is better. The metric is added to the extra info of the benchmark.
+    """
+    baselines = load_baselines()
+    update = request.config.getoption("--update-baselines")
+
+    def check(name: str, value: float, tolerance: float = BASELINE_TOLERANCE) -> None:
+        benchmark.extra_info[name] = value
+        if update:
+            recorded_baselines[name] = round(value, 3)
+            return
+        if name not in baselines:
+            pytest.fail(f"No baseline of {name}, record it with --update-baselines")
+        limit = baselines[name] * (1 + tolerance)
+        assert value <= limit, f"{name} regressed to {value:.3f}, baseline {baselines[name]} (+{tolerance:.0%})"
+
+    return check
+
+
+@pytest.fixture(name="rate")
+def fixture_rate(benchmark) -> Rate:
+    """
+    Adds a rate, an amount per second of the mean round, to the extra info of the benchmark. Nothing is added with
+    --benchmark-disable, where the benchmarked function runs once without timing.
+    """
+
+    def record(name: str, amount: float) -> None:
+        if benchmark.stats:
+            benchmark.extra_info[name] = amount / benchmark.stats.stats.mean
+
+    return record
+
+
+@pytest.fixture(name="emulator", scope="module")
+def fixture_emulator() -> Iterator[FakeContentPlatform]:
+    """
+    The credential exchange, workflow and repository endpoints answered by an in-memory content platform, as the
+    production environment
+    """
+    with StubServer() as server:
+        fake_platform = FakeContentPlatform(server)
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            monkeypatch.setitem(API_URLS, "production", server.urls)
+            yield fake_platform
+
+
+@pytest.fixture(name="emulated_platform", scope="module")
+def fixture_emulated_platform(emulator: FakeContentPlatform) -> Iterator[ContentPlatform]:
+    platform = ContentPlatform(
+        "urn:janus:organization:stub", "urn:janus:user:bench", "secret", "urn:janus:accesskey:bench"
+    )
+    yield platform
+    platform.close()
+
+
+@pytest.fixture(name="s3", scope="module")
+def fixture_s3() -> Iterator:
+    """
+    A boto3 client of a local moto S3 server with the bucket `bench-bucket`
+    """
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=f"http://{host}:{port}",
+        region_name="us-east-1",
+        aws_access_key_id="bench",
+        aws_secret_access_key="bench",
+    )
+    s3.create_bucket(Bucket="bench-bucket")
+    yield s3
+    server.stop()
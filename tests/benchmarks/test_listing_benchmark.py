@@ -0,0 +1,68 @@
+"""
+Listing throughput of folders with 10, 1,000 and 100,000 files against the local emulator, with the requests per
+listing and the memory held per entry
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+import tracemalloc
+
+import pytest
+
+from castlabs import ContentPlatform
+from stub_server import FakeContentPlatform
+
+SIZES = [10, 1_000, 100_000]
+
+
+@pytest.fixture(name="platform", scope="module")
+def fixture_platform(emulated_platform: ContentPlatform) -> ContentPlatform:
+    # look up the storage locations before the requests are counted
+    emulated_platform.list_files("warm_up")
+    return emulated_platform
+
+
+def listed_folder(emulator: FakeContentPlatform, size: int) -> str:
+    path = f"listing_{size}"
+    emulator.add_folder(path, {f"segment_{number}.m4s": 1_000_000 + number for number in range(size)})
+    return path
+
+
+@pytest.mark.benchmark(group="listing")
+@pytest.mark.parametrize("size", SIZES)
+def test_list_entries(
+    benchmark, baseline, rate, emulator: FakeContentPlatform, platform: ContentPlatform, size: int
+) -> None:
+    path = listed_folder(emulator, size)
+    requests_before = len(emulator.stub.graphql_requests())
+
+    entries = benchmark.pedantic(platform.list_entries, args=(path,), rounds=3 if size < 100_000 else 1)
+
+    assert len(entries) == size
+    rate("entries_per_second", size)
+    rounds = benchmark.stats.stats.rounds if benchmark.stats else 1
+    baseline(f"list_entries_{size}_requests", (len(emulator.stub.graphql_requests()) - requests_before) / rounds)
+
+    tracemalloc.start()
+    try:
+        entries = platform.list_entries(path)
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    baseline(f"list_entries_{size}_bytes_per_entry", held / size, tolerance=0.2 if size > 10 else 1.0)
+
+
+@pytest.mark.benchmark(group="listing")
+@pytest.mark.parametrize("size", SIZES)
+def test_list_files(
+    benchmark, baseline, rate, emulator: FakeContentPlatform, platform: ContentPlatform, size: int
+) -> None:
+    path = listed_folder(emulator, size)
+    requests_before = len(emulator.stub.graphql_requests())
+
+    names = benchmark.pedantic(platform.list_files, args=(path,), rounds=3 if size < 100_000 else 1)
+
+    assert len(names) == size
+    rate("files_per_second", size)
+    rounds = benchmark.stats.stats.rounds if benchmark.stats else 1
+    baseline(f"list_files_{size}_requests", (len(emulator.stub.graphql_requests()) - requests_before) / rounds)
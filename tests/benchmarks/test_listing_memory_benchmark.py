@@ -0,0 +1,104 @@
+"""
+Memory held by large listings: the dicts returned by the API against the compact records and the columnar form.
+The listings are decoded from JSON like an API response, the memory is traced while the results are held.
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+import json
+import tracemalloc
+from typing import Any, Callable
+
+import pytest
+
+from castlabs.records import DirectoryEntry, FileColumns, ProcessRecord
+from castlabs.workflow import Process
+
+ENTRIES = 100_000
+ROOT = "s3://bench-bucket/bench-root/"
+OUTPUT = "content-repo-prod-output-castlabs-vod/castlabs-vod/org_default_group"
+
+
+def folder_response() -> bytes:
+    files = [
+        {
+            "id": f"{ROOT}title_{number // 100}/segment_{number}.m4s",
+            "name": f"segment_{number}.m4s",
+            "size": 1_000_000 + number,
+            "last_modified": "2026-01-01T00:00:00.000Z",
+            "deleted": False,
+            "archived": False,
+            "archive": {
+                "restore_state": None,
+                "expiration": None,
+                "extra": {"restore_tier": None, "restore_eta": None},
+            },
+        }
+        for number in range(ENTRIES)
+    ]
+    return json.dumps({"folder": {"id": ROOT, "folders": [], "files": files}}).encode()
+
+
+def po_items_response() -> bytes:
+    items = [
+        {
+            "id": f"org_default_group_title_{number}",
+            "po_item_id": f"title_{number}",
+            "output_brefix": f"{OUTPUT}/title_{number}/out/",
+            "workflow_process": {"id": f"wf-{number}", "state": "SUCCESS", "message": None, "start_date": None},
+            "publish_process": {"id": f"pub-{number}", "state": "SUCCESS", "message": None, "end_date": None},
+            "tracks": [
+                {"codec_type": codec_type, "lang": "en", "messages": [], "source": {"index": index, "lang": "en"}}
+                for index, codec_type in enumerate(["video", "audio", "text"])
+            ],
+            "preview": {"dash_manifest_url": f"https://preview/{number}.mpd", "hls_manifest_url": None},
+        }
+        for number in range(ENTRIES // 10)
+    ]
+    return json.dumps({"poitems": items}).encode()
+
+
+def traced_bytes(build: Callable[[], Any]) -> int:
+    """
+    :return: The bytes allocated by `build` that are still held by its result
+    """
+    tracemalloc.start()
+    try:
+        result = build()  # noqa: F841
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current
+
+
+LISTINGS = {
+    "dicts": lambda response: json.loads(response)["folder"]["files"],
+    "entries": lambda response: [DirectoryEntry.from_content(file) for file in json.loads(response)["folder"]["files"]],
+    "columns": lambda response: FileColumns.from_walk([("", [], json.loads(response)["folder"]["files"])], ""),
+}
+
+PROCESSES = {
+    "processes": lambda response: [Process(item, None) for item in json.loads(response)["poitems"]],
+    "records": lambda response: [ProcessRecord.from_item(item) for item in json.loads(response)["poitems"]],
+}
+
+
+@pytest.mark.benchmark(group="listing-memory")
+@pytest.mark.parametrize("form", list(LISTINGS))
+def test_listing_memory(benchmark, baseline, form: str) -> None:
+    response = folder_response()
+
+    benchmark.pedantic(LISTINGS[form], args=(response,), rounds=3)
+    held = traced_bytes(lambda: LISTINGS[form](response))
+    benchmark.extra_info["mib_per_100k_entries"] = held / ENTRIES * 100_000 / 2**20
+    baseline(f"listing_{form}_bytes_per_entry", held / ENTRIES)
+
+
+@pytest.mark.benchmark(group="process-memory")
+@pytest.mark.parametrize("form", list(PROCESSES))
+def test_process_memory(benchmark, baseline, form: str) -> None:
+    response = po_items_response()
+
+    benchmark.pedantic(PROCESSES[form], args=(response,), rounds=3)
+    held = traced_bytes(lambda: PROCESSES[form](response))
+    baseline(f"{form}_bytes_per_process", held / (ENTRIES // 10))
@@ -0,0 +1,42 @@
+"""
+Overhead of an SDK call (authentication headers, retries, circuit breaker, concurrency limit, decoding) over a bare
+request on the same pooled connection to the local emulator
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+import timeit
+
+import pytest
+
+from castlabs import ContentPlatform, queries
+from stub_server import FakeContentPlatform
+
+CALLS = 200
+REPEAT = 5
+
+
+@pytest.mark.benchmark(group="overhead")
+def test_sdk_overhead_per_call(
+    benchmark, baseline, emulator: FakeContentPlatform, emulated_platform: ContentPlatform
+) -> None:
+    for number in range(10):
+        emulator.add_item(f"group_{number}", "title_1")
+    client = emulated_platform._client
+    query = queries.get_pos(client.organization_urn)
+    session = client._transport.session("workflow")
+    headers = client._api_headers(client._current_token())
+
+    def bare_request() -> None:
+        response = session.post(client._transport.urls["workflow"], json=query, headers=headers, timeout=10)
+        response.raise_for_status()
+        response.json()["data"]["list_POs"]
+
+    assert len(emulated_platform.get_groups()) == 10
+    bare = min(timeit.repeat(bare_request, number=CALLS, repeat=REPEAT)) / CALLS
+    sdk = min(timeit.repeat(emulated_platform.get_groups, number=CALLS, repeat=REPEAT)) / CALLS
+
+    benchmark.pedantic(emulated_platform.get_groups, rounds=CALLS)
+    benchmark.extra_info["bare_request_us"] = bare * 1e6
+    benchmark.extra_info["overhead_us"] = (sdk - bare) * 1e6
+    baseline("sdk_call_per_bare_request", sdk / bare, tolerance=0.25)
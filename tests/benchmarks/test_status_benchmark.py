@@ -0,0 +1,74 @@
+"""
+Compares polling the status of many encodings one by one against the batched get_statuses, and the status
+throughput of get_statuses for 10, 1,000 and 100,000 encodings against the local emulator
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+import pytest
+
+from castlabs import ContentPlatform
+from stub_server import FakeContentPlatform
+
+ENCODINGS = 100
+LATENCY = 0.005
+SIZES = [10, 1_000, 100_000]
+
+
+@pytest.fixture(name="platform", scope="module")
+def fixture_platform(emulator: FakeContentPlatform, emulated_platform: ContentPlatform) -> ContentPlatform:
+    for number in range(ENCODINGS):
+        emulator.add_item("default_group", f"title_{number}", state="PENDING")
+    return emulated_platform
+
+
+@pytest.fixture(name="latency")
+def fixture_latency(emulator: FakeContentPlatform):
+    emulator.stub.latency = LATENCY
+    yield
+    emulator.stub.latency = 0.0
+
+
+@pytest.mark.benchmark(group="status")
+@pytest.mark.usefixtures("latency")
+def test_get_status_per_encoding(benchmark, rate, platform: ContentPlatform) -> None:
+    def run() -> None:
+        for number in range(ENCODINGS):
+            platform.get_status(encode_name=f"title_{number}")
+
+    benchmark.pedantic(run, rounds=3)
+    rate("encodings_per_second", ENCODINGS)
+
+
+@pytest.mark.benchmark(group="status")
+@pytest.mark.usefixtures("latency")
+def test_get_statuses(benchmark, rate, platform: ContentPlatform) -> None:
+    encodings = [("default_group", f"title_{number}") for number in range(ENCODINGS)]
+
+    def run() -> None:
+        statuses = platform.get_statuses(encodings)
+        assert not [status for status in statuses if isinstance(status, Exception)]
+
+    benchmark.pedantic(run, rounds=3)
+    rate("encodings_per_second", ENCODINGS)
+
+
+@pytest.mark.benchmark(group="status-throughput")
+@pytest.mark.parametrize("state", ["SUCCESS", "PENDING"])
+@pytest.mark.parametrize("size", SIZES)
+def test_status_throughput(
+    benchmark, baseline, rate, emulator: FakeContentPlatform, platform: ContentPlatform, size: int, state: str
+) -> None:
+    group_name = f"group_{size}_{state.lower()}"
+    for number in range(size):
+        emulator.add_item(group_name, f"title_{number}", state=state)
+    encodings = [(group_name, f"title_{number}") for number in range(size)]
+    requests_before = len(emulator.stub.graphql_requests())
+
+    statuses = benchmark.pedantic(platform.get_statuses, args=(encodings,), rounds=3 if size < 100_000 else 1)
+
+    assert not [status for status in statuses if isinstance(status, Exception)]
+    rate("encodings_per_second", size)
+    rounds = benchmark.stats.stats.rounds if benchmark.stats else 1
+    requests = (len(emulator.stub.graphql_requests()) - requests_before) / rounds
+    baseline(f"get_statuses_{size}_{state.lower()}_requests", requests)
@@ -0,0 +1,54 @@
+"""
+Compares the pooled transport against a new connection per call (the previous behaviour of Client._query_api)
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+from typing import Iterator
+
+import pytest
+import requests
+
+from castlabs.client import Client
+from stub_server import StubServer
+
+CALLS = 100
+QUERY = {"operationName": "GetPOs", "variables": {}, "query": "query GetPOs { list_POs { pos { id } } }"}
+
+
+@pytest.fixture(name="server", scope="module")
+def fixture_server() -> Iterator[StubServer]:
+    with StubServer() as server:
+        server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+        yield server
+
+
+@pytest.fixture(name="client", scope="module")
+def fixture_client(server: StubServer) -> Iterator[Client]:
+    client = Client("urn:janus:organization:bench", "urn:janus:user:bench", "secret", "key", urls=server.urls)
+    yield client
+    client.close()
+
+
+@pytest.mark.benchmark(group="transport")
+def test_pooled_session(benchmark, rate, client: Client) -> None:
+    def run() -> None:
+        for _ in range(CALLS):
+            client._query_api("workflow", QUERY, "list_POs")
+
+    benchmark(run)
+    rate("requests_per_second", CALLS)
+
+
+@pytest.mark.benchmark(group="transport")
+def test_connection_per_call(benchmark, rate, server: StubServer) -> None:
+    url = server.urls["workflow"]
+
+    def run() -> None:
+        for _ in range(CALLS):
+            response = requests.request("POST", url, json=QUERY, timeout=10)
+            response.raise_for_status()
+            response.json()["data"]["list_POs"]
+
+    benchmark(run)
+    rate("requests_per_second", CALLS)
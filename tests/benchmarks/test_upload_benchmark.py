@@ -0,0 +1,89 @@
+"""
+Upload throughput against a local moto S3 server across part sizes and concurrency, for files and streams
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+from typing import Iterator, Optional
+
+import pytest
+
+from castlabs import instrumentation
+from castlabs.instrumentation import HistogramCollector
+from castlabs.multipart import MiB, UploadConfig
+from castlabs.repository import StorageLocation, UploadClient
+from stub_server import StubS3Clients
+
+FILE_SIZE = 64 * MiB
+
+
+@pytest.fixture(name="upload_client", scope="module")
+def fixture_upload_client(s3) -> UploadClient:
+    storage_location = StorageLocation({"id": "s3://bench-bucket/bench-root/", "name": "root"}, None)
+    upload_client = UploadClient(
+        storage_location, "title_1", "", upload_url="https://up/#/t", s3_clients=StubS3Clients(s3)
+    )
+    instrumentation.instrument_s3_client(s3)
+    return upload_client
+
+
+@pytest.fixture(name="master", scope="module")
+def fixture_master(tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp("upload") / "master.mp4"
+    path.write_bytes(b"x" * FILE_SIZE)
+    return str(path)
+
+
+@pytest.fixture(name="collector")
+def fixture_collector() -> Iterator[HistogramCollector]:
+    collector = HistogramCollector()
+    instrumentation.add_listener(collector)
+    yield collector
+    instrumentation.remove_listener(collector)
+
+
+@pytest.mark.benchmark(group="upload")
+@pytest.mark.parametrize(
+    "part_size, max_concurrency, max_bandwidth",
+    [
+        (8 * MiB, 1, None),
+        (8 * MiB, 10, None),
+        (16 * MiB, 4, None),
+        (16 * MiB, 10, None),
+        (None, 10, None),
+        (None, 10, 32 * MiB),
+    ],
+)
+def test_upload_throughput(
+    benchmark,
+    rate,
+    upload_client: UploadClient,
+    master: str,
+    part_size: Optional[int],
+    max_concurrency: int,
+    max_bandwidth: Optional[int],
+) -> None:
+    config = UploadConfig(part_size=part_size, max_concurrency=max_concurrency, max_bandwidth=max_bandwidth)
+
+    benchmark.pedantic(upload_client.upload_file, args=(master,), kwargs={"config": config}, rounds=3)
+    benchmark.extra_info["part_size"] = config.part_size_for(FILE_SIZE)
+    rate("mib_per_second", FILE_SIZE / MiB)
+
+
+@pytest.mark.benchmark(group="upload-stream")
+@pytest.mark.parametrize("max_concurrency", [1, 4, 10])
+def test_upload_stream_throughput(
+    benchmark, baseline, rate, upload_client: UploadClient, collector: HistogramCollector, max_concurrency: int
+) -> None:
+    config = UploadConfig(part_size=8 * MiB, max_concurrency=max_concurrency)
+    chunk = b"y" * MiB
+
+    def run() -> None:
+        upload_client.upload_stream((chunk for _ in range(FILE_SIZE // MiB)), "stream.mp4", config=config)
+
+    benchmark.pedantic(run, rounds=3)
+    rate("mib_per_second", FILE_SIZE / MiB)
+    rounds = benchmark.stats.stats.rounds if benchmark.stats else 1
+    benchmark.extra_info["part_mib_per_second"] = collector.bytes_per_second("part") / MiB
+    benchmark.extra_info["part_p99_seconds"] = collector.transfers["part"].quantile(0.99)
+    baseline("upload_stream_parts_per_64_mib", collector.transfers["part"].count / rounds)
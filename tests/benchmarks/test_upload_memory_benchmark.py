@@ -0,0 +1,109 @@
+"""
+Peak RSS and CPU time per GiB of uploading a large file. The S3 API is answered in-process after the request bodies
+were read, so only the cost of the client is measured. Every upload runs in a new process to measure its own peak.
+
+Run with: pytest tests/benchmarks --no-cov --benchmark-group-by=group
+"""
+
+import multiprocessing
+import resource
+import time
+from typing import Iterator
+from urllib.parse import parse_qs, urlparse
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+
+from castlabs.multipart import MiB, MultipartUpload, UploadConfig
+
+FILE_SIZE = 256 * MiB
+GiB = 1024 * MiB
+
+
+class _Raw:
+    def __init__(self, content: bytes):
+        self._content = content
+
+    def stream(self, **kwargs) -> Iterator[bytes]:
+        yield self._content
+
+
+class FakeS3:
+    """
+    Answers the S3 requests of a botocore client before they are sent, after reading their bodies like a socket would
+    """
+
+    def __call__(self, request, **kwargs) -> AWSResponse:
+        body = request.body
+        if hasattr(body, "read"):
+            while body.read(64 * 1024):
+                pass
+
+        query = parse_qs(urlparse(request.url).query, keep_blank_values=True)
+        content = b""
+        if request.method == "POST" and "uploads" in query:
+            content = (
+                b"<InitiateMultipartUploadResult><Bucket>bench-bucket</Bucket><Key>master.mp4</Key>"
+                b"<UploadId>bench</UploadId></InitiateMultipartUploadResult>"
+            )
+        elif request.method == "POST":
+            content = b"<CompleteMultipartUploadResult></CompleteMultipartUploadResult>"
+        return AWSResponse(request.url, 200, {"ETag": '"bench"'}, _Raw(content))
+
+
+def create_client():
+    s3 = boto3.client("s3", region_name="us-east-1", aws_access_key_id="bench", aws_secret_access_key="bench")
+    s3.meta.events.register("before-send.s3", FakeS3())
+    return s3
+
+
+def upload(s3, engine: str, file_name: str) -> None:
+    config = UploadConfig(
+        part_size=16 * MiB, max_concurrency=8, checksum_algorithm="CRC32" if engine == "memory_map_crc32" else None
+    )
+    if engine == "transfer_manager":
+        s3.upload_file(file_name, "bench-bucket", "master.mp4", Config=config.transfer_config(FILE_SIZE))
+    else:
+        MultipartUpload(s3, "bench-bucket", "master.mp4", file_name, config).run()
+
+
+def measure(engine: str, file_name: str, results: multiprocessing.Queue) -> None:
+    s3 = create_client()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu = time.process_time()
+    upload(s3, engine, file_name)
+    results.put(
+        {
+            "cpu_seconds_per_gib": (time.process_time() - cpu) * GiB / FILE_SIZE,
+            # KiB on Linux
+            "peak_rss_growth_mib": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+        }
+    )
+
+
+@pytest.fixture(name="master", scope="module")
+def fixture_master(tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp("upload") / "master.mp4"
+    with open(path, "wb") as f:
+        for _ in range(FILE_SIZE // MiB):
+            f.write(b"x" * MiB)
+    return str(path)
+
+
+@pytest.mark.benchmark(group="upload-memory")
+@pytest.mark.parametrize("engine", ["transfer_manager", "memory_map", "memory_map_crc32"])
+def test_upload_memory(benchmark, rate, master: str, engine: str) -> None:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+
+    def run() -> dict:
+        process = context.Process(target=measure, args=(engine, master, results))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        return results.get(timeout=10)
+
+    result = benchmark.pedantic(run, rounds=3)
+    benchmark.extra_info.update(result)
+    rate("mib_per_second", FILE_SIZE / MiB)
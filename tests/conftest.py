@@ -5,6 +5,9 @@ import pytest
 from dotenv import load_dotenv
 
 from castlabs import ContentPlatform
+from castlabs.client import Client
+from castlabs.urls import API_URLS
+from stub_server import FakeContentPlatform, StubServer
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -23,3 +26,50 @@ def fixture_platform():
         api_access_key_id=os.environ["API_ACCESS_KEY_ID"],
         api_secret_access_key=os.environ["API_SECRET_ACCESS_KEY"],
     )
+
+
+@pytest.fixture(name="stub_server")
+def fixture_stub_server():
+    """Start a local stand-in for the credential exchange and GraphQL endpoints."""
+    with StubServer() as server:
+        yield server
+
+
+@pytest.fixture(name="offline_client")
+def fixture_offline_client(stub_server: StubServer):
+    """Create a Client authenticated against the local stub server."""
+    client = Client(
+        organization_urn="urn:janus:organization:stub",
+        user_urn="urn:janus:user:stub",
+        api_access_key_id="urn:janus:accesskey:stub",
+        api_secret_access_key="stub-secret",
+        urls=stub_server.urls,
+    )
+    yield client
+    client.close()
+
+
+@pytest.fixture(name="fake_platform")
+def fixture_fake_platform(stub_server: StubServer, monkeypatch: pytest.MonkeyPatch):
+    """Serve an in-memory content platform and point the production environment to it."""
+    monkeypatch.setitem(API_URLS, "production", stub_server.urls)
+    return FakeContentPlatform(stub_server)
+
+
+@pytest.fixture(name="credentials")
+def fixture_credentials():
+    """Credentials accepted by the local stub server."""
+    return {
+        "organization_urn": "urn:janus:organization:stub",
+        "user_urn": "urn:janus:user:stub",
+        "api_access_key_id": "urn:janus:accesskey:stub",
+        "api_secret_access_key": "stub-secret",
+    }
+
+
+@pytest.fixture(name="offline_platform")
+def fixture_offline_platform(fake_platform: FakeContentPlatform, credentials: dict):
+    """Create a ContentPlatform talking to the in-memory content platform."""
+    platform = ContentPlatform(**credentials)
+    yield platform
+    platform.close()
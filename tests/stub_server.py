@@ -0,0 +1,333 @@
+"""
+A local stand-in for the credential exchange and the GraphQL endpoints, used by the offline tests and benchmarks
+"""
+
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from castlabs.urls import ApiUrls
+
+# Resolves an (api, graphql body) pair into a (status code, json response) pair
+Resolver = Callable[[str, dict], tuple]
+# An injected failure: a status code, or None to drop the connection, and the response headers
+Fault = Tuple[Optional[int], Dict[str, str]]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.stub.lock:
+            self.server.stub.connections += 1
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        api = self.path.strip("/").split("/")[0]
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append((api, json.loads(body or b"{}"), dict(self.headers)))
+
+        fault = stub.next_fault(api, json.loads(body or b"{}").get("operationName", ""))
+        if fault is not None and fault[0] is None:
+            # drop the connection without a response
+            self.close_connection = True
+            return
+        if fault is not None:
+            status, response = fault[0], {"message": "Injected fault"}
+        elif api == "auth":
+            status, response = 200, stub.credentials()
+        elif self.headers.get("Authorization", "").removeprefix("Bearer ") in stub.expired_tokens:
+            status, response = 401, {"message": "Unauthorized"}
+        else:
+            time.sleep(stub.latency)
+            status, response = stub.resolve(api, json.loads(body))
+
+        payload = json.dumps(response).encode()
+        self.send_response(status)
+        for name, value in {**stub.response_headers, **(fault[1] if fault else {})}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "StubServer"
+
+
+class StubServer:
+    """
+    Serves `/auth` (credential exchange), `/workflow/graphql` and `/repository/graphql` on localhost.
+
+    GraphQL requests are answered by the operation registered with :meth:`on`, or by the default resolver.
+    """
+
+    def __init__(self, resolver: Optional[Resolver] = None) -> None:
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests: List[tuple] = []
+        self.operations: Dict[str, Callable[[dict], Any]] = {}
+        self.response_headers: Dict[str, str] = {}
+        self.access_token = "stub-access-token"
+        self.expired_tokens: set = set()
+        self.token_lifetime: Optional[float] = None
+        # seconds added to every GraphQL response, emulating the round-trip to the platform
+        self.latency = 0.0
+        # queued (status code or None to drop the connection, headers) per operation name or api
+        self.faults: Dict[str, List[Fault]] = {}
+        self._resolver = resolver
+
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self) -> ApiUrls:
+        return {
+            "credential_exchange": f"{self.base_url}/auth",
+            "workflow": f"{self.base_url}/workflow/graphql",
+            "repository": f"{self.base_url}/repository/graphql",
+        }
+
+    def credentials(self) -> dict:
+        if self.token_lifetime is not None:
+            claims = {"exp": time.time() + self.token_lifetime, "jti": len(self.requests)}
+            payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+            self.access_token = f"eyJhbGciOiJub25lIn0.{payload}.signature"
+        return {"id_token": "stub-id-token", "access_token": self.access_token}
+
+    def expire_token(self) -> None:
+        """
+        Reject the current access token with HTTP 401 and issue a new one with the next credential exchange
+        """
+        self.expired_tokens.add(self.access_token)
+        self.access_token = f"stub-access-token-{len(self.expired_tokens)}"
+
+    @property
+    def auth_requests(self) -> int:
+        return len([api for api, _, _ in self.requests if api == "auth"])
+
+    def on(self, operation_name: str, handler: Callable[[dict], Any]) -> None:
+        """
+        Register the `data` returned for a GraphQL operation. The handler receives the variables.
+        """
+        self.operations[operation_name] = handler
+
+    def fail(
+        self, name: str, status: Optional[int] = 503, times: int = 1, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Answer the next `times` requests of a GraphQL operation, or of an api like "auth", with an error status, or
+        drop their connection without a response if the status is None
+        """
+        with self.lock:
+            self.faults.setdefault(name, []).extend([(status, headers or {})] * times)
+
+    def next_fault(self, api: str, operation_name: str) -> Optional[Fault]:
+        with self.lock:
+            for name in (operation_name, api):
+                if self.faults.get(name):
+                    return self.faults[name].pop(0)
+        return None
+
+    def resolve(self, api: str, body: dict) -> tuple:
+        if self._resolver:
+            return self._resolver(api, body)
+
+        handler = self.operations.get(body.get("operationName", ""))
+        if handler is None:
+            return 200, {"data": {}}
+        try:
+            return 200, {"data": handler(body.get("variables", {}))}
+        except Exception as e:
+            return 200, {"data": None, "errors": [{"message": str(e)}]}
+
+    def graphql_requests(self, operation_name: Optional[str] = None) -> List[dict]:
+        return [
+            body
+            for api, body, _ in self.requests
+            if api != "auth" and (operation_name is None or body.get("operationName") == operation_name)
+        ]
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+class StubS3Clients:
+    """
+    Hands one boto3 S3 client, e.g. of a mocked bucket, to the upload clients of every ticket in place of a
+    :class:`~castlabs.repository.S3ClientFactory`
+    """
+
+    def __init__(self, s3: Any):
+        self.s3 = s3
+
+    def get_client(self, upload_url: str, fetch_credentials: Callable[[], Dict[str, str]]) -> Any:
+        return self.s3
+
+
+class FakeContentPlatform:
+    """
+    In-memory groups, processes and folders answering the GraphQL operations sent by the SDK
+    """
+
+    def __init__(self, stub: StubServer, organization_urn: str = "urn:janus:organization:stub") -> None:
+        self.stub = stub
+        self.organization_urn = organization_urn
+        self.groups: Dict[str, Dict[str, dict]] = {}
+        self.processes: Dict[str, dict] = {}
+        self.folders: Dict[str, dict] = {}
+        self.bucket = "s3://stub-bucket/stub-root/"
+
+        stub.on("GetPOs", self.get_pos)
+        for projection in ("Minimal", "Status", "Full"):
+            stub.on(f"PoItemList{projection}", self.po_item_list)
+        stub.on("PoItem", self.po_item)
+        stub.on("PoItems", self.po_items)
+        stub.on("GetProcess", lambda variables: {"process": self.processes[variables["id"]]})
+        stub.on("GetProcesses", self.get_processes)
+        stub.on("start_workflow_vod_default", self.start_workflow)
+        stub.on("registerWebhook", self.register_webhook)
+        stub.on("registerWebhooks", self.register_webhooks)
+        stub.on("GetRootsurn_janus_organization", lambda variables: {"roots": [{"id": self.bucket, "name": "root"}]})
+        stub.on("filefolderlistwitharchive", self.get_folder)
+        stub.on("FileFolderListNames", lambda variables: self.get_folder(variables, ("id", "name")))
+        stub.on(
+            "FileFolderListSizes", lambda variables: self.get_folder(variables, ("id", "name", "size", "last_modified"))
+        )
+        stub.on("create_upload_ticket", self.create_upload_ticket)
+
+    def add_item(
+        self, group_name: str, po_item_id: str, state: str = "SUCCESS", publish_state: Optional[str] = "SUCCESS"
+    ) -> dict:
+        """
+        :param publish_state: The state of the publish sub-process, None if it is not created yet
+        """
+        po_name = f"{self.organization_urn}_{group_name}"
+        number = len(self.processes)
+        workflow_process = {"id": f"wf-{number}", "state": state, "action": "start_workflow_vod_default"}
+        self.processes[workflow_process["id"]] = workflow_process
+        publish_process = None
+        if publish_state is not None:
+            publish_process = self.add_publish_process(f"pub-{number}", publish_state)
+        item = {
+            "id": f"{po_name}_{po_item_id}",
+            "po_item_id": po_item_id,
+            "input_brefix": f"stub-bucket/stub-root/{po_item_id}/",
+            "output_brefix": f"content-repo-prod-output-castlabs-vod/castlabs-vod/{po_name}/{po_item_id}/out/",
+            "po": {"po_name": po_name},
+            "workflow_process": workflow_process,
+            "publish_process": publish_process,
+        }
+        self.groups.setdefault(po_name, {})[po_item_id] = item
+        return item
+
+    def add_publish_process(self, process_id: str, state: str = "SUCCESS", item: Optional[dict] = None) -> dict:
+        publish_process = {"id": process_id, "state": state, "action": "publishPo"}
+        self.processes[process_id] = publish_process
+        if item is not None:
+            item["publish_process"] = publish_process
+        return publish_process
+
+    def add_folder(
+        self, path: str, files: Optional[Dict[str, int]] = None, folders: Optional[List[str]] = None
+    ) -> None:
+        key = self.bucket + path.strip("/") + "/"
+        self.folders[key] = {
+            "id": key,
+            "name": path.strip("/").split("/")[-1],
+            "folders": [{"id": key + name + "/", "name": name} for name in folders or []],
+            "files": [
+                {
+                    "id": key + name,
+                    "name": name,
+                    "size": size,
+                    "last_modified": "2026-01-01T00:00:00.000Z",
+                    "deleted": False,
+                    "archived": False,
+                    "archive": None,
+                }
+                for name, size in (files or {}).items()
+            ],
+        }
+
+    def get_pos(self, variables: dict) -> dict:
+        return {"list_POs": {"pos": [{"id": po_name, "po_name": po_name} for po_name in self.groups]}}
+
+    def po_item_list(self, variables: dict) -> dict:
+        items = self.groups.get(variables["po_name"])
+        if items is None:
+            return {"list_POs": {"pos": []}}
+        return {"list_POs": {"pos": [{"id": variables["po_name"], "poitems": list(items.values())}]}}
+
+    def po_item(self, variables: dict) -> dict:
+        items = self.groups.get(variables["po_name"])
+        if items is None:
+            return {"list_POs": {"pos": []}}
+        matching = [items[variables["po_item_id"]]] if variables["po_item_id"] in items else []
+        return {"list_POs": {"pos": [{"id": variables["po_name"], "poitems": matching}]}}
+
+    def po_items(self, variables: dict) -> dict:
+        return {
+            f"i{name[7:]}": self.po_item({"po_name": po_name, "po_item_id": variables[f"po_item_id{name[7:]}"]})[
+                "list_POs"
+            ]
+            for name, po_name in variables.items()
+            if name.startswith("po_name")
+        }
+
+    def get_processes(self, variables: dict) -> dict:
+        return {f"p{name[2:]}": self.processes[process_id] for name, process_id in variables.items()}
+
+    def start_workflow(self, variables: dict) -> dict:
+        group_name = variables["po_name"][len(self.organization_urn) + 1 :]
+        item = self.add_item(group_name, variables["po_item_id"], state="PENDING", publish_state="PENDING")
+        return {"start_workflow_vod_default": item["workflow_process"]}
+
+    def register_webhook(self, variables: dict) -> dict:
+        process = self.processes[variables["input"]["process_id"]]
+        process.setdefault("webhooks", []).append(variables["input"]["webhook_url"])
+        return {"registerWebhook": {"id": process["id"], "state": process["state"]}}
+
+    def register_webhooks(self, variables: dict) -> dict:
+        return {
+            f"w{name[5:]}": self.register_webhook({"input": registration})["registerWebhook"]
+            for name, registration in variables.items()
+        }
+
+    def get_folder(self, variables: dict, fields: Optional[Tuple[str, ...]] = None) -> dict:
+        folder = self.folders.get(variables["id"], {"id": variables["id"], "folders": [], "files": []})
+        if fields:
+            folder = {**folder, "files": [{key: file[key] for key in fields} for file in folder["files"]]}
+        return {"folder": folder}
+
+    def create_upload_ticket(self, variables: dict) -> dict:
+        return {"createUploadTicket": {"directory": variables["folder_id"], "token": "t", "url": "https://up/#/t"}}
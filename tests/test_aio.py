@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from castlabs import AsyncContentPlatform
+from castlabs.aio import AsyncClient, AsyncStorageLocation
+from castlabs.errors import CPAuthorizationException
+from castlabs.repository import UploadClient
+from stub_server import FakeContentPlatform, StubServer
+
+
+@pytest.mark.asyncio
+async def test_get_groups_and_status(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    fake_platform.add_item("default_group", "title_1")
+    fake_platform.add_item("other_group", "title_2", state="PENDING")
+
+    async with AsyncContentPlatform(**credentials) as platform:
+        assert await platform.get_groups() == ["default_group", "other_group"]
+
+        status = await platform.get_status(encode_name="title_1")
+        assert status.status == "PUBLISH_SUCCESS"
+        assert status.complete
+
+        status = await platform.get_status(remote_path="folder/title_2", group_name="other_group")
+        assert status.status == "ENCODING_PENDING"
+        assert status.hls_url.endswith("title_2/hls.m3u8")
+
+        with pytest.raises(ValueError):
+            await platform.get_status()
+
+        with pytest.raises(KeyError):
+            await platform.get_status(encode_name="bad_encode_name")
+
+
+@pytest.mark.asyncio
+async def test_get_statuses(fake_platform: FakeContentPlatform, stub_server: StubServer, credentials: dict) -> None:
+    for number in range(5):
+        fake_platform.add_item("default_group", f"title_{number}", state="PENDING")
+
+    encodings = [("default_group", f"title_{number}") for number in range(5)] + [("default_group", "unknown")]
+    async with AsyncContentPlatform(**credentials) as platform:
+        statuses = await platform.get_statuses(encodings, batch_size=2)
+
+    assert [status.encode_name for status in statuses[:5]] == [f"title_{number}" for number in range(5)]
+    assert isinstance(statuses[5], KeyError)
+    assert len(stub_server.graphql_requests("PoItemListStatus")) == 1
+    assert len(stub_server.graphql_requests("GetProcesses")) == 3
+
+
+@pytest.mark.asyncio
+async def test_start_encoding(fake_platform: FakeContentPlatform, stub_server: StubServer, credentials: dict) -> None:
+    async with AsyncContentPlatform(**credentials) as platform:
+        encoding = await platform.start_encoding("media/title_3", webhook_url="https://example.com/hook")
+        # without a webhook only the mutation is sent, the content URL is not known yet
+        assert (await platform.start_encoding("media/title_4")).content_url is None
+
+    assert encoding.encode_name == "title_3"
+    assert encoding.status == "ENCODING_PENDING"
+
+    start, _ = stub_server.graphql_requests("start_workflow_vod_default")
+    assert start["variables"]["input_brefix"] == "stub-bucket/stub-root/media/title_3/"
+    assert len(stub_server.graphql_requests("registerWebhook")) == 2
+    assert len(stub_server.graphql_requests("PoItem")) == 1
+    assert not stub_server.graphql_requests("GetProcess")
+
+
+@pytest.mark.asyncio
+async def test_list_files(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    fake_platform.add_folder("title_1", files={"master.mp4": 100, "subs.vtt": 1}, folders=["extras"])
+
+    async with AsyncContentPlatform(**credentials) as platform:
+        assert await platform.list_files("title_1") == ["extras", "master.mp4", "subs.vtt"]
+
+
+@pytest.mark.asyncio
+async def test_walk(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    fake_platform.add_folder("title_1", files={"master.mp4": 100}, folders=["extras", "subs"])
+    fake_platform.add_folder("title_1/subs", files={"de.vtt": 6})
+
+    async with AsyncContentPlatform(**credentials) as platform:
+        listings = [listing async for listing in platform.walk("title_1", fields="sizes", max_concurrency=2)]
+        contents = [content["name"] async for content in platform.iter_directory("title_1/subs")]
+
+    files = {route: [(file["name"], file["size"]) for file in files] for route, _, files in listings}
+    assert files == {"title_1": [("master.mp4", 100)], "title_1/extras": [], "title_1/subs": [("de.vtt", 6)]}
+    assert contents == ["de.vtt"]
+
+
+@pytest.mark.asyncio
+async def test_upload_file(fake_platform: FakeContentPlatform, credentials: dict, monkeypatch, tmp_path) -> None:
+    uploaded = []
+    monkeypatch.setattr("castlabs.repository.UploadClient.upload_file", lambda self, name, *args: uploaded.append(name))
+    local_file = tmp_path / "video.mp4"
+    local_file.write_bytes(b"data")
+
+    async with AsyncContentPlatform(**credentials) as platform:
+        remote_paths = await asyncio.gather(*(platform.upload_file(str(local_file)) for _ in range(3)))
+        upload_client = await platform._get_upload_client("video_mp4")
+
+    assert remote_paths == ["video_mp4"] * 3
+    assert uploaded == [str(local_file)] * 3
+    assert upload_client.upload_url == "https://up/#/t"
+
+
+@pytest.mark.asyncio
+async def test_async_storage_location(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    async with AsyncContentPlatform(**credentials) as platform:
+        storage_location = await platform._get_storage_location()
+        upload_client = await storage_location.create_upload_client("title_1")
+
+    assert isinstance(storage_location, AsyncStorageLocation)
+    assert upload_client.upload_url == "https://up/#/t"
+    with pytest.raises(TypeError, match="AsyncStorageLocation.create_upload_client"):
+        UploadClient(storage_location, "title_1", "")
+
+
+@pytest.mark.asyncio
+async def test_content_url_of_a_submitted_process(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    async with AsyncContentPlatform(**credentials) as platform:
+        storage_location = await platform._get_storage_location()
+        process = await platform._workflow.create_vod_encoding(storage_location, "media/title_1", "group", "title_1")
+        with pytest.raises(RuntimeError, match="AsyncWorkflow.load_details"):
+            process.content_url
+        await platform._workflow.load_details(process)
+
+    assert process.content_url.startswith("https://vod.cp.castlabs.com/")
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit(stub_server: StubServer, credentials: dict) -> None:
+    in_flight, peak = 0, 0
+
+    def slow_resolver(api: str, body: dict) -> tuple:
+        nonlocal in_flight, peak
+        with stub_server.lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.02)
+        with stub_server.lock:
+            in_flight -= 1
+        return 200, {"data": {"list_POs": {"pos": []}}}
+
+    stub_server._resolver = slow_resolver
+    client = AsyncClient(**credentials, urls=stub_server.urls, max_concurrency=3)
+    await asyncio.gather(*(client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs") for _ in range(20)))
+    await client.close()
+
+    assert 1 <= peak <= 3
+    # a single credential exchange for all concurrent calls
+    assert len([api for api, _, _ in stub_server.requests if api == "auth"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_graphql_errors(stub_server: StubServer, credentials: dict) -> None:
+    stub_server._resolver = lambda api, body: (200, {"errors": [{"errorType": "Unauthorized", "message": "denied"}]})
+
+    client = AsyncClient(**credentials, urls=stub_server.urls)
+    with pytest.raises(CPAuthorizationException):
+        await client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+    await client.close()
@@ -0,0 +1,125 @@
+import asyncio
+import gc
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from castlabs.aio import AsyncClient
+from castlabs.client import Client, decode_token_expiry
+from castlabs.errors import CPAuthorizationException
+from stub_server import StubServer
+
+
+def test_decode_token_expiry(stub_server: StubServer) -> None:
+    stub_server.token_lifetime = 3600
+    token = stub_server.credentials()["access_token"]
+
+    assert decode_token_expiry(token) == pytest.approx(time.time() + 3600, abs=5)
+    assert decode_token_expiry("opaque-token") is None
+    assert decode_token_expiry("a.not-base64!.c") is None
+
+
+def test_unauthorized_call_is_retried(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    stub_server.expire_token()
+
+    assert offline_client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs") == {"pos": []}
+    assert stub_server.auth_requests == 2
+    assert offline_client._access_token == stub_server.access_token
+
+
+def test_graphql_unauthorized_is_retried_once(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server._resolver = lambda api, body: (200, {"errors": [{"errorType": "Unauthorized", "message": "denied"}]})
+
+    with pytest.raises(CPAuthorizationException):
+        offline_client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+    assert stub_server.auth_requests == 2
+    assert len(stub_server.graphql_requests()) == 2
+
+
+def test_concurrent_unauthorized_calls_share_one_reauthentication(
+    offline_client: Client, stub_server: StubServer
+) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    stub_server.expire_token()
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(
+            executor.map(
+                lambda _: offline_client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs"), range(64)
+            )
+        )
+
+    assert results == [{"pos": []}] * 64
+    assert stub_server.auth_requests == 2
+
+
+def test_token_is_refreshed_before_expiry(stub_server: StubServer, credentials: dict) -> None:
+    stub_server.token_lifetime = 1.0
+    client = Client(**credentials, urls=stub_server.urls, refresh_margin=0.5)
+    first_token = client._access_token
+
+    time.sleep(1.2)
+    client.close()
+
+    assert client._access_token != first_token
+    assert 2 <= stub_server.auth_requests <= 4
+    assert not stub_server.graphql_requests()
+
+
+def test_refresh_thread_stops_with_the_client(stub_server: StubServer, credentials: dict) -> None:
+    stub_server.token_lifetime = 3600
+    client = Client(**credentials, urls=stub_server.urls)
+    refresh_thread = client._refresh_thread
+    assert refresh_thread is not None and refresh_thread.is_alive()
+
+    del client
+    gc.collect()
+    refresh_thread.join(timeout=5)
+
+    assert not refresh_thread.is_alive()
+    assert stub_server.auth_requests == 1
+
+
+def test_due_token_is_refreshed_inline(stub_server: StubServer, credentials: dict) -> None:
+    stub_server.token_lifetime = 0.2
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    client = Client(**credentials, urls=stub_server.urls, auto_refresh=False)
+
+    time.sleep(0.3)
+    client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+    client.close()
+
+    assert stub_server.auth_requests == 2
+
+
+@pytest.mark.asyncio
+async def test_async_unauthorized_calls_share_one_reauthentication(stub_server: StubServer, credentials: dict) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    client = AsyncClient(**credentials, urls=stub_server.urls)
+    await client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+
+    stub_server.expire_token()
+    results = await asyncio.gather(
+        *(client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs") for _ in range(32))
+    )
+    await client.close()
+
+    assert results == [{"pos": []}] * 32
+    assert stub_server.auth_requests == 2
+
+
+@pytest.mark.asyncio
+async def test_async_token_is_refreshed_before_expiry(stub_server: StubServer, credentials: dict) -> None:
+    stub_server.token_lifetime = 1.0
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    client = AsyncClient(**credentials, urls=stub_server.urls, refresh_margin=0.5)
+    await client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+    first_token = client._access_token
+
+    await asyncio.sleep(1.2)
+    await client.close()
+
+    assert client._access_token != first_token
+    assert client._refresh_task is None
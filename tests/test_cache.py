@@ -0,0 +1,127 @@
+import io
+import json
+import os
+import stat
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from castlabs import AsyncContentPlatform, ContentPlatform
+from castlabs.cache import Cache, MemoryCache, SQLiteCache
+from castlabs.repository import StorageLocation, UploadClient
+from stub_server import StubServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_values_expire(backend: str, tmp_path) -> None:
+    clock = FakeClock()
+    cache = MemoryCache(clock) if backend == "memory" else SQLiteCache(str(tmp_path / "cache.sqlite3"), clock)
+    created = []
+
+    assert cache.get_or_set("ticket|a", lambda: created.append(1) or {"url": "https://up/#/a"}, ttl=60) == {
+        "url": "https://up/#/a"
+    }
+    assert cache.get_or_set("ticket|a", lambda: created.append(1), ttl=60) == {"url": "https://up/#/a"}
+    assert created == [1]
+
+    clock.now += 60
+    assert cache.get("ticket|a") is None
+
+    cache.set("ticket|b", "https://up/#/b", 60)
+    cache.delete("ticket|b")
+    cache.set("ticket|c", "https://up/#/c", 60)
+    cache.clear()
+    assert cache.get("ticket|b") is None and cache.get("ticket|c") is None
+
+
+def test_sqlite_cache_is_shared_and_private(tmp_path) -> None:
+    path = str(tmp_path / "castlabs" / "cache.sqlite3")
+    SQLiteCache(path).set("roots|a", [{"id": "s3://stub-bucket/stub-root/", "name": "root"}], 60)
+
+    # another process opening the same file
+    assert SQLiteCache(path).get("roots|a") == [{"id": "s3://stub-bucket/stub-root/", "name": "root"}]
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_platforms_share_roots_and_tickets(fake_platform, credentials: dict, stub_server: StubServer, tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite3")
+
+    for _ in range(2):
+        with ContentPlatform(**credentials, cache=SQLiteCache(path)) as platform:
+            platform.get_upload_url("title_1")
+
+    assert len(stub_server.graphql_requests("GetRootsurn_janus_organization")) == 1
+    assert len(stub_server.graphql_requests("create_upload_ticket")) == 1
+
+    # other folders and other organizations get their own tickets
+    with ContentPlatform(**credentials, cache=SQLiteCache(path)) as platform:
+        platform.get_upload_url("title_2")
+    with ContentPlatform(
+        **{**credentials, "organization_urn": "urn:janus:organization:other"}, cache=SQLiteCache(path)
+    ):
+        pass
+    assert len(stub_server.graphql_requests("create_upload_ticket")) == 2
+
+
+def test_caches_implement_every_method() -> None:
+    class PartialCache(Cache):
+        def get(self, key: str):
+            return None
+
+    with pytest.raises(TypeError):
+        Cache()  # type: ignore[abstract]
+    with pytest.raises(TypeError):
+        PartialCache()  # type: ignore[abstract]
+
+
+@pytest.mark.asyncio
+async def test_async_platform_uses_the_cache(fake_platform, credentials: dict, stub_server: StubServer) -> None:
+    cache = MemoryCache()
+    with ContentPlatform(**credentials, cache=cache) as platform:
+        platform.get_upload_url("title_1")
+
+    async with AsyncContentPlatform(**credentials, cache=cache) as platform:
+        upload_client = await platform._get_upload_client("title_1")
+
+    assert upload_client.upload_url == "https://up/#/t"
+    assert len(stub_server.graphql_requests("GetRootsurn_janus_organization")) == 1
+    assert len(stub_server.graphql_requests("create_upload_ticket")) == 1
+
+
+@pytest.mark.parametrize("lifetime, cached", [(timedelta(hours=1), True), (timedelta(minutes=5), False)])
+def test_credentials_are_cached_until_refresh(
+    monkeypatch: pytest.MonkeyPatch, lifetime: timedelta, cached: bool
+) -> None:
+    requests = []
+
+    def urlopen(request):
+        requests.append(request.full_url)
+        credentials = {
+            "AccessKeyId": "AKIA",
+            "SecretAccessKey": "secret",
+            "SessionToken": f"token-{len(requests)}",
+            "Expiration": (datetime.now(timezone.utc) + lifetime).isoformat(),
+        }
+        return io.BytesIO(json.dumps(credentials).encode())
+
+    monkeypatch.setattr("castlabs.repository.urlopen", urlopen)
+    storage_location = StorageLocation({"id": "s3://stub-bucket/stub-root/", "name": "root"}, None)
+    cache = MemoryCache()
+
+    tokens = [
+        UploadClient(storage_location, "title_1", "", upload_url="https://up/#/t", cache=cache)._fetch_credentials()[
+            "token"
+        ]
+        for _ in range(2)
+    ]
+
+    # credentials botocore would refresh right away are not cached
+    assert tokens == (["token-1", "token-1"] if cached else ["token-1", "token-2"])
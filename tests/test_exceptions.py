@@ -2,6 +2,7 @@ from typing import Callable
 from unittest.mock import Mock
 
 import pytest
+import requests
 from requests.exceptions import HTTPError
 
 from castlabs.api import ContentPlatform
@@ -21,14 +22,18 @@ def client(platform: ContentPlatform) -> Client:
 @pytest.fixture
 def mock_request(monkeypatch: pytest.MonkeyPatch) -> Callable[..., None]:
     """
-    Fixture to mock the requests.request method.
+    Fixture to mock the requests.Session.request method used by the pooled transport.
     """
 
+    request = requests.Session.request
+
     def _mock_request(mock_response) -> None:
-        def mock_response_func(method, url, headers, json, timeout):
+        def mock_response_func(session, method, url, headers, timeout, json=None, data=None):
+            if data is not None:  # let the re-authentication after an Unauthorized error pass
+                return request(session, method, url, headers=headers, data=data, timeout=timeout)
             return mock_response
 
-        monkeypatch.setattr("requests.request", mock_response_func)
+        monkeypatch.setattr("requests.Session.request", mock_response_func)
 
     return _mock_request
 
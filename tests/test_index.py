@@ -0,0 +1,144 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from castlabs import ContentPlatform
+from castlabs.index import RepositoryIndex
+from castlabs.repository import UploadClient
+from stub_server import FakeContentPlatform, StubServer
+
+ROOT = "s3://stub-bucket/stub-root/"
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def listing(folders=(), **files) -> dict:
+    return {
+        "folders": [{"name": name} for name in folders],
+        "files": [
+            {"name": name.replace("_", "."), "size": size, "last_modified": "2026-01-01T00:00:00+00:00"}
+            for name, size in files.items()
+        ],
+    }
+
+
+@pytest.fixture(name="index")
+def fixture_index(tmp_path) -> RepositoryIndex:
+    return RepositoryIndex(str(tmp_path / "index.sqlite3"), max_age=60, clock=FakeClock())
+
+
+def test_refresh_writes_only_changes(index: RepositoryIndex) -> None:
+    assert index.record(ROOT, "title_1", listing(["subs"], master_mp4=100, trailer_mp4=10)) == 2
+    assert index.record(ROOT, "title_1/subs", listing(de_vtt=6)) == 1
+    assert index.record(ROOT, "title_1", listing(["subs"], master_mp4=100, trailer_mp4=10)) == 0
+
+    # one changed, one removed
+    assert index.record(ROOT, "title_1", listing(["subs"], master_mp4=200)) == 2
+    assert index.stat(ROOT, "title_1/master.mp4").size == 200
+    assert index.stat(ROOT, "title_1/trailer.mp4") is None
+    assert index.stat(ROOT, "title_1/subs").is_folder
+
+    # removed folders go with their contents
+    index.record(ROOT, "title_1", listing(master_mp4=200))
+    assert index.stat(ROOT, "title_1/subs") is None
+    assert index.stat(ROOT, "title_1/subs/de.vtt") is None
+
+
+def test_listings_expire(index: RepositoryIndex) -> None:
+    index.record(ROOT, "title_1/", listing(["subs"], master_mp4=100))
+
+    folder = index.get_folder(ROOT, "title_1")
+    assert folder["folders"] == [{"id": f"{ROOT}title_1/subs/", "name": "subs"}]
+    assert [(file["id"], file["size"]) for file in folder["files"]] == [(f"{ROOT}title_1/master.mp4", 100)]
+    # sub folders are known, but not listed yet
+    assert index.get_folder(ROOT, "title_1/subs") is None
+
+    index._clock.now += 60
+    assert index.get_folder(ROOT, "title_1") is None
+
+    index.record(ROOT, "title_1", listing(["subs"], master_mp4=100))
+    index.invalidate(ROOT, "title_1")
+    assert not index.is_fresh(ROOT, "title_1")
+
+
+def test_files_with_prefix(index: RepositoryIndex) -> None:
+    index.record(ROOT, "title_1", listing(["subs"], master_mp4=100, trailer_mp4=10))
+    index.record(ROOT, "title_1/subs", listing(de_vtt=6))
+    index.record(ROOT, "title_10", listing(master_mp4=1))
+
+    assert [path for path, _, _ in index.files_with_prefix(ROOT, "title_1/")] == [
+        "title_1/master.mp4",
+        "title_1/subs/de.vtt",
+        "title_1/trailer.mp4",
+    ]
+    assert index.files_with_prefix(ROOT, "title_1/t").paths == ["title_1/trailer.mp4"]
+    assert index.files_with_prefix("s3://other-bucket/", "title_1/").paths == []
+
+
+@pytest.fixture(name="tree")
+def fixture_tree(fake_platform: FakeContentPlatform) -> FakeContentPlatform:
+    fake_platform.add_folder("title_1", files={"master.mp4": 100}, folders=["subs"])
+    fake_platform.add_folder("title_1/subs", files={"de.vtt": 6, "en.vtt": 7})
+    return fake_platform
+
+
+def test_platform_lists_stale_folders_only(
+    tree, credentials: dict, stub_server: StubServer, index: RepositoryIndex
+) -> None:
+    with ContentPlatform(**credentials, index=index) as platform:
+        platform.list_file_columns("title_1")
+        assert len(stub_server.graphql_requests("FileFolderListSizes")) == 2
+
+        assert platform.list_files("title_1") == ["subs", "master.mp4"]
+        assert platform.exists("title_1/subs/de.vtt")
+        assert platform.stat("title_1/master.mp4").size == 100
+        assert not platform.exists("title_1/subs/fr.vtt")
+        assert platform.find_files("title_1/subs/e").paths == ["title_1/subs/en.vtt"]
+        assert len(stub_server.graphql_requests("FileFolderListSizes")) == 2
+
+        index._clock.now += 60
+        tree.add_folder("title_1/subs", files={"de.vtt": 6, "en.vtt": 7, "fr.vtt": 8})
+        assert platform.exists("title_1/subs/fr.vtt")
+        assert len(stub_server.graphql_requests("FileFolderListSizes")) == 3
+
+        # full listings are always requested, and fill the index
+        assert [content["name"] for content in platform.iter_directory("title_1")] == ["subs", "master.mp4"]
+        assert len(stub_server.graphql_requests("filefolderlistwitharchive")) == 1
+
+
+def test_platform_without_index(tree, offline_platform: ContentPlatform) -> None:
+    assert offline_platform.stat("title_1/subs").is_folder
+    assert offline_platform.stat("title_1/master.mp4").size == 100
+    assert offline_platform.stat("title_1/trailer.mp4") is None
+    assert offline_platform.find_files("title_1/").paths == [
+        "title_1/master.mp4",
+        "title_1/subs/de.vtt",
+        "title_1/subs/en.vtt",
+    ]
+
+
+def test_uploads_invalidate_the_folder(
+    tree, credentials: dict, index: RepositoryIndex, monkeypatch: pytest.MonkeyPatch, tmp_path
+) -> None:
+    monkeypatch.setattr(
+        UploadClient,
+        "_fetch_credentials",
+        lambda self: {"access_key": "a", "secret_key": "s", "token": "t", "expiry_time": "2100-01-01T00:00:00Z"},
+    )
+    local_file = tmp_path / "fr.vtt"
+    local_file.write_bytes(b"WEBVTT")
+
+    with mock_aws(), ContentPlatform(**credentials, index=index) as platform:
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="stub-bucket")
+        platform.list_file_columns("title_1")
+
+        platform.upload_file(str(local_file), "title_1/subs")
+
+        assert not index.is_fresh(ROOT, "title_1/subs")
+        assert index.is_fresh(ROOT, "title_1")
@@ -0,0 +1,114 @@
+from typing import Iterator, List
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from castlabs import instrumentation
+from castlabs.client import Client
+from castlabs.instrumentation import ApiCallEvent, Event, Histogram, HistogramCollector, TransferEvent
+from castlabs.multipart import MIN_PART_SIZE, MiB, UploadConfig
+from castlabs.repository import StorageLocation, UploadClient
+from stub_server import StubS3Clients, StubServer
+
+QUERY = {"operationName": "GetPOs", "query": "query GetPOs { list_POs { pos { id } } }"}
+
+
+@pytest.fixture(name="events")
+def fixture_events() -> Iterator[List[Event]]:
+    events: List[Event] = []
+    instrumentation.add_listener(events.append)
+    yield events
+    instrumentation.remove_listener(events.append)
+
+
+def test_api_calls_are_measured(offline_client: Client, stub_server: StubServer, events: List[Event]) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": [{"id": "po-1"}]}})
+    stub_server.fail("GetPOs", 503, headers={"Retry-After": "0"})
+
+    offline_client._query_api("workflow", QUERY, "list_POs")
+
+    call = next(event for event in events if isinstance(event, ApiCallEvent) and event.operation == "GetPOs")
+    assert (call.api, call.status, call.attempts, call.retries, call.failed) == ("workflow", 200, 2, 1, False)
+    assert call.latency > 0
+    assert call.request_bytes > len(QUERY["query"])
+    assert call.response_bytes == len(b'{"data": {"list_POs": {"pos": [{"id": "po-1"}]}}}')
+
+
+def test_histogram_collector(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    collector = HistogramCollector()
+    instrumentation.add_listener(collector)
+    try:
+        for _ in range(3):
+            offline_client._query_api("workflow", QUERY, "list_POs")
+    finally:
+        instrumentation.remove_listener(collector)
+    collector(TransferEvent("file", "title_1/master.mp4", 10 * MiB, 2.0))
+    collector(TransferEvent("file", "title_1/audio.mp4", 2 * MiB, 2.0))
+
+    assert collector.calls[("workflow", "GetPOs")].count == 3
+    assert collector.call_counters[("workflow", "GetPOs")]["errors"] == 0
+    assert collector.bytes_per_second("file") == 3 * MiB
+    exposition = collector.to_prometheus()
+    assert "# TYPE castlabs_api_call_seconds histogram" in exposition
+    assert 'castlabs_api_call_seconds_count{api="workflow",operation="GetPOs"} 3' in exposition
+    assert 'castlabs_api_call_seconds_bucket{api="workflow",operation="GetPOs",le="+Inf"} 3' in exposition
+    assert 'castlabs_api_call_retries_total{api="workflow",operation="GetPOs"} 0' in exposition
+    assert 'castlabs_upload_seconds_bucket{kind="file",le="2.5"} 2' in exposition
+    assert f'castlabs_upload_bytes_total{{kind="file"}} {12 * MiB}' in exposition
+
+
+def test_histogram_quantiles() -> None:
+    histogram = Histogram((0.1, 1.0, 10.0))
+    for value in [0.05] * 90 + [0.5] * 9 + [42.0]:
+        histogram.observe(value)
+
+    assert histogram.counts == [90, 9, 0, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.99) == 1.0
+    assert histogram.quantile(1.0) == 42.0
+    assert histogram.mean == pytest.approx((90 * 0.05 + 9 * 0.5 + 42.0) / 100)
+
+
+def test_failing_listeners_do_not_fail_calls(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+
+    def failing(event: Event) -> None:
+        raise RuntimeError("Backend unavailable")
+
+    instrumentation.add_listener(failing)
+    try:
+        assert offline_client._query_api("workflow", QUERY, "list_POs") == {"pos": []}
+    finally:
+        instrumentation.remove_listener(failing)
+    assert not instrumentation.enabled()
+
+
+def test_uploads_are_measured(events: List[Event], tmp_path) -> None:
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="stub-bucket")
+        instrumentation.instrument_s3_client(s3)
+        storage_location = StorageLocation({"id": "s3://stub-bucket/stub-root/", "name": "root"}, None)
+        upload_client = UploadClient(
+            storage_location, "title_1", "", upload_url="https://up/#/t", s3_clients=StubS3Clients(s3)
+        )
+        local_file = tmp_path / "master.mp4"
+        local_file.write_bytes(b"x" * (12 * MiB))
+
+        config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, max_concurrency=3)
+        upload_client.upload_file(str(local_file), config=config)
+        upload_client.upload_stream(b"y" * 1024, "small.mp4")
+
+    transfers = [event for event in events if isinstance(event, TransferEvent)]
+    parts = sorted((event.key, event.part_number, event.bytes) for event in transfers if event.kind == "part")
+    assert parts == [
+        ("stub-root/title_1/master.mp4", 1, 5 * MiB),
+        ("stub-root/title_1/master.mp4", 2, 5 * MiB),
+        ("stub-root/title_1/master.mp4", 3, 2 * MiB),
+        ("stub-root/title_1/small.mp4", None, 1024),
+    ]
+    files = [(event.key, event.bytes) for event in transfers if event.kind == "file"]
+    assert files == [("stub-root/title_1/master.mp4", 12 * MiB), ("stub-root/title_1/small.mp4", 1024)]
+    assert all(event.seconds > 0 and event.bytes_per_second > 0 for event in transfers)
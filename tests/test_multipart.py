@@ -0,0 +1,345 @@
+import io
+import json
+import mmap
+import os
+import threading
+from typing import AsyncIterator, Iterator
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from castlabs.multipart import (
+    MAX_PARTS,
+    MIN_PART_SIZE,
+    ChecksumMismatchError,
+    MiB,
+    MultipartUpload,
+    UploadConfig,
+    _PartReader,
+    auto_part_size,
+)
+from castlabs.repository import StorageLocation, UploadClient
+from stub_server import StubS3Clients
+
+
+@pytest.fixture(name="upload_client")
+def fixture_upload_client() -> Iterator[UploadClient]:
+    """An UploadClient writing to a mocked S3 bucket."""
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="stub-bucket")
+        storage_location = StorageLocation({"id": "s3://stub-bucket/stub-root/", "name": "root"}, None)
+        upload_client = UploadClient(
+            storage_location, "title_1", "", upload_url="https://up/#/t", s3_clients=StubS3Clients(s3)
+        )
+        yield upload_client
+
+
+def test_auto_part_size() -> None:
+    assert auto_part_size(100 * MiB) == 8 * MiB
+    assert auto_part_size(50 * 1024 * MiB) == 52 * MiB
+    assert auto_part_size(5 * 1024 * 1024 * MiB) <= 5 * 1024 * MiB
+
+    config = UploadConfig(part_size=MIN_PART_SIZE)
+    assert config.part_size_for(100 * MiB) == MIN_PART_SIZE
+    # the configured size would need too many parts
+    assert config.part_size_for(100 * 1024 * MiB) * MAX_PARTS >= 100 * 1024 * MiB
+
+
+def test_invalid_config() -> None:
+    with pytest.raises(ValueError):
+        UploadConfig(part_size=MiB)
+
+    with pytest.raises(ValueError):
+        UploadConfig(max_concurrency=0)
+
+
+def test_transfer_config() -> None:
+    transfer_config = UploadConfig(max_concurrency=4, max_bandwidth=10 * MiB).transfer_config(1024 * MiB)
+
+    assert transfer_config.multipart_chunksize == 8 * MiB
+    assert transfer_config.max_concurrency == 4
+    assert transfer_config.max_bandwidth == 10 * MiB
+
+
+def test_multipart_upload_with_progress(upload_client: UploadClient, tmp_path) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(b"x" * (12 * MiB))
+    progress = []
+
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, max_concurrency=3)
+    assert upload_client.upload_file(
+        str(local_file), progress=lambda sent, total: progress.append((sent, total)), config=config
+    )
+
+    head = upload_client.aws_s3_client.head_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")
+    assert head["ContentLength"] == 12 * MiB
+    # three parts of 5, 5 and 2 MiB
+    assert head["ETag"].endswith('-3"')
+    assert progress[-1] == (12 * MiB, 12 * MiB)
+    assert [sent for sent, _ in progress] == sorted(sent for sent, _ in progress)
+
+
+def test_small_file_in_one_request(upload_client: UploadClient, tmp_path) -> None:
+    local_file = tmp_path / "subs.vtt"
+    local_file.write_bytes(b"WEBVTT")
+
+    upload_client.upload_file(str(local_file))
+
+    head = upload_client.aws_s3_client.head_object(Bucket="stub-bucket", Key="stub-root/title_1/subs.vtt")
+    assert "-" not in head["ETag"]
+
+
+def fail_on_part(upload_client: UploadClient, failing_part: int) -> list:
+    """
+    Let the upload of a part fail and record the numbers of the parts sent
+    """
+    s3 = upload_client.aws_s3_client
+    upload_part = type(s3).upload_part
+    sent = []
+
+    def flaky_upload_part(**kwargs):
+        if kwargs["PartNumber"] == failing_part:
+            raise ConnectionError("network blip")
+        sent.append(kwargs["PartNumber"])
+        return upload_part(s3, **kwargs)
+
+    s3.upload_part = flaky_upload_part
+    return sent
+
+
+def test_resume_upload(upload_client: UploadClient, tmp_path) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(b"x" * (12 * MiB))
+    config = UploadConfig(
+        part_size=MIN_PART_SIZE,
+        max_concurrency=1,
+        multipart_threshold=MIN_PART_SIZE,
+        resumable=True,
+        state_dir=str(tmp_path / "state"),
+    )
+
+    fail_on_part(upload_client, 3)
+    with pytest.raises(ConnectionError):
+        upload_client.upload_file(str(local_file), config=config)
+    (state_file,) = (tmp_path / "state").iterdir()
+    state = json.loads(state_file.read_text())
+    assert sorted(state["parts"]) == ["1", "2"]
+
+    sent = fail_on_part(upload_client, 0)
+    progress = []
+    upload_client.upload_file(str(local_file), progress=lambda sent, total: progress.append(sent), config=config)
+
+    head = upload_client.aws_s3_client.head_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")
+    assert head["ETag"].endswith('-3"')
+    assert head["ContentLength"] == 12 * MiB
+    # the completed parts are reported first and not sent again
+    assert sent == [3]
+    assert progress[0] == 2 * MIN_PART_SIZE
+    assert progress[-1] == 12 * MiB
+    assert not state_file.exists()
+
+
+def test_failed_upload_is_aborted(upload_client: UploadClient, tmp_path) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(b"x" * (12 * MiB))
+    config = UploadConfig(
+        part_size=MIN_PART_SIZE, max_concurrency=1, multipart_threshold=MIN_PART_SIZE, checksum_algorithm="CRC32"
+    )
+
+    fail_on_part(upload_client, 2)
+    with pytest.raises(ConnectionError):
+        upload_client.upload_file(str(local_file), config=config)
+
+    assert "Uploads" not in upload_client.aws_s3_client.list_multipart_uploads(Bucket="stub-bucket")
+
+
+def test_restart_changed_or_expired_upload(upload_client: UploadClient, tmp_path) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(b"x" * (12 * MiB))
+    config = UploadConfig(
+        part_size=MIN_PART_SIZE,
+        max_concurrency=1,
+        multipart_threshold=MIN_PART_SIZE,
+        resumable=True,
+        state_dir=str(tmp_path / "state"),
+    )
+    s3 = upload_client.aws_s3_client
+
+    fail_on_part(upload_client, 2)
+    with pytest.raises(ConnectionError):
+        upload_client.upload_file(str(local_file), config=config)
+
+    # the platform dropped the upload
+    (upload,) = s3.list_multipart_uploads(Bucket="stub-bucket")["Uploads"]
+    s3.abort_multipart_upload(Bucket="stub-bucket", Key=upload["Key"], UploadId=upload["UploadId"])
+    with pytest.raises(ConnectionError):
+        upload_client.upload_file(str(local_file), config=config)
+
+    # the file changed
+    local_file.write_bytes(b"y" * (11 * MiB))
+    sent = fail_on_part(upload_client, 0)
+    upload_client.upload_file(str(local_file), config=config)
+
+    assert sent == [1, 2, 3]
+    assert "Uploads" not in s3.list_multipart_uploads(Bucket="stub-bucket")
+    body = s3.get_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")["Body"].read()
+    assert body == b"y" * (11 * MiB)
+
+
+def chunks(size: int, chunk_size: int, byte: bytes = b"x") -> Iterator[bytes]:
+    for offset in range(0, size, chunk_size):
+        yield byte * min(chunk_size, size - offset)
+
+
+def test_upload_stream_from_iterator(upload_client: UploadClient) -> None:
+    progress = []
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, max_concurrency=3)
+
+    # chunks that do not line up with the parts
+    upload_client.upload_stream(
+        chunks(12 * MiB, 3 * MiB + 1),
+        "master.mp4",
+        progress=lambda sent, total: progress.append((sent, total)),
+        config=config,
+    )
+
+    s3 = upload_client.aws_s3_client
+    head = s3.head_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")
+    assert head["ContentLength"] == 12 * MiB
+    assert head["ETag"].endswith('-3"')
+    assert progress[-1] == (12 * MiB, 0)
+
+
+def test_upload_stream_from_file_and_bytes(upload_client: UploadClient) -> None:
+    s3 = upload_client.aws_s3_client
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE)
+
+    upload_client.upload_stream(io.BytesIO(b"y" * (6 * MiB)), "master.mp4", size=6 * MiB, config=config)
+    upload_client.upload_stream(memoryview(b"WEBVTT"), "subs.vtt")
+
+    head = s3.head_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")
+    assert head["ETag"].endswith('-2"')
+    body = s3.get_object(Bucket="stub-bucket", Key="stub-root/title_1/subs.vtt")["Body"].read()
+    assert body == b"WEBVTT"
+
+
+def test_upload_stream_memory_is_bounded(upload_client: UploadClient) -> None:
+    s3 = upload_client.aws_s3_client
+    upload_part = type(s3).upload_part
+    read = uploaded = ahead = 0
+    lock = threading.Lock()
+
+    def source() -> Iterator[bytes]:
+        nonlocal read, ahead
+        for chunk in chunks(30 * MiB, MIN_PART_SIZE):
+            with lock:
+                read += 1
+                ahead = max(ahead, read - uploaded)
+            yield chunk
+
+    def counting_upload_part(**kwargs):
+        nonlocal uploaded
+        response = upload_part(s3, **kwargs)
+        with lock:
+            uploaded += 1
+        return response
+
+    s3.upload_part = counting_upload_part
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, max_concurrency=2)
+    upload_client.upload_stream(source(), "master.mp4", config=config)
+
+    assert uploaded == 6
+    # two parts in flight and the one being read
+    assert ahead <= 3
+
+
+def test_failed_stream_is_aborted(upload_client: UploadClient) -> None:
+    s3 = upload_client.aws_s3_client
+    fail_on_part(upload_client, 2)
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, max_concurrency=1)
+
+    with pytest.raises(ConnectionError):
+        upload_client.upload_stream(chunks(30 * MiB, MiB), "master.mp4", config=config)
+
+    assert "Uploads" not in s3.list_multipart_uploads(Bucket="stub-bucket")
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_async(upload_client: UploadClient) -> None:
+    async def source() -> AsyncIterator[bytes]:
+        for chunk in chunks(11 * MiB, MiB, b"z"):
+            yield chunk
+
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE)
+    upload = upload_client.create_streaming_upload("master.mp4", config=config)
+    await upload.run_async(source())
+
+    s3 = upload_client.aws_s3_client
+    body = s3.get_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")["Body"].read()
+    assert body == b"z" * (11 * MiB)
+    assert sorted(upload.parts) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("checksum_algorithm", ["MD5", "CRC32"])
+def test_checksummed_upload_from_memory_map(upload_client: UploadClient, tmp_path, checksum_algorithm: str) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(bytes(range(256)) * (48 * 1024))
+    s3 = upload_client.aws_s3_client
+    config = UploadConfig(
+        part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, checksum_algorithm=checksum_algorithm
+    )
+
+    upload = MultipartUpload(s3, "stub-bucket", "stub-root/title_1/master.mp4", str(local_file), config)
+    upload.run()
+
+    if checksum_algorithm == "CRC32":
+        assert list(upload.checksums) == ["crc32"]
+        assert upload.checksums["crc32"].endswith("-3")
+    else:
+        head = s3.head_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")
+        assert head["ETag"].strip('"') == upload.checksums["etag"]
+        assert upload.checksums["etag"].endswith("-3")
+    body = s3.get_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")["Body"].read()
+    assert body == local_file.read_bytes()
+    # no state file without a resumable config
+    assert not os.path.exists(upload.state_file)
+
+
+def test_checksum_mismatch(upload_client: UploadClient, tmp_path) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(b"x" * (6 * MiB))
+    s3 = upload_client.aws_s3_client
+    complete_multipart_upload = type(s3).complete_multipart_upload
+    s3.complete_multipart_upload = lambda **kwargs: {**complete_multipart_upload(s3, **kwargs), "ETag": '"0-2"'}
+    config = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE, checksum_algorithm="MD5")
+
+    with pytest.raises(ChecksumMismatchError):
+        upload_client.upload_file(str(local_file), config=config)
+
+
+def test_part_reader_returns_slices_of_the_map(tmp_path) -> None:
+    local_file = tmp_path / "master.mp4"
+    local_file.write_bytes(b"0123456789")
+
+    with open(local_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped)[2:8] as body, _PartReader(body) as reader:
+            assert reader.readable() and reader.seekable()
+            chunk = reader.read(4)
+            assert isinstance(chunk, memoryview) and chunk.obj is mapped
+            assert bytes(chunk) == b"2345"
+            assert bytes(reader.read(4)) == b"67"
+            # a read releases the slice before it
+            with pytest.raises(ValueError):
+                bytes(chunk)
+            reader.seek(0)
+            buffer = bytearray(3)
+            assert reader.readinto(buffer) == 3 and buffer == b"234"
+            assert len(reader) == 6 and reader.tell() == 3
+            assert reader.read() == b"567"
+            reader.seek(1)
+            chunk = reader.read(2)
+        # no slice keeps the map open
+        with pytest.raises(ValueError):
+            bytes(chunk)
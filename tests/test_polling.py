@@ -0,0 +1,218 @@
+import random
+
+import pytest
+
+from castlabs import ContentPlatform
+from castlabs.api import Encoding
+from castlabs.polling import Backoff, PollPolicy, PollScheduler, RateLimiter
+from stub_server import FakeContentPlatform, StubServer
+
+FAST_POLICY = PollPolicy(intervals={"ENCODING": (0.01, 0.04), "PUBLISH": (0.01, 0.04)}, jitter=0)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def advance_on_poll(fake_platform: FakeContentPlatform, stub_server: StubServer, steps: dict) -> None:
+    """
+    Moves every process to its next state each time it is polled, following `steps`
+    """
+
+    def get_processes(variables: dict) -> dict:
+        for process_id in variables.values():
+            process = fake_platform.processes[process_id]
+            process["state"] = steps.get((process_id, process["state"]), process["state"])
+        return fake_platform.get_processes(variables)
+
+    stub_server.on("GetProcesses", get_processes)
+
+
+def test_backoff_grows_to_maximum() -> None:
+    backoff = Backoff(1.0, 5.0, jitter=0)
+    assert [backoff.next_delay() for _ in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    backoff.reset()
+    assert backoff.next_delay() == 1.0
+
+    jittered = Backoff(4.0, 4.0, jitter=0.5, rng=random.Random(1))
+    assert all(2.0 <= jittered.next_delay() <= 4.0 for _ in range(20))
+
+
+def test_policy_by_state() -> None:
+    policy = PollPolicy(jitter=0)
+
+    assert policy.backoff("ENCODING_PENDING").initial < policy.backoff("ENCODING_RUNNING").initial
+    assert policy.backoff("ENCODING_RUNNING").maximum == 120.0
+    assert policy.backoff("UNKNOWN").maximum == 60.0
+
+
+def test_rate_limiter() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(2.0, clock=clock, sleep=clock.sleep)
+
+    waits = [limiter.acquire() for _ in range(6)]
+
+    # the burst of two passes, then one request every half second
+    assert waits == [0.0, 0.0, 0.5, 0.5, 0.5, 0.5]
+    assert clock.now == 2.0
+    clock.now = 10.0
+    assert limiter.acquire() == 0.0
+
+    # concurrent callers queue up behind each other
+    queued = RateLimiter(2.0, clock=clock, sleep=lambda seconds: None)
+    assert [queued.acquire() for _ in range(5)] == [0.0, 0.0, 0.5, 1.0, 1.5]
+
+
+def test_pending_is_polled_tighter_than_running(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform
+) -> None:
+    pending = fake_platform.add_item("default_group", "pending", state="PENDING")
+    running = fake_platform.add_item("default_group", "running", state="RUNNING")
+    processes = {process.pk: process for process in offline_platform._workflow.get_processes("default_group")}
+    clock = FakeClock()
+    scheduler = PollScheduler(
+        offline_platform._workflow, RateLimiter(100.0), 50, PollPolicy(jitter=0), clock=clock, sleep=clock.sleep
+    )
+
+    polls = {"pending": 0, "running": 0}
+    refresh_states = offline_platform._workflow.refresh_states
+
+    def count_polls(batch, batch_size, limiter=None):
+        for process in batch:
+            polls[process.pk] += 1
+        if clock.now > 60:
+            pending["workflow_process"]["state"] = "SUCCESS"
+            running["workflow_process"]["state"] = "SUCCESS"
+        return refresh_states(batch, batch_size, limiter)
+
+    offline_platform._workflow.refresh_states = count_polls
+    assert sorted(scheduler.watch(processes)) == ["pending", "running"]
+    assert polls["pending"] > polls["running"] >= 1
+
+
+def test_wait_for_encodings(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    fake_platform.add_item("default_group", "done")
+    for number in range(3):
+        fake_platform.add_item("default_group", f"title_{number}", state="PENDING", publish_state="PENDING")
+    advance_on_poll(
+        fake_platform,
+        stub_server,
+        {
+            # title_0 runs, encodes and publishes
+            ("wf-2", "PENDING"): "RUNNING",
+            ("wf-2", "RUNNING"): "SUCCESS",
+            ("pub-2", "PENDING"): "SUCCESS",
+            # title_1 fails to publish, title_2 fails to encode
+            ("wf-4", "PENDING"): "SUCCESS",
+            ("pub-4", "PENDING"): "FAILED",
+            ("wf-6", "PENDING"): "FAILED",
+        },
+    )
+
+    completed = []
+    encodings = [("default_group", name) for name in ["title_0", "title_1", "title_2", "done", "unknown"]]
+    statuses = offline_platform.wait_for_encodings(encodings, on_complete=completed.append, policy=FAST_POLICY)
+
+    assert [status.status for status in statuses[:4]] == [
+        "PUBLISH_SUCCESS",
+        "PUBLISH_FAILED",
+        "ENCODING_FAILED",
+        "PUBLISH_SUCCESS",
+    ]
+    assert isinstance(statuses[4], KeyError)
+    # lookup errors and the encodings complete when listed first, then in the order of completion
+    assert [getattr(result, "encode_name", None) for result in completed] == [
+        None,
+        "done",
+        "title_2",
+        "title_1",
+        "title_0",
+    ]
+    assert len(stub_server.graphql_requests("PoItemListStatus")) == 1
+
+
+def test_iter_completed_timeout(offline_platform: ContentPlatform, fake_platform: FakeContentPlatform) -> None:
+    fake_platform.add_item("default_group", "done")
+    fake_platform.add_item("default_group", "stuck", state="PENDING")
+
+    completed = offline_platform.iter_completed(
+        [("default_group", "done"), ("default_group", "stuck")], timeout=0.05, policy=FAST_POLICY
+    )
+
+    assert isinstance(next(completed), Encoding)
+    with pytest.raises(TimeoutError):
+        next(completed)
+
+
+def test_publish_process_created_after_listing(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    item = fake_platform.add_item("default_group", "title_1", state="RUNNING", publish_state=None)
+    get_processes = stub_server.operations["GetProcesses"]
+
+    def encode_and_start_publishing(variables: dict) -> dict:
+        if "wf-0" in variables.values():
+            fake_platform.processes["wf-0"]["state"] = "SUCCESS"
+            fake_platform.add_publish_process("pub-0", "RUNNING", item)
+        elif "pub-0" in variables.values():
+            fake_platform.processes["pub-0"]["state"] = "SUCCESS"
+        return get_processes(variables)
+
+    stub_server.on("GetProcesses", encode_and_start_publishing)
+
+    statuses = offline_platform.wait_for_encodings([("default_group", "title_1")], timeout=5, policy=FAST_POLICY)
+
+    assert statuses[0].status == "PUBLISH_SUCCESS"
+    assert len(stub_server.graphql_requests("PoItems")) == 1
+    assert len(stub_server.graphql_requests("GetProcesses")) == 2
+
+
+def test_publish_processes_are_looked_up_in_batches(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    items = {
+        f"wf-{number}": fake_platform.add_item("default_group", f"title_{number}", state="RUNNING", publish_state=None)
+        for number in range(5)
+    }
+    processes = {
+        process.pk: process
+        for process in offline_platform._workflow.get_processes("default_group", fields="status", lazy_refresh=False)
+    }
+
+    def encode_and_publish(variables: dict) -> dict:
+        for process_id in variables.values():
+            fake_platform.processes[process_id]["state"] = "SUCCESS"
+            fake_platform.add_publish_process(process_id.replace("wf", "pub"), "SUCCESS", items[process_id])
+        return fake_platform.get_processes(variables)
+
+    stub_server.on("GetProcesses", encode_and_publish)
+
+    class CountingLimiter(RateLimiter):
+        tokens = 0.0
+
+        def acquire(self, tokens: float = 1.0) -> float:
+            self.tokens += tokens
+            return 0.0
+
+    limiter = CountingLimiter(100.0)
+    scheduler = PollScheduler(offline_platform._workflow, limiter, 2, FAST_POLICY, sleep=lambda seconds: None)
+
+    assert sorted(scheduler.watch(processes)) == sorted(processes)
+    assert all(process.state == "PUBLISH_SUCCESS" for process in processes.values())
+    # a request of the states and one of the publish processes per batch of two, each taking a token
+    assert len(stub_server.graphql_requests("GetProcesses")) == 3
+    assert len(stub_server.graphql_requests("PoItems")) == 3
+    assert not stub_server.graphql_requests("PoItem")
+    assert limiter.tokens == 6
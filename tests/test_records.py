@@ -0,0 +1,81 @@
+import math
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+from castlabs import ContentPlatform
+from castlabs.records import DirectoryEntry, FileColumns, ProcessRecord
+from stub_server import FakeContentPlatform, StubServer
+
+MODIFIED = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture(name="tree")
+def fixture_tree(fake_platform: FakeContentPlatform) -> FakeContentPlatform:
+    fake_platform.add_folder("title_1", files={"master.mp4": 100}, folders=["subs"])
+    fake_platform.add_folder("title_1/subs", files={"de.vtt": 6, "en.vtt": 7})
+    return fake_platform
+
+
+def test_list_entries(offline_platform: ContentPlatform, tree) -> None:
+    subs, master = offline_platform.list_entries("title_1")
+
+    assert subs == DirectoryEntry("subs", is_folder=True)
+    assert master == DirectoryEntry("master.mp4", size=100, last_modified=MODIFIED)
+    # names are interned, equal names of other listings share one string
+    assert master.name is sys.intern("master.mp4")
+    assert not hasattr(master, "__dict__")
+
+
+def test_list_file_columns(offline_platform: ContentPlatform, tree, stub_server: StubServer) -> None:
+    columns = offline_platform.list_file_columns("title_1")
+
+    assert sorted(columns) == [
+        ("master.mp4", 100, MODIFIED),
+        ("subs/de.vtt", 6, MODIFIED),
+        ("subs/en.vtt", 7, MODIFIED),
+    ]
+    assert columns.total_size == 113
+    assert stub_server.graphql_requests("FileFolderListSizes")
+
+
+def test_file_columns_without_sizes() -> None:
+    listings = [("title_1/", [], [{"id": "s3://b/title_1/a.vtt", "name": "a.vtt"}])]
+
+    ((path, size, mtime),) = FileColumns.from_walk(listings, "title_1")
+
+    assert (path, size) == ("a.vtt", -1)
+    assert math.isnan(mtime)
+
+
+def test_process_records(offline_platform: ContentPlatform, fake_platform: FakeContentPlatform) -> None:
+    fake_platform.add_item("default_group", "title_1")
+    fake_platform.add_item("default_group", "title_2", state="PENDING")
+
+    records = offline_platform.get_process_records()
+
+    assert [(record.name, record.state) for record in records] == [
+        ("title_1", "PUBLISH_SUCCESS"),
+        ("title_2", "ENCODING_PENDING"),
+    ]
+    assert records[0].content_url == offline_platform.get_status(encode_name="title_1").content_url
+    # the states of all records share one string each
+    assert records[1].encoding_state is sys.intern("PENDING")
+
+
+def test_process_record_from_item() -> None:
+    item = {
+        "po_item_id": "title_1",
+        "output_brefix": "content-repo-prod-output-castlabs-vod/castlabs-vod/org_default_group/title_1/out/",
+        "workflow_process": {"id": "wf-1", "state": "SUCCESS", "start_date": "2026-01-01T00:00:00+00:00"},
+        "publish_process": {"id": "pub-1", "state": "RUNNING"},
+        "tracks": [{"codec_type": "video"}] * 10,
+    }
+
+    record = ProcessRecord.from_item(item)
+
+    assert (record.encoding_id, record.publish_id, record.state) == ("wf-1", "pub-1", "PUBLISH_RUNNING")
+    assert record.start_date == MODIFIED
+    assert record.end_date is None
+    assert record.content_url == "https://vod.cp.castlabs.com/org_default_group/title_1/"
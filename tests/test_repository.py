@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from castlabs import ContentPlatform
+from stub_server import FakeContentPlatform, StubServer
+
+
+@pytest.fixture(name="tree")
+def fixture_tree(fake_platform: FakeContentPlatform) -> FakeContentPlatform:
+    fake_platform.add_folder("title_1", files={"master.mp4": 100}, folders=["subs", "artwork"])
+    fake_platform.add_folder("title_1/subs", files={"de.vtt": 6, "en.vtt": 6}, folders=["forced"])
+    fake_platform.add_folder("title_1/subs/forced", files={"de.vtt": 3})
+    fake_platform.add_folder("title_1/artwork", files={"poster.jpg": 1000})
+    return fake_platform
+
+
+def test_list_files_requests_names_only(offline_platform: ContentPlatform, tree, stub_server: StubServer) -> None:
+    assert offline_platform.list_files("title_1") == ["subs", "artwork", "master.mp4"]
+
+    (request,) = stub_server.graphql_requests("FileFolderListNames")
+    assert "size" not in request["query"]
+
+
+def test_iter_directory(offline_platform: ContentPlatform, tree) -> None:
+    contents = offline_platform.iter_directory("title_1/subs", fields="sizes")
+
+    assert next(contents) == {"id": "s3://stub-bucket/stub-root/title_1/subs/forced/", "name": "forced"}
+    assert [(content["name"], content["size"]) for content in contents] == [("de.vtt", 6), ("en.vtt", 6)]
+
+
+def test_walk(offline_platform: ContentPlatform, tree) -> None:
+    listings = list(offline_platform.walk("title_1", fields="names"))
+
+    routes = [route for route, _, _ in listings]
+    assert sorted(routes) == ["title_1", "title_1/artwork", "title_1/subs", "title_1/subs/forced"]
+    # every folder comes after its parent
+    assert routes.index("title_1/subs") < routes.index("title_1/subs/forced")
+    files = {route: [file["name"] for file in files] for route, _, files in listings}
+    assert files["title_1/subs"] == ["de.vtt", "en.vtt"]
+    assert files["title_1/subs/forced"] == ["de.vtt"]
+
+
+def test_walk_caps_listings_in_flight(offline_platform: ContentPlatform, tree, stub_server: StubServer) -> None:
+    tree.add_folder("title_1", folders=[f"season_{number}" for number in range(10)])
+    in_flight = []
+    lock = threading.Lock()
+
+    def get_folder(variables: dict) -> dict:
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.pop()
+        return tree.get_folder(variables, ("id", "name"))
+
+    peak = []
+    stub_server.on("FileFolderListNames", get_folder)
+
+    listings = list(offline_platform.walk("title_1", fields="names", max_concurrency=3))
+
+    assert len(listings) == 11
+    assert max(peak) <= 3
+
+    with pytest.raises(ValueError):
+        next(offline_platform.walk("title_1", max_concurrency=0))
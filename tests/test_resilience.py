@@ -0,0 +1,195 @@
+import random
+
+import pytest
+import requests
+
+from castlabs.client import Client
+from castlabs.errors import CPCircuitOpenException
+from castlabs.resilience import AdaptiveLimit, CircuitBreaker, RetryPolicy, parse_retry_after
+from castlabs.transport import Transport
+from stub_server import StubServer
+
+QUERY = {"operationName": "GetPOs", "query": "query GetPOs { list_POs { pos { id } } }"}
+MUTATION = {"operationName": "registerWebhook", "query": "mutation registerWebhook { registerWebhook { id } }"}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="transport")
+def fixture_transport(stub_server: StubServer):
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    stub_server.on("registerWebhook", lambda variables: {"registerWebhook": {"id": "wf-1"}})
+    delays = []
+    transport = Transport(stub_server.urls, pool_size=4, sleep=delays.append)
+    transport.delays = delays  # type: ignore
+    yield transport
+    transport.close()
+
+
+def operations(stub_server: StubServer, name: str) -> int:
+    return len(stub_server.graphql_requests(name))
+
+
+def test_queries_are_retried(transport: Transport, stub_server: StubServer) -> None:
+    stub_server.fail("GetPOs", 503, headers={"Retry-After": "2"})
+    stub_server.fail("GetPOs", 500)
+    stub_server.fail("GetPOs", None)
+
+    response = transport.request("workflow", json=QUERY)
+
+    assert response.status_code == 200
+    assert operations(stub_server, "GetPOs") == 4
+    # Retry-After first, then decorrelated jitter
+    assert transport.delays[0] == 2.0  # type: ignore
+    assert all(0.2 <= delay <= 20.0 for delay in transport.delays)  # type: ignore
+
+
+def test_mutations_are_retried_only_when_not_processed(transport: Transport, stub_server: StubServer) -> None:
+    stub_server.fail("registerWebhook", 429)
+    assert transport.request("workflow", json=MUTATION).status_code == 200
+    assert operations(stub_server, "registerWebhook") == 2
+
+    stub_server.fail("registerWebhook", 502)
+    assert transport.request("workflow", json=MUTATION).status_code == 502
+    assert operations(stub_server, "registerWebhook") == 3
+
+    stub_server.fail("registerWebhook", None)
+    with pytest.raises(requests.ConnectionError):
+        transport.request("workflow", json=MUTATION)
+    assert operations(stub_server, "registerWebhook") == 4
+
+
+def test_refused_connections_are_retried() -> None:
+    delays = []
+    transport = Transport({"workflow": "http://127.0.0.1:9/graphql"}, sleep=delays.append)  # type: ignore
+
+    with pytest.raises(requests.ConnectionError):
+        transport.request("workflow", json=MUTATION)
+
+    assert len(delays) == 3
+
+
+def test_retries_give_up(transport: Transport, stub_server: StubServer) -> None:
+    stub_server.fail("GetPOs", 429, headers={"Retry-After": "120"})
+    assert transport.request("workflow", json=QUERY).status_code == 429
+    assert operations(stub_server, "GetPOs") == 1
+
+    stub_server.fail("GetPOs", 504, times=4)
+    assert transport.request("workflow", json=QUERY).status_code == 504
+    assert operations(stub_server, "GetPOs") == 5
+
+
+def test_client_raises_after_the_retries(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    offline_client._transport.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+
+    stub_server.fail("GetPOs", 503)
+    assert offline_client._query_api("workflow", QUERY, "list_POs") == {"pos": []}
+
+    stub_server.fail("GetPOs", 503, times=2)
+    with pytest.raises(requests.HTTPError):
+        offline_client._query_api("workflow", QUERY, "list_POs")
+
+
+def test_circuit_opens_per_host(transport: Transport, stub_server: StubServer) -> None:
+    transport.retry_policy = RetryPolicy(max_attempts=1)
+    transport.failure_threshold = 3
+    stub_server.fail("GetPOs", 500, times=3)
+    for _ in range(3):
+        transport.request("workflow", json=QUERY)
+
+    with pytest.raises(CPCircuitOpenException):
+        transport.request("workflow", json=QUERY)
+    assert operations(stub_server, "GetPOs") == 3
+    assert transport.breaker("workflow").state == "open"
+    # the other hosts are not affected
+    assert transport.request("repository", json=QUERY).status_code == 200
+
+
+def test_circuit_breaker_probes_after_the_reset_timeout() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now = 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    # a single probe at a time
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_decorrelated_jitter() -> None:
+    policy = RetryPolicy(base_delay=1, max_delay=10, rng=random.Random(7))
+
+    delay = 0.0
+    for _ in range(20):
+        previous, delay = delay, policy.next_delay(delay)
+        assert 1 <= delay <= min(10, max(previous, 1) * 3)
+    assert policy.next_delay(delay, retry_after=4) == 4
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_adaptive_limit() -> None:
+    clock = FakeClock()
+    limit = AdaptiveLimit(8, minimum=2, clock=clock)
+
+    def respond(latency: float, throttled: bool = False) -> float:
+        limit.acquire()
+        limit.release(latency, throttled)
+        return limit.limit
+
+    assert respond(0.1, throttled=True) == 4
+    assert respond(0.1) == 4.25
+
+    # a latency spike halves the limit, at most once per smoothed latency
+    clock.now = 1
+    assert respond(1.0) == 2.125
+    assert respond(1.0) == 2.125
+    clock.now = 2
+    assert respond(0.1, throttled=True) == 2
+
+    for _ in range(100):
+        respond(0.1)
+    assert limit.limit == 8
+    assert limit.in_flight == 0
+
+
+def test_throttling_lowers_the_limit(transport: Transport, stub_server: StubServer) -> None:
+    stub_server.fail("GetPOs", 429, times=2, headers={"Retry-After": "0"})
+
+    assert transport.request("workflow", json=QUERY).status_code == 200
+    assert transport.limit("workflow").limit < 4
+
+
+@pytest.mark.parametrize("latency_tolerance, lowered", [(None, False), (2.0, True)])
+def test_slow_responses_lower_the_limit_only_when_enabled(
+    stub_server: StubServer, latency_tolerance, lowered: bool
+) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    transport = Transport(stub_server.urls, pool_size=4, latency_tolerance=latency_tolerance)
+    for _ in range(3):
+        transport.request("workflow", json=QUERY)
+
+    stub_server.latency = 0.2
+    transport.request("workflow", json=QUERY)
+    transport.close()
+
+    assert (transport.limit("workflow").limit < 4) is lowered
@@ -0,0 +1,163 @@
+import threading
+import time
+
+from castlabs import ContentPlatform
+from castlabs.submissions import PUBLISH_NOT_CREATED, EncodingJob
+from stub_server import FakeContentPlatform, StubServer
+
+WEBHOOK = "https://example.com/hook"
+
+
+def test_start_encodings_skips_existing(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    fake_platform.add_item("default_group", "title_1")
+    jobs = [EncodingJob(remote_path=f"titles/title_{number}", webhook_url=WEBHOOK) for number in (1, 2, 3, 2)]
+
+    results = list(offline_platform.start_encodings(jobs))
+
+    assert sorted((result.job.name, result.state or "", result.skipped) for result in results) == [
+        ("title_1", "PUBLISH_SUCCESS", True),
+        ("title_2", "", True),
+        ("title_2", "ENCODING_PENDING", False),
+        ("title_3", "ENCODING_PENDING", False),
+    ]
+    assert all(result.success and result.webhook_error is None for result in results)
+    assert len(stub_server.graphql_requests("PoItemListStatus")) == 1
+    assert len(stub_server.graphql_requests("start_workflow_vod_default")) == 2
+    assert not stub_server.graphql_requests("registerWebhook")
+    # one lookup of the publish processes per batch of registrations
+    assert len(stub_server.graphql_requests("PoItems")) == len(stub_server.graphql_requests("registerWebhooks"))
+
+    # both sub-processes of the started encodings, none of the existing one
+    registered = {process["id"] for process in fake_platform.processes.values() if process.get("webhooks")}
+    assert registered == {"wf-2", "pub-2", "wf-4", "pub-4"}
+
+    # submitting again starts nothing
+    assert all(result.skipped for result in offline_platform.start_encodings(jobs))
+    assert len(stub_server.graphql_requests("start_workflow_vod_default")) == 2
+
+
+def test_start_encodings_reports_failures(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    start_workflow = stub_server.operations["start_workflow_vod_default"]
+    list_group = stub_server.operations["PoItemListStatus"]
+
+    def failing_start(variables: dict) -> dict:
+        if variables["po_item_id"] == "title_2":
+            raise ValueError("Invalid input")
+        return start_workflow(variables)
+
+    def failing_list(variables: dict) -> dict:
+        if variables["po_name"].endswith("_broken_group"):
+            raise ValueError("Unavailable")
+        return list_group(variables)
+
+    stub_server.on("start_workflow_vod_default", failing_start)
+    stub_server.on("PoItemListStatus", failing_list)
+    jobs = [EncodingJob(remote_path="title_1"), EncodingJob(remote_path="title_2")]
+    jobs.append(EncodingJob(remote_path="title_3", group_name="broken_group"))
+
+    results = {result.job.name: result for result in offline_platform.start_encodings(jobs)}
+
+    assert results["title_1"].success
+    assert results["title_1"].encoding == ("default_group", "title_1")
+    assert not results["title_2"].success
+    assert results["title_3"].error.startswith("Listing group broken_group failed")
+    assert len(stub_server.graphql_requests("start_workflow_vod_default")) == 2
+
+
+def test_start_encodings_limits_concurrency(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    start_workflow = stub_server.operations["start_workflow_vod_default"]
+    lock = threading.Lock()
+    running = []
+    peak = 0
+
+    def slow_start(variables: dict) -> dict:
+        nonlocal peak
+        with lock:
+            running.append(variables["po_item_id"])
+            peak = max(peak, len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(variables["po_item_id"])
+            return start_workflow(variables)
+
+    stub_server.on("start_workflow_vod_default", slow_start)
+    jobs = [EncodingJob(remote_path=f"title_{number}", webhook_url=WEBHOOK) for number in range(8)]
+
+    results = list(offline_platform.start_encodings(jobs, max_concurrency=2, max_rate=1000, batch_size=3))
+
+    assert len(results) == 8 and all(result.success for result in results)
+    assert peak == 2
+    batches = [len(body["variables"]) for body in stub_server.graphql_requests("registerWebhooks")]
+    assert sum(batches) == 16
+    assert max(batches) <= 3
+
+
+def test_webhooks_are_registered_before_the_results(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    start_workflow = stub_server.operations["start_workflow_vod_default"]
+
+    def start_without_publishing(variables: dict) -> dict:
+        response = start_workflow(variables)
+        if variables["po_item_id"] == "title_1":
+            fake_platform.groups[variables["po_name"]]["title_1"]["publish_process"] = None
+        return response
+
+    stub_server.on("start_workflow_vod_default", start_without_publishing)
+    jobs = [EncodingJob(remote_path=f"title_{number}", webhook_url=WEBHOOK) for number in range(4)]
+
+    results = offline_platform.start_encodings(jobs, max_concurrency=1, batch_size=2)
+    first = next(results)
+    results.close()
+
+    # the webhooks of a result are registered when it is yielded
+    registered = {process["id"] for process in fake_platform.processes.values() if process.get("webhooks")}
+    assert {first.process_id, first.process_id.replace("wf", "pub")} <= registered
+    # the encodings started before the iterator was closed get their webhooks too
+    started = {body["variables"]["po_item_id"] for body in stub_server.graphql_requests("start_workflow_vod_default")}
+    for item in (fake_platform.groups[f"{fake_platform.organization_urn}_default_group"][name] for name in started):
+        assert item["workflow_process"].get("webhooks") == [WEBHOOK]
+        if item["publish_process"] is not None:
+            assert item["publish_process"].get("webhooks") == [WEBHOOK]
+
+
+def test_unknown_publish_process_is_reported(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    po_items = stub_server.operations["PoItems"]
+    register_webhooks = stub_server.operations["registerWebhooks"]
+
+    def po_items_while_publishing(variables: dict) -> dict:
+        if variables["po_item_id0"] == "title_0":
+            # the item is not listed yet
+            return {"i0": {"pos": []}}
+        if variables["po_item_id0"] == "title_2":
+            raise ValueError("Timeout")
+        return po_items(variables)
+
+    def failing_registration(variables: dict) -> dict:
+        if any(registration["process_id"] == "wf-2" for registration in variables.values()):
+            raise ValueError("Unavailable")
+        return register_webhooks(variables)
+
+    stub_server.on("PoItems", po_items_while_publishing)
+    stub_server.on("registerWebhooks", failing_registration)
+    jobs = [EncodingJob(remote_path=f"title_{number}", webhook_url=WEBHOOK) for number in range(3)]
+
+    results = {
+        result.job.name: result for result in offline_platform.start_encodings(jobs, max_concurrency=1, batch_size=1)
+    }
+
+    assert all(result.success for result in results.values())
+    assert results["title_0"].webhook_error == PUBLISH_NOT_CREATED
+    assert "Unavailable" in results["title_1"].webhook_error
+    assert "Timeout" in results["title_2"].webhook_error
+    # the encoding webhooks are registered without the publish processes
+    assert fake_platform.processes[results["title_0"].process_id]["webhooks"] == [WEBHOOK]
+    assert fake_platform.processes[results["title_2"].process_id]["webhooks"] == [WEBHOOK]
@@ -0,0 +1,201 @@
+import os
+from typing import Iterator
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from castlabs import ContentPlatform
+from castlabs.multipart import MIN_PART_SIZE, MiB, UploadConfig
+from castlabs.repository import UploadClient
+from castlabs.sync import SyncManifest, compare_unrecorded, file_md5, plan_sync
+from stub_server import StubServer
+
+CONFIG = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE)
+
+
+@pytest.fixture(name="s3")
+def fixture_s3(stub_server: StubServer, monkeypatch: pytest.MonkeyPatch) -> Iterator:
+    """A mocked S3 bucket behind the upload tickets and folder listings of the in-memory content platform."""
+    monkeypatch.setattr(
+        UploadClient,
+        "_fetch_credentials",
+        lambda self: {"access_key": "a", "secret_key": "s", "token": "t", "expiry_time": "2100-01-01T00:00:00Z"},
+    )
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="stub-bucket")
+
+        def get_folder(variables: dict) -> dict:
+            prefix = variables["id"].removeprefix("s3://stub-bucket/")
+            listing = s3.list_objects_v2(Bucket="stub-bucket", Prefix=prefix, Delimiter="/")
+            return {
+                "folder": {
+                    "id": variables["id"],
+                    "folders": [
+                        {"id": f"s3://stub-bucket/{folder['Prefix']}", "name": folder["Prefix"].split("/")[-2]}
+                        for folder in listing.get("CommonPrefixes", [])
+                    ],
+                    "files": [
+                        {
+                            "id": f"s3://stub-bucket/{item['Key']}",
+                            "name": item["Key"].split("/")[-1],
+                            "size": item["Size"],
+                            "last_modified": item["LastModified"].isoformat(),
+                            "deleted": False,
+                            "archived": False,
+                            "archive": None,
+                        }
+                        for item in listing.get("Contents", [])
+                    ],
+                }
+            }
+
+        stub_server.on("FileFolderListSizes", get_folder)
+        yield s3
+
+
+@pytest.fixture(name="title_dir")
+def fixture_title_dir(tmp_path):
+    title = tmp_path / "title_1"
+    (title / "subs").mkdir(parents=True)
+    (title / "master.mp4").write_bytes(b"m" * (12 * MiB))
+    for lang in ["de", "en"]:
+        (title / "subs" / f"{lang}.vtt").write_bytes(b"WEBVTT")
+    return title
+
+
+def reasons(report) -> dict:
+    return {entry.relative_path: entry.reason for entry in report.entries}
+
+
+def test_sync_uploads_only_changes(offline_platform: ContentPlatform, s3, title_dir, tmp_path) -> None:
+    sync_dir = str(tmp_path / "sync")
+
+    report = offline_platform.sync_directory(str(title_dir), config=CONFIG, sync_dir=sync_dir)
+    assert reasons(report) == {"master.mp4": "new", "subs/de.vtt": "new", "subs/en.vtt": "new"}
+    assert report.upload_report.total_bytes == 12 * MiB + 12
+
+    report = offline_platform.sync_directory(str(title_dir), config=CONFIG, sync_dir=sync_dir)
+    assert not report.to_upload
+    assert report.bytes_skipped == 12 * MiB + 12
+    assert report.upload_report.results == []
+
+    # same size, other content
+    (title_dir / "subs" / "en.vtt").write_bytes(b"WEBVTX")
+    (title_dir / "subs" / "fr.vtt").write_bytes(b"WEBVTT")
+    s3.put_object(Bucket="stub-bucket", Key="stub-root/title_1/trailer.mp4", Body=b"t")
+    progress = []
+
+    report = offline_platform.sync_directory(
+        str(title_dir), config=CONFIG, sync_dir=sync_dir, progress=lambda sent, total: progress.append(sent)
+    )
+
+    assert reasons(report) == {
+        "master.mp4": "unchanged",
+        "subs/de.vtt": "unchanged",
+        "subs/en.vtt": "checksum",
+        "subs/fr.vtt": "new",
+        "trailer.mp4": "remote_only",
+    }
+    assert progress[-1] == report.bytes_to_upload == 12
+    body = s3.get_object(Bucket="stub-bucket", Key="stub-root/title_1/subs/en.vtt")["Body"].read()
+    assert body == b"WEBVTX"
+    # remote files without a local one are kept
+    assert s3.head_object(Bucket="stub-bucket", Key="stub-root/title_1/trailer.mp4")
+
+
+def test_first_sync_of_an_uploaded_directory(offline_platform: ContentPlatform, s3, title_dir, tmp_path) -> None:
+    offline_platform.upload_directory(str(title_dir), config=CONFIG)
+    sync_dir = str(tmp_path / "sync")
+
+    # no manifest on this host yet
+    report = offline_platform.sync_directory(str(title_dir), config=CONFIG, sync_dir=sync_dir)
+    assert reasons(report) == {"master.mp4": "unchanged", "subs/de.vtt": "unchanged", "subs/en.vtt": "unchanged"}
+    assert report.upload_report.results == []
+
+    manifest = SyncManifest(str(title_dir), "title_1", sync_dir)
+    assert manifest.files["subs/en.vtt"]["md5"] == file_md5(str(title_dir / "subs" / "en.vtt"))
+
+    # the next sync compares the recorded checksums
+    (title_dir / "subs" / "en.vtt").write_bytes(b"WEBVTX")
+    report = offline_platform.sync_directory(str(title_dir), config=CONFIG, sync_dir=sync_dir, dry_run=True)
+    assert reasons(report) == {"master.mp4": "unchanged", "subs/de.vtt": "unchanged", "subs/en.vtt": "checksum"}
+
+
+def test_sync_by_etag(offline_platform: ContentPlatform, s3, title_dir) -> None:
+    offline_platform.upload_directory(str(title_dir), config=CONFIG)
+
+    report = offline_platform.sync_directory(str(title_dir), compare="etag", config=CONFIG, dry_run=True)
+    assert not report.to_upload
+
+    (title_dir / "master.mp4").write_bytes(b"n" * (12 * MiB))
+    report = offline_platform.sync_directory(str(title_dir), compare="etag", config=CONFIG, dry_run=True)
+    assert reasons(report) == {"master.mp4": "etag", "subs/de.vtt": "unchanged", "subs/en.vtt": "unchanged"}
+    assert report.upload_report is None
+
+
+def test_sync_by_size_and_mtime(offline_platform: ContentPlatform, s3, title_dir) -> None:
+    offline_platform.upload_directory(str(title_dir), config=CONFIG)
+    (title_dir / "subs" / "en.vtt").write_bytes(b"WEBVTT, changed")
+    os.utime(title_dir / "subs" / "de.vtt", (0, 0))
+    os.utime(title_dir / "master.mp4", (0, 0))
+
+    report = offline_platform.sync_directory(str(title_dir), compare="size", dry_run=True)
+    assert reasons(report) == {"master.mp4": "unchanged", "subs/de.vtt": "unchanged", "subs/en.vtt": "size"}
+
+    (title_dir / "subs" / "en.vtt").write_bytes(b"WEBVTX")
+    report = offline_platform.sync_directory(str(title_dir), compare="mtime", dry_run=True)
+    assert reasons(report) == {"master.mp4": "unchanged", "subs/de.vtt": "unchanged", "subs/en.vtt": "modified"}
+
+
+def test_plan_sync_with_manifest(tmp_path) -> None:
+    local_dir = tmp_path / "title_1"
+    local_dir.mkdir()
+    for name in ["a.vtt", "b.vtt", "c.vtt"]:
+        (local_dir / name).write_bytes(b"WEBVTT")
+    remote_files = {
+        name: {"name": name, "size": 6, "last_modified": "2026-01-01T00:00:00+00:00"} for name in ["a.vtt", "b.vtt"]
+    }
+    remote_files["c.vtt"] = {"name": "c.vtt", "size": 6, "last_modified": "2026-02-01T00:00:00+00:00"}
+
+    manifest = SyncManifest(str(local_dir), "title_1", str(tmp_path / "sync"))
+    md5 = file_md5(str(local_dir / "a.vtt"))
+    manifest.record("a.vtt", str(local_dir / "a.vtt"), md5, "2026-01-01T00:00:00+00:00")
+    # someone else uploaded c.vtt after this sync
+    manifest.record("c.vtt", str(local_dir / "c.vtt"), md5, "2026-01-01T00:00:00+00:00")
+    manifest.save()
+
+    entries = plan_sync(
+        str(local_dir),
+        "title_1",
+        remote_files,
+        manifest=SyncManifest(str(local_dir), "title_1", str(tmp_path / "sync")),
+    )
+
+    assert {entry.relative_path: entry.reason for entry in entries} == {
+        "a.vtt": "unchanged",
+        # no checksum recorded and no ETags, the local file is newer
+        "b.vtt": "modified",
+        "c.vtt": "remote_changed",
+    }
+    with pytest.raises(ValueError):
+        plan_sync(str(local_dir), "title_1", remote_files, compare="checksum")
+
+
+def test_compare_unrecorded(tmp_path) -> None:
+    local_path = tmp_path / "a.vtt"
+    local_path.write_bytes(b"WEBVTT")
+    os.utime(local_path, (0, 0))
+    md5 = file_md5(str(local_path))
+    remote = {"name": "a.vtt", "size": 6, "last_modified": "2026-01-01T00:00:00+00:00"}
+
+    def compare(etag):
+        return compare_unrecorded(str(local_path), remote, "title_1", lambda folder, name: etag, CONFIG)
+
+    assert compare(md5) == "unchanged"
+    assert compare("0" * 32) == "etag"
+    # uploaded with another part size, the older local file counts as unchanged
+    assert compare("0" * 32 + "-3") == "unchanged"
+    os.utime(local_path)
+    assert compare("0" * 32 + "-3") == "modified"
@@ -0,0 +1,168 @@
+import threading
+import time
+from typing import Iterator
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from castlabs import ContentPlatform
+from castlabs.multipart import MIN_PART_SIZE, MiB, UploadConfig
+from castlabs.repository import UploadClient
+from castlabs.transfers import UploadClientCache, plan_directory
+from stub_server import StubServer
+
+CONFIG = UploadConfig(part_size=MIN_PART_SIZE, multipart_threshold=MIN_PART_SIZE)
+
+
+@pytest.fixture(name="s3")
+def fixture_s3(monkeypatch: pytest.MonkeyPatch) -> Iterator:
+    """A mocked S3 bucket behind the upload tickets of the in-memory content platform."""
+    monkeypatch.setattr(
+        UploadClient,
+        "_fetch_credentials",
+        lambda self: {"access_key": "a", "secret_key": "s", "token": "t", "expiry_time": "2100-01-01T00:00:00Z"},
+    )
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="stub-bucket")
+        yield s3
+
+
+@pytest.fixture(name="title_dir")
+def fixture_title_dir(tmp_path):
+    title = tmp_path / "title_1"
+    (title / "subs").mkdir(parents=True)
+    (title / "artwork").mkdir()
+    (title / "master.mp4").write_bytes(b"m" * (12 * MiB))
+    for lang in ["de", "en", "fr"]:
+        (title / "subs" / f"{lang}.vtt").write_bytes(b"WEBVTT")
+    (title / "artwork" / "poster.jpg").write_bytes(b"p" * 1000)
+    return title
+
+
+def test_plan_directory(title_dir) -> None:
+    jobs = plan_directory(str(title_dir), "media/title_1/")
+
+    assert [(path.split("title_1")[-1], remote) for path, remote in jobs] == [
+        ("/master.mp4", "media/title_1/"),
+        ("/artwork/poster.jpg", "media/title_1/artwork"),
+        ("/subs/de.vtt", "media/title_1/subs"),
+        ("/subs/en.vtt", "media/title_1/subs"),
+        ("/subs/fr.vtt", "media/title_1/subs"),
+    ]
+
+
+def test_upload_directory(offline_platform: ContentPlatform, stub_server: StubServer, s3, title_dir) -> None:
+    progress = []
+
+    report = offline_platform.upload_directory(
+        str(title_dir), progress=lambda sent, total: progress.append((sent, total)), config=CONFIG
+    )
+
+    assert not report.failed
+    assert report.total_bytes == 12 * MiB + 3 * 6 + 1000
+    assert report.bytes_per_second > 0
+    assert progress[-1] == (report.total_bytes, report.total_bytes)
+
+    keys = sorted(item["Key"] for item in s3.list_objects_v2(Bucket="stub-bucket")["Contents"])
+    assert keys == [
+        "stub-root/title_1/artwork/poster.jpg",
+        "stub-root/title_1/master.mp4",
+        "stub-root/title_1/subs/de.vtt",
+        "stub-root/title_1/subs/en.vtt",
+        "stub-root/title_1/subs/fr.vtt",
+    ]
+    head = s3.head_object(Bucket="stub-bucket", Key="stub-root/title_1/master.mp4")
+    assert head["ETag"].endswith('-3"')
+
+    # one upload client per remote folder, reused by the next upload
+    assert len(stub_server.graphql_requests("create_upload_ticket")) == 3
+    offline_platform.upload_files([str(title_dir / "subs" / "de.vtt")], "title_1/subs", config=CONFIG)
+    assert len(stub_server.graphql_requests("create_upload_ticket")) == 3
+
+
+def test_failed_file_does_not_stop_the_others(
+    offline_platform: ContentPlatform, s3, title_dir, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    upload_file = UploadClient.upload_file
+
+    def flaky_upload_file(self, file_name, **kwargs):
+        if file_name.endswith("en.vtt"):
+            raise ConnectionError("network blip")
+        return upload_file(self, file_name, **kwargs)
+
+    monkeypatch.setattr(UploadClient, "upload_file", flaky_upload_file)
+    files = [str(title_dir / "subs" / f"{lang}.vtt") for lang in ["de", "en", "fr"]]
+
+    report = offline_platform.upload_files(files, "title_1/subs")
+
+    assert [result.success for result in report.results] == [True, False, True]
+    (failed,) = report.failed
+    assert failed.error == "ConnectionError: network blip"
+    assert report.total_bytes == 12
+
+
+def test_storage_location_is_looked_up_once(offline_platform: ContentPlatform, stub_server: StubServer) -> None:
+    get_roots = stub_server.operations["GetRootsurn_janus_organization"]
+
+    def slow_get_roots(variables: dict) -> dict:
+        time.sleep(0.1)
+        return get_roots(variables)
+
+    stub_server.on("GetRootsurn_janus_organization", slow_get_roots)
+    threads = [threading.Thread(target=offline_platform._get_storage_location) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(stub_server.graphql_requests("GetRootsurn_janus_organization")) == 1
+
+
+def test_upload_client_cache_is_bounded() -> None:
+    now = [0.0]
+    created = []
+    cache = UploadClientCache(lambda path: created.append(path) or object(), max_size=2, ttl=60, clock=lambda: now[0])
+
+    first = cache["title_1"]
+    cache["title_2"]
+    assert cache["title_1"] is first
+    # title_2 is the least recently used
+    cache["title_3"]
+    assert len(cache) == 2
+    assert "title_1" in cache and "title_2" not in cache
+
+    now[0] = 60
+    assert cache["title_1"] is not first
+    assert created == ["title_1", "title_2", "title_3", "title_1"]
+
+    with pytest.raises(ValueError):
+        UploadClientCache(lambda path: object(), max_size=0)
+
+
+def test_upload_client_is_created_once() -> None:
+    created = []
+    barrier = threading.Barrier(8)
+
+    def create(path: str) -> object:
+        created.append(path)
+        time.sleep(0.05)
+        return object()
+
+    cache = UploadClientCache(create)
+    clients = []
+
+    def get() -> None:
+        barrier.wait()
+        clients.append(cache["title_1"])
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert created == ["title_1"]
+    assert len(set(map(id, clients))) == 1
+    assert not cache._pending
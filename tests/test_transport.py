@@ -0,0 +1,48 @@
+from castlabs.client import Client
+from castlabs.transport import Transport
+from stub_server import StubServer
+
+
+def test_connections_are_reused(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    connections_after_auth = stub_server.connections
+
+    for _ in range(20):
+        assert offline_client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs") == {"pos": []}
+
+    # one extra keep-alive connection for the workflow host, none per call
+    assert stub_server.connections == connections_after_auth + 1
+
+
+def test_separate_pool_per_host(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    stub_server.on("GetRoots", lambda variables: {"roots": []})
+
+    offline_client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+    offline_client._query_api("repository", {"operationName": "GetRoots"}, "roots")
+
+    sessions = offline_client._transport._sessions
+    assert set(sessions) == {"credential_exchange", "workflow", "repository"}
+    assert len({id(session) for session in sessions.values()}) == 3
+
+
+def test_requests_are_authorized(offline_client: Client, stub_server: StubServer) -> None:
+    stub_server.on("GetPOs", lambda variables: {"list_POs": {"pos": []}})
+    offline_client._query_api("workflow", {"operationName": "GetPOs"}, "list_POs")
+
+    _, body, headers = stub_server.requests[-1]
+    assert body["operationName"] == "GetPOs"
+    assert headers["Authorization"] == f"Bearer {stub_server.access_token}"
+    assert headers["x-castlabs-organization"] == "urn:janus:organization:stub"
+
+
+def test_pool_configuration(stub_server: StubServer) -> None:
+    transport = Transport(stub_server.urls, pool_size=4, pool_block=True, timeout=3)
+    adapter = transport.session("workflow").get_adapter(stub_server.urls["workflow"])
+
+    assert adapter._pool_maxsize == 4
+    assert adapter._pool_block is True
+    assert transport.session("workflow") is transport.session("workflow")
+
+    transport.close()
+    assert transport._sessions == {}
@@ -0,0 +1,115 @@
+import io
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import pytest
+
+from castlabs.repository import S3ClientFactory, StorageLocation, UploadClient
+
+
+@pytest.fixture(name="ticket_requests")
+def fixture_ticket_requests(monkeypatch: pytest.MonkeyPatch) -> list:
+    """Answer the uploader auth endpoint with credentials expiring in five minutes, a new token each time."""
+    requests = []
+
+    def urlopen(request):
+        requests.append(request.full_url)
+        credentials = {
+            "AccessKeyId": "AKIA",
+            "SecretAccessKey": "secret",
+            "SessionToken": f"token-{len(requests)}",
+            "Expiration": (datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat(),
+        }
+        return io.BytesIO(json.dumps(credentials).encode())
+
+    monkeypatch.setattr("castlabs.repository.urlopen", urlopen)
+    return requests
+
+
+def upload_client(path: str = "title_1", s3_clients: Optional[S3ClientFactory] = None) -> UploadClient:
+    storage_location = StorageLocation({"id": "s3://stub-bucket/stub-root/", "name": "root"}, None)
+    return UploadClient(
+        storage_location, path, "", upload_url=f"https://upload.example.com/#/{path}", s3_clients=s3_clients
+    )
+
+
+def test_credentials_are_refreshed_before_expiry(ticket_requests: list) -> None:
+    client = upload_client()
+    s3 = client.aws_s3_client
+    assert ticket_requests == ["https://upload.example.com/api_v1/upload/title_1"]
+
+    # the credentials expire within the mandatory refresh window of botocore, the next use fetches new ones
+    frozen = s3._request_signer._credentials.get_frozen_credentials()
+    assert frozen.token == "token-2"
+    assert len(ticket_requests) == 2
+    assert client.aws_s3_client is s3
+
+
+def test_client_is_shared_by_threads(ticket_requests: list) -> None:
+    client = upload_client()
+    clients = []
+
+    threads = [threading.Thread(target=lambda: clients.append(client.aws_s3_client)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, clients))) == 1
+    assert len(ticket_requests) == 1
+
+
+def test_clients_are_reused_per_ticket(ticket_requests: list) -> None:
+    s3_clients = S3ClientFactory(max_clients=2)
+    title_1 = upload_client("title_1", s3_clients).aws_s3_client
+    title_2 = upload_client("title_2", s3_clients).aws_s3_client
+
+    assert upload_client("title_1", s3_clients).aws_s3_client is title_1
+    # every ticket signs with its own credentials
+    assert title_1._request_signer._credentials is not title_2._request_signer._credentials
+    assert ticket_requests == [
+        "https://upload.example.com/api_v1/upload/title_1",
+        "https://upload.example.com/api_v1/upload/title_2",
+    ]
+
+    # the client of the least recently used ticket is dropped
+    upload_client("title_3", s3_clients).aws_s3_client
+    assert upload_client("title_1", s3_clients).aws_s3_client is title_1
+    assert upload_client("title_2", s3_clients).aws_s3_client is not title_2
+
+
+def test_upload_clients_keep_no_s3_client(ticket_requests: list) -> None:
+    s3_clients = S3ClientFactory(max_clients=1)
+    clients = [upload_client(f"title_{i}", s3_clients) for i in range(3)]
+    s3 = [client.aws_s3_client for client in clients]
+
+    # the factory is the only owner of the clients, its bound holds however many upload clients are kept
+    assert len(s3_clients) == 1
+    assert clients[2].aws_s3_client is s3[2]
+    assert clients[0].aws_s3_client is not s3[0]
+    assert len(ticket_requests) == 4
+
+
+def test_failed_client_is_created_again(ticket_requests: list) -> None:
+    s3_clients = S3ClientFactory()
+
+    def fail() -> dict:
+        raise OSError("uploader unreachable")
+
+    with pytest.raises(OSError):
+        s3_clients.get_client("https://upload.example.com/#/title_1", fail)
+    assert len(s3_clients) == 0
+    assert upload_client("title_1", s3_clients).aws_s3_client is not None
+    assert len(ticket_requests) == 1
+
+
+def test_credentials_without_expiration(monkeypatch: pytest.MonkeyPatch) -> None:
+    credentials = {"AccessKeyId": "AKIA", "SecretAccessKey": "secret", "SessionToken": "token"}
+    monkeypatch.setattr("castlabs.repository.urlopen", lambda request: io.BytesIO(json.dumps(credentials).encode()))
+
+    metadata = upload_client()._fetch_credentials()
+
+    expiry_time = datetime.fromisoformat(metadata["expiry_time"])
+    assert timedelta(minutes=14) < expiry_time - datetime.now(timezone.utc) <= timedelta(minutes=15)
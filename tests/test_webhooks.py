@@ -0,0 +1,168 @@
+import asyncio
+
+import httpx
+import pytest
+
+from castlabs import AsyncContentPlatform
+from castlabs.webhooks import WebhookReceiver
+from stub_server import FakeContentPlatform, StubServer
+
+
+def event(process_id: str, state: str, action: str) -> dict:
+    return {"process_id": process_id, "state": state, "data": "{}", "message": "", "action": action}
+
+
+@pytest.mark.asyncio
+async def test_events_update_status_and_wake_waiters(
+    fake_platform: FakeContentPlatform, stub_server: StubServer, credentials: dict
+) -> None:
+    fake_platform.add_item("default_group", "title_1", state="PENDING", publish_state="PENDING")
+
+    async with AsyncContentPlatform(**credentials) as platform, WebhookReceiver(platform) as receiver:
+        assert (await receiver.watch("default_group", "title_1")).status == "ENCODING_PENDING"
+        waiter = asyncio.create_task(receiver.wait("default_group", "title_1", timeout=5))
+
+        async with httpx.AsyncClient() as http:
+            response = await http.post(receiver.url, json=event("wf-0", "SUCCESS", "start_workflow_vod_default"))
+            assert response.status_code == 204
+            assert receiver.status("default_group", "title_1").status == "PUBLISH_PENDING"
+            assert not waiter.done()
+
+            await http.post(receiver.url, json=event("pub-0", "SUCCESS", "publishPo"))
+
+        encoding = await waiter
+        requests = len(stub_server.graphql_requests())
+
+    assert encoding.status == "PUBLISH_SUCCESS"
+    assert receiver.statuses[("default_group", "title_1")].complete
+    # the lookup of the process only, no polling
+    assert requests == 1
+
+
+@pytest.mark.asyncio
+async def test_event_before_tracking(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    fake_platform.add_item("default_group", "title_1", state="PENDING", publish_state="PENDING")
+
+    async with AsyncContentPlatform(**credentials) as platform, WebhookReceiver(platform) as receiver:
+        receiver.handle_event(event("wf-0", "FAILED", "start_workflow_vod_default"))
+        await receiver.watch("default_group", "title_1")
+
+        encoding = await receiver.wait("default_group", "title_1", timeout=1)
+
+    assert encoding.status == "ENCODING_FAILED"
+
+
+@pytest.mark.asyncio
+async def test_quiet_encodings_are_polled(
+    fake_platform: FakeContentPlatform, stub_server: StubServer, credentials: dict
+) -> None:
+    fake_platform.add_item("default_group", "quiet", state="PENDING")
+    fake_platform.add_item("default_group", "notified", state="PENDING", publish_state="PENDING")
+
+    async with AsyncContentPlatform(**credentials) as platform:
+        async with WebhookReceiver(platform, quiet_after=0.1, check_interval=0.02) as receiver:
+            await receiver.watch("default_group", "quiet")
+            await receiver.watch("default_group", "notified")
+
+            # the webhook of "quiet" never arrives
+            fake_platform.processes["wf-0"]["state"] = "SUCCESS"
+            receiver.handle_event(event("wf-2", "SUCCESS", "start_workflow_vod_default"))
+            receiver.handle_event(event("pub-2", "SUCCESS", "publishPo"))
+
+            encodings = await receiver.wait_all([("default_group", "quiet"), ("default_group", "notified")], 5)
+
+    assert [encoding.status for encoding in encodings] == ["PUBLISH_SUCCESS", "PUBLISH_SUCCESS"]
+    (poll,) = stub_server.graphql_requests("GetProcesses")
+    assert list(poll["variables"].values()) == ["wf-0"]
+
+
+@pytest.mark.asyncio
+async def test_quiet_poll_finds_a_new_publish_process(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    item = fake_platform.add_item("default_group", "title_1", state="PENDING", publish_state=None)
+
+    async with AsyncContentPlatform(**credentials) as platform:
+        async with WebhookReceiver(platform, quiet_after=0.1, check_interval=0.02) as receiver:
+            await receiver.watch("default_group", "title_1")
+            receiver.handle_event(event("wf-0", "SUCCESS", "start_workflow_vod_default"))
+            # the publish sub-process is created after the item was looked up, its webhook is not matched
+            fake_platform.processes["wf-0"]["state"] = "SUCCESS"
+            fake_platform.add_publish_process("pub-late", "PENDING", item)
+            receiver.handle_event(event("pub-late", "SUCCESS", "publishPo"))
+
+            encoding = await receiver.wait("default_group", "title_1", timeout=5)
+
+    assert encoding.status == "PUBLISH_SUCCESS"
+
+
+@pytest.mark.asyncio
+async def test_publish_event_before_the_publish_process_is_known(
+    fake_platform: FakeContentPlatform, stub_server: StubServer, credentials: dict
+) -> None:
+    item = fake_platform.add_item("default_group", "title_1", state="RUNNING", publish_state=None)
+
+    async with AsyncContentPlatform(**credentials) as platform, WebhookReceiver(platform) as receiver:
+        await receiver.watch("default_group", "title_1")
+        fake_platform.processes["wf-0"]["state"] = "SUCCESS"
+        receiver.handle_event(event("wf-0", "SUCCESS", "start_workflow_vod_default"))
+        # the platform creates the publish sub-process after the encoding succeeded, its event arrives first
+        fake_platform.add_publish_process("pub-late", "PENDING", item)
+        receiver.handle_event(event("pub-late", "SUCCESS", "publishPo"))
+
+        # without waiting for quiet_after
+        encoding = await receiver.wait("default_group", "title_1", timeout=5)
+
+    assert encoding.status == "PUBLISH_SUCCESS"
+    assert not stub_server.graphql_requests("GetProcesses")
+    assert 1 <= len(stub_server.graphql_requests("PoItems")) <= 2
+
+
+@pytest.mark.asyncio
+async def test_idle_connections_are_closed(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    async with AsyncContentPlatform(**credentials) as platform, WebhookReceiver(platform, read_timeout=0.1) as receiver:
+        host, port = receiver.url.split("//")[1].rstrip("/").split(":")
+        reader, writer = await asyncio.open_connection(host, int(port))
+        # a request that never completes
+        writer.write(b"POST / HTTP/1.1\r\nContent-Length: 10\r\n")
+        await writer.drain()
+
+        assert await asyncio.wait_for(reader.read(), 5) == b""
+        writer.close()
+
+
+@pytest.mark.asyncio
+async def test_bad_requests(fake_platform: FakeContentPlatform, credentials: dict) -> None:
+    async with AsyncContentPlatform(**credentials) as platform, WebhookReceiver(platform, path="/hook") as receiver:
+        async with httpx.AsyncClient() as http:
+            assert (await http.post(receiver.url, content=b"not json")).status_code == 400
+            assert (await http.post(receiver.url, json={"state": "SUCCESS"})).status_code == 400
+            assert (await http.get(receiver.url)).status_code == 405
+            assert (await http.post(receiver.url.replace("/hook", "/other"), json={})).status_code == 404
+
+    with pytest.raises(RuntimeError):
+        WebhookReceiver(platform).url
+
+
+@pytest.mark.asyncio
+async def test_thousand_encodings(
+    fake_platform: FakeContentPlatform, stub_server: StubServer, credentials: dict
+) -> None:
+    for number in range(1000):
+        fake_platform.add_item("default_group", f"title_{number}", state="PENDING")
+
+    async with AsyncContentPlatform(**credentials) as platform, WebhookReceiver(platform) as receiver:
+        for process in await platform._workflow.get_processes("default_group", fields="status", refresh=False):
+            receiver.track(process, "default_group", process.pk)
+        encodings = list(receiver.statuses)
+
+        async def notify(numbers: range) -> None:
+            async with httpx.AsyncClient() as http:
+                for number in numbers:
+                    await http.post(
+                        receiver.url, json=event(f"wf-{2 * number}", "SUCCESS", "start_workflow_vod_default")
+                    )
+
+        await asyncio.gather(*(notify(range(start, 1000, 20)) for start in range(20)))
+        completed = await receiver.wait_all(encodings, timeout=10)
+
+    assert all(encoding.complete for encoding in completed)
+    assert len(stub_server.graphql_requests()) == 1
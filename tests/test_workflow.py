@@ -0,0 +1,156 @@
+import pytest
+
+from castlabs import ContentPlatform
+from stub_server import FakeContentPlatform, StubServer
+
+
+def test_get_status_requests_a_single_item(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    for number in range(50):
+        fake_platform.add_item("default_group", f"title_{number}", state="PENDING")
+
+    status = offline_platform.get_status(encode_name="title_42")
+
+    assert status.status == "ENCODING_PENDING"
+    assert status.content_url.endswith("/title_42/")
+    assert [body["operationName"] for body in stub_server.graphql_requests()] == ["PoItem", "GetProcess"]
+    assert stub_server.graphql_requests("PoItem")[0]["variables"]["po_item_id"] == "title_42"
+
+
+def test_get_process_of_unknown_item(offline_platform: ContentPlatform, fake_platform: FakeContentPlatform) -> None:
+    fake_platform.add_item("default_group", "title_1")
+
+    with pytest.raises(KeyError):
+        offline_platform.get_status(encode_name="unknown")
+
+    with pytest.raises(KeyError):
+        offline_platform.get_status(encode_name="title_1", group_name="unknown_group")
+
+
+def test_list_processes_with_one_request(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    fake_platform.add_item("default_group", "title_1")
+    fake_platform.add_item("default_group", "title_2", state="PENDING")
+
+    processes = offline_platform._workflow.get_processes("default_group", fields="status", lazy_refresh=False)
+
+    assert [(process.pk, process.state) for process in processes] == [
+        ("title_1", "PUBLISH_SUCCESS"),
+        ("title_2", "ENCODING_PENDING"),
+    ]
+    (listing,) = stub_server.graphql_requests()
+    assert listing["operationName"] == "PoItemListStatus"
+    assert "tracks" not in listing["query"]
+
+
+def test_state_is_refreshed_lazily(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    fake_platform.add_item("default_group", "title_1")
+    pending = fake_platform.add_item("default_group", "title_2", state="PENDING")
+
+    processes = offline_platform._workflow.get_processes("default_group")
+    assert len(stub_server.graphql_requests()) == 1
+
+    # the listed state is outdated, reading it pulls the current one once
+    pending["workflow_process"]["state"] = "SUCCESS"
+    assert processes[1].state == "PUBLISH_SUCCESS"
+    assert processes[1].state == "PUBLISH_SUCCESS"
+    assert processes[0].state == "PUBLISH_SUCCESS"
+    assert len(stub_server.graphql_requests("GetProcess")) == 1
+
+
+def test_minimal_projection(offline_platform: ContentPlatform, fake_platform: FakeContentPlatform) -> None:
+    fake_platform.add_item("default_group", "title_1")
+
+    processes = offline_platform._workflow.get_processes("default_group", fields="minimal")
+
+    assert [process.pk for process in processes] == ["title_1"]
+    assert offline_platform._workflow.get_processes("empty_group", fields="minimal") == []
+
+
+def test_get_statuses_in_batches(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    for number in range(5):
+        fake_platform.add_item("default_group", f"title_{number}", state="PENDING")
+    fake_platform.add_item("other_group", "title_5")
+
+    encodings = [("other_group", "title_5"), ("default_group", "unknown")]
+    encodings += [("default_group", f"title_{number}") for number in range(5)]
+    statuses = offline_platform.get_statuses(encodings, batch_size=2)
+
+    assert statuses[0].status == "PUBLISH_SUCCESS"
+    assert isinstance(statuses[1], KeyError)
+    assert [status.encode_name for status in statuses[2:]] == [f"title_{number}" for number in range(5)]
+    assert {status.status for status in statuses[2:]} == {"ENCODING_PENDING"}
+
+    # one listing per group, one request per batch of processes to refresh
+    assert len(stub_server.graphql_requests("PoItemListStatus")) == 2
+    assert len(stub_server.graphql_requests("GetProcesses")) == 3
+    assert len(stub_server.graphql_requests("GetProcess")) == 0
+
+
+def test_get_statuses_of_unknown_group(offline_platform: ContentPlatform, fake_platform: FakeContentPlatform) -> None:
+    fake_platform.add_item("default_group", "title_1")
+
+    statuses = offline_platform.get_statuses([("unknown_group", "title_1"), ("default_group", "title_1")])
+
+    assert isinstance(statuses[0], KeyError)
+    assert statuses[1].complete
+
+
+def test_start_encoding_uses_the_mutation_response(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    for number in range(50):
+        fake_platform.add_item("default_group", f"title_{number}")
+
+    process = offline_platform._workflow.create_vod_encoding(
+        offline_platform._storage_location, "media/title_50", "default_group", "title_50"
+    )
+
+    assert process.state == "ENCODING_PENDING"
+    assert [body["operationName"] for body in stub_server.graphql_requests()] == [
+        "GetRootsurn_janus_organization",
+        "start_workflow_vod_default",
+    ]
+    # the rest of the item is looked up once when needed
+    assert process.content_url.endswith("/title_50/")
+    assert process.content_url.endswith("/title_50/")
+    assert len(stub_server.graphql_requests("PoItem")) == 1
+
+    encoding = offline_platform.start_encoding("media/title_51", webhook_url="https://example.com/hook")
+
+    assert encoding.status == "ENCODING_PENDING"
+    assert [body["operationName"] for body in stub_server.graphql_requests()][3:] == [
+        "start_workflow_vod_default",
+        "registerWebhook",
+        "PoItem",
+        "registerWebhook",
+    ]
+    # the item was looked up for the webhook of the publish process
+    assert encoding.hls_url.endswith("/title_51/hls.m3u8")
+
+    encoding = offline_platform.start_encoding("media/title_52")
+
+    assert [body["operationName"] for body in stub_server.graphql_requests()][7:] == ["start_workflow_vod_default"]
+    assert encoding.content_url is encoding.hls_url is encoding.dash_url is None
+    assert offline_platform.get_status(encode_name="title_52").content_url.endswith("/title_52/")
+
+
+def test_refresh_finds_a_new_publish_process(
+    offline_platform: ContentPlatform, fake_platform: FakeContentPlatform, stub_server: StubServer
+) -> None:
+    item = fake_platform.add_item("default_group", "title_1", publish_state=None)
+    process = offline_platform._workflow.get_process("default_group", "title_1", fields="status")
+    assert process.state == "PUBLISH_None"
+
+    fake_platform.add_publish_process("pub-0", "RUNNING", item)
+    process.refresh_state()
+
+    assert process.state == "PUBLISH_RUNNING"
+    assert len(stub_server.graphql_requests("PoItem")) == 2
+    assert not stub_server.graphql_requests("GetProcess")